@@ -0,0 +1,294 @@
+"""
+Gemeinsame Grundlagen der Benchmarks: Zugriff auf den Server-Code, Testdatenbank und Test-Authentifizierung.
+
+Die Benchmarks laufen ausschließlich lokal gegen eine eigene MySQL-Datenbank, die über dieselben
+Umgebungsvariablen wie der Server gewählt wird (DB_HOST, DB_PORT, DB_USER, DB_PASSWORD, DB_NAME,
+vgl. Mapper.get_connection_params). Da der Datenbestand beim Befüllen vollständig ersetzt wird,
+muss der Name der Datenbank das Wort "bench" enthalten, z.B. DB_NAME=bankproject_bench.
+
+Sind Shards konfiguriert (DB_SHARDS, vgl. ShardRouter), so gilt dies ebenso für jeden Shard, z.B.
+DB_SHARDS=localhost:3306/bankproject_bench_shard0,localhost:3306/bankproject_bench_shard1. Die Buchungen
+werden dann zunächst in die primäre Datenbank geschrieben und anschließend auf die Shards verteilt.
+"""
+
+import os
+import random
+import sys
+import time
+
+"""Der Server-Code liegt im Verzeichnis /src und wird von dort importiert."""
+ROOT_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SOURCE_DIRECTORY = os.path.join(ROOT_DIRECTORY, 'src')
+DUMP_FILE = os.path.join(ROOT_DIRECTORY, 'mysql', 'MySQL-Dump.sql')
+
+if SOURCE_DIRECTORY not in sys.path:
+    sys.path.insert(0, SOURCE_DIRECTORY)
+
+import mysql.connector as connector  # noqa: E402
+
+from server.db.Mapper import Mapper  # noqa: E402
+from server.db.MigrationRunner import MigrationRunner  # noqa: E402
+from server.db.SchemaMigrations import SHARD_MIGRATIONS  # noqa: E402
+from server.db.ShardRouter import ShardRouter  # noqa: E402
+from server.db.TransactionMapper import TransactionMapper  # noqa: E402
+
+"""Das Bar-Konto der Bank samt Inhaber (vgl. BankAdministration.get_cash_account)."""
+CASH_ACCOUNT_ID = 10000
+
+"""Cookie, mit dem sich sämtliche Benchmark-Clients anmelden (vgl. install_test_authenticator)."""
+TEST_TOKEN = 'benchmark-token'
+TEST_USER = {'user_id': 'benchmark-user', 'name': 'Benchmark', 'email': 'benchmark@example.com'}
+
+
+def install_test_authenticator():
+    """Ersetzen der Prüfung von Firebase ID Tokens durch eine Test-Authentifizierung.
+
+    Ersetzt wird lediglich die Signaturprüfung bei Firebase (verify_firebase_token). Der übrige
+    Weg durch secured, den TokenCache und den UserSynchronizer bleibt unverändert und wird so
+    mitgemessen. Akzeptiert wird ausschließlich das Token TEST_TOKEN. Der Aufruf muss erfolgen,
+    bevor der erste Request bearbeitet wird.
+    """
+    import google.oauth2.id_token
+
+    def verify_firebase_token(id_token, request, audience=None, **kwargs):
+        if id_token != TEST_TOKEN:
+            raise ValueError("Unbekanntes Test-Token")
+
+        claims = dict(TEST_USER)
+        claims['exp'] = time.time() + 24 * 3600
+        return claims
+
+    google.oauth2.id_token.verify_firebase_token = verify_firebase_token
+
+
+def get_database_name():
+    return Mapper.get_connection_params().get('database', '')
+
+
+def check_database(force=False):
+    """Sicherstellen, dass wir keine Entwicklungs- oder Produktionsdatenbank überschreiben.
+
+    :raise RuntimeError falls der Name der Datenbank nicht auf eine Benchmark-Datenbank hindeutet.
+    """
+    name = get_database_name()
+    if 'bench' not in name and not force:
+        raise RuntimeError("Die Datenbank '{}' ist keine Benchmark-Datenbank. Bitte DB_NAME z.B. auf "
+                           "bankproject_bench setzen (oder --force angeben).".format(name))
+
+    if ShardRouter.is_configured():
+        for shard in ShardRouter.get_instance().get_names():
+            if 'bench' not in shard.partition('/')[2] and not force:
+                raise RuntimeError("Der Shard '{}' ist keine Benchmark-Datenbank (oder --force angeben).".format(shard))
+
+
+def connect():
+    """Öffnen einer eigenen Verbindung (außerhalb des ConnectionPool) für das Befüllen."""
+    return connector.connect(**Mapper.get_connection_params())
+
+
+def create_schema():
+    """Anlegen sämtlicher Tabellen aus dem SQL-Dump samt anschließender Migration (ggf. auch der Shards).
+
+    Die Datenbank selbst muss bereits existieren (CREATE DATABASE bankproject_bench), ebenso die Shards.
+    """
+    with open(DUMP_FILE, encoding='utf-8') as file:
+        script = file.read()
+
+    cnx = connect()
+    cursor = cnx.cursor()
+    for result in cursor.execute(script, multi=True):
+        if result.with_rows:
+            result.fetchall()
+    cnx.commit()
+    cursor.close()
+    cnx.close()
+
+    applied = MigrationRunner().migrate()
+
+    if ShardRouter.is_configured():
+        router = ShardRouter.get_instance()
+        for shard in range(router.get_shard_count()):
+            MigrationRunner(SHARD_MIGRATIONS, router.get_pool(shard)).migrate()
+
+    return applied
+
+
+def _distribute_transactions(clear):
+    """Verteilen der in die primäre Datenbank geschriebenen Buchungen auf die Shards, sofern konfiguriert.
+
+    :param clear zuvor sämtliche Buchungen der Shards löschen
+    """
+    if not ShardRouter.is_configured():
+        return
+
+    router = ShardRouter.get_instance()
+    if clear:
+        for shard in range(router.get_shard_count()):
+            pool = router.get_pool(shard)
+            cnx = pool.checkout()
+            cursor = cnx.cursor()
+            cursor.execute("DELETE FROM transactions")
+            cnx.commit()
+            cursor.close()
+            pool.release(cnx)
+
+    with TransactionMapper() as mapper:
+        mapper.copy_to_shards()
+
+
+def _insert_chunked(cursor, command, rows, chunk_size=5000):
+    for start in range(0, len(rows), chunk_size):
+        cursor.executemany(command, rows[start:start + chunk_size])
+
+
+def _ids(count):
+    """Die ersten count Schlüssel ab 1, ohne das Bar-Konto bzw. dessen Inhaber."""
+    return [id for id in range(1, count + 2) if id != CASH_ACCOUNT_ID][:count]
+
+
+def seed(customers=100, accounts_per_customer=2, transactions_per_account=20, random_seed=42):
+    """Ersetzen des gesamten Datenbestands durch synthetische Daten der gewünschten Größe.
+
+    Jedes Konto ist Quellkonto von transactions_per_account Buchungen an zufällig gewählte
+    andere Konten. Auf zehn Kunden kommt ein Benutzer (Tabelle users). Zusätzlich wird das Bar-Konto samt Inhaber angelegt. Anschließend werden die
+    materialisierten Kontostände neu berechnet; die Sequenzen der Primärschlüssel setzen beim
+    nächsten Start auf den größten vorhandenen Schlüssel auf (vgl. SequenceTableIdAllocator).
+    Mit Shards werden die Buchungen abschließend auf diese verteilt.
+
+    :return dict mit der Anzahl der angelegten Kunden, Benutzer, Konten und Buchungen
+    """
+    rng = random.Random(random_seed)
+
+    customer_ids = _ids(customers)
+    account_ids = _ids(customers * accounts_per_customer)
+
+    customer_rows = [(id, 'Vorname{}'.format(id), 'Nachname{}'.format(id)) for id in customer_ids]
+    customer_rows.append((CASH_ACCOUNT_ID, 'Bank', 'Bargeld'))
+
+    user_rows = [(id, 'Benutzer{}'.format(id), 'benutzer{}@example.com'.format(id), 'google-{}'.format(id))
+                 for id in range(1, customers // 10 + 2)]
+
+    account_rows = [(id, customer_ids[index // accounts_per_customer]) for (index, id) in enumerate(account_ids)]
+    account_rows.append((CASH_ACCOUNT_ID, CASH_ACCOUNT_ID))
+
+    transaction_rows = []
+    if len(account_ids) > 1:
+        for source in account_ids:
+            for i in range(transactions_per_account):
+                target = source
+                while target == source:
+                    target = rng.choice(account_ids)
+                transaction_rows.append((len(transaction_rows) + 1, source, target, round(rng.uniform(1, 500), 2)))
+
+    cnx = connect()
+    cursor = cnx.cursor()
+
+    for table in ('transactions', 'accounts', 'customers', 'users', 'account_balances', 'id_sequences',
+                  'resource_versions'):
+        cursor.execute("DELETE FROM {}".format(table))
+
+    _insert_chunked(cursor, "INSERT INTO customers (id, firstName, lastName) VALUES (%s,%s,%s)", customer_rows)
+    _insert_chunked(cursor, "INSERT INTO users (id, name, email, google_user_id) VALUES (%s,%s,%s,%s)", user_rows)
+    _insert_chunked(cursor, "INSERT INTO accounts (id, owner) VALUES (%s,%s)", account_rows)
+    _insert_chunked(cursor, "INSERT INTO transactions (id, sourceAccount, targetAccount, amount) "
+                            "VALUES (%s,%s,%s,%s)", transaction_rows)
+
+    cnx.commit()
+    cursor.close()
+    cnx.close()
+
+    _distribute_transactions(clear=True)
+
+    with TransactionMapper() as mapper:
+        mapper.rebuild_balances()
+
+    return {'customers': len(customer_rows), 'accounts': len(account_rows), 'transactions': len(transaction_rows),
+            'users': len(user_rows)}
+
+
+def seed_ledger_accounts(sizes, random_seed=42):
+    """Anlegen je eines Kontos mit genau n Buchungen für jedes n in sizes (z.B. 10, 1000, 100000).
+
+    Die Konten gehören Kunden mit dem Vornamen 'Ledger' und dem Nachnamen n; bereits vorhandene
+    Konten dieser Art bleiben unverändert (vgl. find_ledger_accounts). Sämtliche Buchungen sind
+    Einzahlungen vom Bar-Konto.
+
+    :return dict n -> ID des Kontos
+    """
+    rng = random.Random(random_seed)
+    existing = find_ledger_accounts()
+
+    cnx = connect()
+    cursor = cnx.cursor()
+
+    for size in sizes:
+        if size in existing:
+            continue
+
+        cursor.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM customers")
+        (customer_id,) = cursor.fetchone()
+        cursor.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM accounts")
+        (account_id,) = cursor.fetchone()
+        cursor.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM transactions")
+        (first_id,) = cursor.fetchone()
+        if ShardRouter.is_configured():
+            first_id = max(first_id, ShardRouter.get_instance().find_max_id('transactions') + 1)
+
+        cursor.execute("INSERT INTO customers (id, firstName, lastName) VALUES (%s,%s,%s)",
+                       (customer_id, 'Ledger', str(size)))
+        cursor.execute("INSERT INTO accounts (id, owner) VALUES (%s,%s)", (account_id, customer_id))
+        _insert_chunked(cursor, "INSERT INTO transactions (id, sourceAccount, targetAccount, amount) "
+                                "VALUES (%s,%s,%s,%s)",
+                        [(first_id + i, CASH_ACCOUNT_ID, account_id, round(rng.uniform(1, 500), 2)) for i in range(size)])
+        cnx.commit()
+        existing[size] = account_id
+
+    cursor.execute("DELETE FROM id_sequences")
+    cnx.commit()
+    cursor.close()
+    cnx.close()
+
+    _distribute_transactions(clear=False)
+
+    with TransactionMapper() as mapper:
+        mapper.rebuild_balances()
+
+    return {size: existing[size] for size in sizes}
+
+
+def find_ledger_accounts():
+    """Auslesen der mit seed_ledger_accounts angelegten Konten als dict Anzahl Buchungen -> ID des Kontos."""
+    cnx = connect()
+    cursor = cnx.cursor()
+    cursor.execute("SELECT c.lastName, a.id FROM customers c JOIN accounts a ON a.owner=c.id "
+                   "WHERE c.firstName='Ledger'")
+    result = {int(size): account_id for (size, account_id) in cursor.fetchall()}
+    cursor.close()
+    cnx.close()
+    return result
+
+
+def count_rows():
+    """Auslesen der aktuellen Größe des Datenbestands (für die Ergebnisse eines Benchmarks)."""
+    cnx = connect()
+    cursor = cnx.cursor()
+    result = {}
+
+    for table in ('customers', 'accounts', 'transactions'):
+        cursor.execute("SELECT COUNT(*) FROM {}".format(table))
+        (result[table],) = cursor.fetchone()
+
+    cursor.close()
+    cnx.close()
+    return result
+
+
+def load_ids(table):
+    """Auslesen sämtlicher Primärschlüssel einer Tabelle."""
+    cnx = connect()
+    cursor = cnx.cursor()
+    cursor.execute("SELECT id FROM {} ORDER BY id".format(table))
+    result = [id for (id,) in cursor.fetchall()]
+    cursor.close()
+    cnx.close()
+    return result
@@ -0,0 +1,358 @@
+"""
+Lasttest des Bank-Beispiels über HTTP gegen eine lokale Benchmark-Datenbank.
+
+Der Lasttest startet die Flask-App aus main.py in einem lokalen Server (mit Test-Authentifizierung,
+vgl. BenchmarkEnvironment.install_test_authenticator) und spielt mit einer festen Anzahl paralleler
+Clients eine gewichtete Mischung typischer Requests ab. Die Szenarien entsprechen den Requests der
+Postman-Sammlungen in /postman.
+
+Aufruf (im Verzeichnis /benchmarks, z.B. mit DB_NAME=bankproject_bench):
+    python loadtest.py seed --create-schema --customers 1000
+        Legt das Schema an und befüllt die Datenbank mit synthetischen Daten.
+    python loadtest.py run --concurrency 8 --duration 30 --output results/vorher.json
+        Führt den Lasttest aus und legt die Ergebnisse als JSON-Datei ab.
+    python loadtest.py compare results/vorher.json results/nachher.json
+        Vergleicht die Ergebnisse zweier Läufe.
+"""
+
+import argparse
+import contextlib
+import http.client
+import io
+import json
+import logging
+import math
+import os
+import platform
+import random
+import re
+import sys
+import threading
+import time
+
+import BenchmarkEnvironment
+
+"""Die Szenarien samt Standardgewichtung (relativer Anteil an allen Requests)."""
+DEFAULT_WEIGHTS = {
+    'create_customer': 5,
+    'open_account': 5,
+    'post_transaction': 20,
+    'read_balance': 30,
+    'list_debits': 20,
+    'list_credits': 20,
+}
+
+SERVER_TIMING_QUERIES = re.compile(r'db;[^,]*desc="(\d+) queries"')
+
+
+class Workload (object):
+    """Die von allen Clients gemeinsam genutzten Schlüssel existierender Kunden und Konten.
+
+    Neu angelegte Kunden und Konten kommen hinzu, so dass sie in späteren Requests verwendet werden.
+    """
+
+    def __init__(self, customer_ids, account_ids):
+        self._customer_ids = list(customer_ids)
+        self._account_ids = [id for id in account_ids if id != BenchmarkEnvironment.CASH_ACCOUNT_ID]
+        self._lock = threading.Lock()
+
+    def random_customer(self, rng):
+        with self._lock:
+            return rng.choice(self._customer_ids)
+
+    def random_account(self, rng):
+        with self._lock:
+            return rng.choice(self._account_ids)
+
+    def add_customer(self, id):
+        with self._lock:
+            self._customer_ids.append(id)
+
+    def add_account(self, id):
+        with self._lock:
+            self._account_ids.append(id)
+
+    """Die Szenarien erzeugen jeweils ein Tupel (Methode, Pfad, Body, Funktion zur Auswertung der Antwort)."""
+
+    def create_customer(self, rng):
+        body = {'id': 0, 'first_name': 'Last', 'last_name': 'Test{}'.format(rng.randrange(10 ** 6))}
+        return 'POST', '/bank/customers', body, lambda data: self.add_customer(data['id'])
+
+    def open_account(self, rng):
+        return 'POST', '/bank/customers/{}/accounts'.format(self.random_customer(rng)), None, \
+            lambda data: self.add_account(data['id'])
+
+    def post_transaction(self, rng):
+        source = self.random_account(rng)
+        target = self.random_account(rng)
+        body = {'id': 0, 'source_account': source, 'target_account': target, 'amount': round(rng.uniform(1, 100), 2)}
+        return 'POST', '/bank/transactions', body, None
+
+    def read_balance(self, rng):
+        return 'GET', '/bank/accounts/{}/balance'.format(self.random_account(rng)), None, None
+
+    def list_debits(self, rng):
+        return 'GET', '/bank/account/{}/debits'.format(self.random_account(rng)), None, None
+
+    def list_credits(self, rng):
+        return 'GET', '/bank/account/{}/credits'.format(self.random_account(rng)), None, None
+
+
+class Sample (object):
+    """Messung eines einzelnen Requests."""
+    __slots__ = ('scenario', 'duration', 'status', 'queries')
+
+    def __init__(self, scenario, duration, status, queries):
+        self.scenario = scenario
+        self.duration = duration
+        self.status = status
+        self.queries = queries
+
+
+def percentile(sorted_values, p):
+    """Perzentil nach dem Nearest-Rank-Verfahren aus einer aufsteigend sortierten Liste."""
+    if len(sorted_values) == 0:
+        return None
+    rank = max(1, int(math.ceil(p / 100.0 * len(sorted_values))))
+    return sorted_values[rank - 1]
+
+
+def summarize(samples, elapsed):
+    """Verdichten von Messungen zu Durchsatz, Latenzen (ms) und Queries pro Request."""
+    durations = sorted(sample.duration * 1000 for sample in samples)
+    queries = [sample.queries for sample in samples if sample.queries is not None]
+    errors = sum(1 for sample in samples if sample.status is None or sample.status >= 400)
+
+    def rounded(value):
+        return round(value, 2) if value is not None else None
+
+    return {
+        'requests': len(samples),
+        'errors': errors,
+        'throughput': round(len(samples) / elapsed, 2) if elapsed > 0 else 0,
+        'mean_ms': rounded(sum(durations) / len(durations)) if durations else None,
+        'p50_ms': rounded(percentile(durations, 50)),
+        'p95_ms': rounded(percentile(durations, 95)),
+        'p99_ms': rounded(percentile(durations, 99)),
+        'max_ms': rounded(durations[-1]) if durations else None,
+        'queries_per_request': rounded(sum(queries) / len(queries)) if queries else None,
+    }
+
+
+def client(port, workload, weights, rng, deadline, warmup_end, samples):
+    """Ein einzelner Client, der bis zum Ende der Laufzeit Requests nacheinander absendet."""
+    scenarios = sorted(weights)
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+    headers = {'Cookie': 'token=' + BenchmarkEnvironment.TEST_TOKEN, 'Content-Type': 'application/json'}
+
+    while time.monotonic() < deadline:
+        scenario = rng.choices(scenarios, [weights[name] for name in scenarios])[0]
+        method, path, body, on_success = getattr(workload, scenario)(rng)
+
+        status = None
+        queries = None
+        start = time.perf_counter()
+        try:
+            connection.request(method, path, json.dumps(body) if body is not None else None, headers)
+            response = connection.getresponse()
+            data = response.read()
+            status = response.status
+        except (OSError, http.client.HTTPException):
+            connection.close()
+        duration = time.perf_counter() - start
+
+        if status is not None:
+            match = SERVER_TIMING_QUERIES.search(response.getheader('Server-Timing', ''))
+            if match is not None:
+                queries = int(match.group(1))
+
+            if status < 400 and on_success is not None:
+                on_success(json.loads(data))
+
+        if time.monotonic() >= warmup_end:
+            samples.append(Sample(scenario, duration, status, queries))
+
+    connection.close()
+
+
+def start_server(verbose=False):
+    """Starten der Flask-App aus main.py in einem lokalen Server auf einem freien Port."""
+    from werkzeug.serving import make_server
+
+    if not verbose:
+        logging.getLogger('werkzeug').setLevel(logging.WARNING)
+
+    BenchmarkEnvironment.install_test_authenticator()
+    from main import app
+
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def parse_weights(text):
+    """Einlesen von Gewichten wie read_balance=50,post_transaction=10 (fehlende Szenarien behalten ihr Gewicht)."""
+    weights = dict(DEFAULT_WEIGHTS)
+    for item in filter(None, (text or '').split(',')):
+        name, _, value = item.partition('=')
+        if name.strip() not in DEFAULT_WEIGHTS:
+            raise argparse.ArgumentTypeError("Unbekanntes Szenario: {}".format(name))
+        weights[name.strip()] = float(value)
+    return {name: weight for (name, weight) in weights.items() if weight > 0}
+
+
+def seed(args):
+    """Befüllen der Benchmark-Datenbank."""
+    BenchmarkEnvironment.check_database(args.force)
+
+    if args.create_schema:
+        for migration in BenchmarkEnvironment.create_schema():
+            print("Angewendet:", migration)
+
+    counts = BenchmarkEnvironment.seed(args.customers, args.accounts_per_customer,
+                                       args.transactions_per_account, args.random_seed)
+    print("Angelegt: {customers} Kunden, {accounts} Konten, {transactions} Buchungen.".format(**counts))
+    return 0
+
+
+def run(args):
+    """Ausführen des Lasttests und Ablegen der Ergebnisse."""
+    BenchmarkEnvironment.check_database(args.force)
+
+    workload = Workload(BenchmarkEnvironment.load_ids('customers'), BenchmarkEnvironment.load_ids('accounts'))
+    scale = BenchmarkEnvironment.count_rows()
+    server = start_server(args.verbose)
+
+    samples = []
+    threads = []
+    now = time.monotonic()
+    warmup_end = now + args.warmup
+    deadline = warmup_end + args.duration
+
+    print("Lasttest gegen {}: {} Clients, {} s (+{} s Warmup), Datenbestand {}".format(
+        BenchmarkEnvironment.get_database_name(), args.concurrency, args.duration, args.warmup, scale))
+
+    """Die Ausgaben des Servers (eine Zeile pro Request) würden das Ergebnis unleserlich machen."""
+    output = sys.stdout if args.verbose else io.StringIO()
+    with contextlib.redirect_stdout(output):
+        for index in range(args.concurrency):
+            thread = threading.Thread(target=client, args=(server.server_port, workload, args.weights,
+                                                           random.Random(args.random_seed + index),
+                                                           deadline, warmup_end, samples))
+            thread.start()
+            threads.append(thread)
+
+        for thread in threads:
+            thread.join()
+
+    server.shutdown()
+
+    result = {
+        'label': args.label,
+        'started': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'config': {
+            'database': BenchmarkEnvironment.get_database_name(),
+            'scale': scale,
+            'concurrency': args.concurrency,
+            'duration': args.duration,
+            'warmup': args.warmup,
+            'weights': args.weights,
+            'python': platform.python_version(),
+        },
+        'total': summarize(samples, args.duration),
+        'scenarios': {name: summarize([s for s in samples if s.scenario == name], args.duration)
+                      for name in sorted(args.weights)},
+    }
+
+    print_result(result)
+
+    if args.output:
+        directory = os.path.dirname(args.output)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump(result, file, indent=2)
+        print("Ergebnisse abgelegt in", args.output)
+
+    return 0
+
+
+COLUMNS = ('requests', 'errors', 'throughput', 'p50_ms', 'p95_ms', 'p99_ms', 'queries_per_request')
+
+
+def print_result(result):
+    print("{:<18}".format('') + "".join("{:>20}".format(column) for column in COLUMNS))
+    for (name, summary) in [('total', result['total'])] + sorted(result['scenarios'].items()):
+        print("{:<18}".format(name) + "".join("{:>20}".format(str(summary[column])) for column in COLUMNS))
+
+
+def compare(args):
+    """Gegenüberstellen zweier Läufe (Werte des zweiten Laufs samt Abweichung in Prozent)."""
+    with open(args.baseline, encoding='utf-8') as file:
+        baseline = json.load(file)
+    with open(args.current, encoding='utf-8') as file:
+        current = json.load(file)
+
+    print("Vergleich {} ({}) mit {} ({})".format(args.baseline, baseline.get('label'),
+                                                 args.current, current.get('label')))
+    if baseline['config'].get('scale') != current['config'].get('scale') \
+            or baseline['config'].get('concurrency') != current['config'].get('concurrency'):
+        print("ACHTUNG: Datenbestand bzw. Anzahl der Clients unterscheiden sich.")
+
+    names = ['total'] + sorted(set(baseline['scenarios']) & set(current['scenarios']))
+    print("{:<18}".format('') + "".join("{:>24}".format(column) for column in COLUMNS[2:]))
+
+    for name in names:
+        old = baseline['total'] if name == 'total' else baseline['scenarios'][name]
+        new = current['total'] if name == 'total' else current['scenarios'][name]
+
+        cells = []
+        for column in COLUMNS[2:]:
+            if old.get(column) and new.get(column) is not None:
+                cells.append("{} ({:+.1f}%)".format(new[column], (new[column] - old[column]) / old[column] * 100))
+            else:
+                cells.append(str(new.get(column)))
+        print("{:<18}".format(name) + "".join("{:>24}".format(cell) for cell in cells))
+
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Lasttest für das Bank-Beispiel.')
+    commands = parser.add_subparsers(dest='command')
+    commands.required = True
+
+    seed_parser = commands.add_parser('seed', help='Benchmark-Datenbank befüllen')
+    seed_parser.add_argument('--create-schema', action='store_true', help='Schema aus dem SQL-Dump anlegen')
+    seed_parser.add_argument('--customers', type=int, default=100)
+    seed_parser.add_argument('--accounts-per-customer', type=int, default=2)
+    seed_parser.add_argument('--transactions-per-account', type=int, default=20)
+    seed_parser.set_defaults(handler=seed)
+
+    run_parser = commands.add_parser('run', help='Lasttest ausführen')
+    run_parser.add_argument('--concurrency', type=int, default=8, help='Anzahl paralleler Clients')
+    run_parser.add_argument('--duration', type=float, default=30, help='Dauer der Messung in Sekunden')
+    run_parser.add_argument('--warmup', type=float, default=3, help='Nicht gemessene Anlaufzeit in Sekunden')
+    run_parser.add_argument('--weights', type=parse_weights, default=dict(DEFAULT_WEIGHTS),
+                            help='Gewichte der Szenarien, z.B. read_balance=50,create_customer=0')
+    run_parser.add_argument('--label', default='', help='Bezeichnung des Laufs, z.B. der Git-Commit')
+    run_parser.add_argument('--output', help='Pfad der JSON-Datei für die Ergebnisse')
+    run_parser.add_argument('--verbose', action='store_true', help='Ausgaben des Servers anzeigen')
+    run_parser.set_defaults(handler=run)
+
+    for subparser in (seed_parser, run_parser):
+        subparser.add_argument('--random-seed', type=int, default=42)
+        subparser.add_argument('--force', action='store_true',
+                               help='Auch Datenbanken ohne "bench" im Namen verwenden')
+
+    compare_parser = commands.add_parser('compare', help='Ergebnisse zweier Läufe vergleichen')
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('current')
+    compare_parser.set_defaults(handler=compare)
+
+    args = parser.parse_args(argv)
+    return args.handler(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
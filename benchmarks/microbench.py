@@ -0,0 +1,378 @@
+"""
+Micro-Benchmarks für die Mapper (server/db) und Business Objects (server/bo).
+
+Im Gegensatz zum Lasttest (vgl. loadtest.py) wird hier jede Operation einzeln und ohne HTTP
+gemessen. Alle Ergebnisse sind Raten (Zeilen, Objekte bzw. Aufrufe pro Sekunde); höhere Werte
+sind also besser. Jede Messung wird mehrfach wiederholt, es zählt der beste Durchgang.
+
+Aufruf (im Verzeichnis /benchmarks, z.B. mit DB_NAME=bankproject_bench):
+    python microbench.py seed --customers 1000
+        Befüllt die Datenbank (wie loadtest.py seed) und legt zusätzlich je ein Konto mit
+        10, 1.000 und 100.000 Buchungen an.
+    python microbench.py run --save results/baseline.json
+        Führt sämtliche Benchmarks aus und legt die Ergebnisse als Baseline ab.
+    python microbench.py run --baseline results/baseline.json --max-regression 10
+        Vergleicht mit der Baseline. Der Exit Code ist 1, sobald ein Wert um mehr als 10% schlechter ist.
+
+Mit --no-db werden nur die Benchmarks ausgeführt, die keine Datenbank benötigen (from_dict,
+from_tuple, Marshalling). Mit --filter lässt sich die Auswahl weiter einschränken, z.B.
+--filter TransactionMapper.
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import sys
+import time
+
+import BenchmarkEnvironment
+
+from server.BankAdministration import BankAdministration
+from server.bo.Account import Account
+from server.bo.Customer import Customer
+from server.bo.Transaction import Transaction
+from server.bo.User import User
+from server.db.AccountMapper import AccountMapper
+from server.db.CustomerMapper import CustomerMapper
+from server.db.TransactionMapper import TransactionMapper
+from server.db.UserMapper import UserMapper
+
+"""Anzahl der Buchungen der Konten, für die wir die Ermittlung des Kontostands messen."""
+LEDGER_SIZES = (10, 1000, 100000)
+
+"""Anzahl der Objekte bzw. Schlüssel für die Benchmarks auf Sammlungen."""
+BATCH_SIZE = 500
+
+
+class Benchmark (object):
+    """Eine einzelne Messung.
+
+    function erhält den Kontext (vgl. prepare_context) und liefert die Anzahl der verarbeiteten
+    Einheiten (z.B. Zeilen) zurück.
+    """
+
+    def __init__(self, name, unit, function, needs_db=True):
+        self.name = name
+        self.unit = unit
+        self.function = function
+        self.needs_db = needs_db
+
+    def measure(self, context, min_time, repeat):
+        """Ermitteln der besten Rate (Einheiten pro Sekunde) aus repeat Durchgängen von jeweils min. min_time Sekunden."""
+        best = 0.0
+
+        for i in range(repeat):
+            gc.collect()
+            units = 0
+            start = time.perf_counter()
+
+            while True:
+                units += self.function(context)
+                elapsed = time.perf_counter() - start
+                if elapsed >= min_time:
+                    break
+
+            best = max(best, units / elapsed)
+
+        return best
+
+
+def mapper_call(mapper_class, method, arguments, unit='rows'):
+    """Benchmark einer Mapper-Methode samt Beschaffen der Verbindung aus dem Pool (wie im Server).
+
+    :param arguments Funktion, die aus dem Kontext die Parameter der Methode als Tupel bildet
+    """
+    def function(context):
+        with mapper_class() as mapper:
+            result = getattr(mapper, method)(*arguments(context))
+
+        if unit == 'calls':
+            return 1
+        return len(result) if isinstance(result, (list, tuple, set, dict)) else int(result is not None)
+
+    return Benchmark('mapper.{}.{}'.format(mapper_class.__name__, method), unit, function)
+
+
+def bo_call(name, function, data_key):
+    """Benchmark einer Umwandlung, die auf jedes Element der Testdaten data_key angewandt wird."""
+    def run(context):
+        data = context[data_key]
+        for row in data:
+            function(row)
+        return len(data)
+
+    return Benchmark(name, 'objects', run, needs_db=False)
+
+
+def marshal_call(name, model_name, data_key, fast=False):
+    """Benchmark des Marshallings einer Liste von Objekten mit einem api.model aus main.py."""
+    def run(context):
+        model = getattr(context['main'], model_name)
+        data = context[data_key]
+
+        if fast:
+            context['serialize'](data, model)
+        else:
+            with context['main'].app.test_request_context():
+                context['marshal'](data, model)
+        return len(data)
+
+    return Benchmark(name, 'objects', run, needs_db=False)
+
+
+def balance_call(size):
+    def run(context):
+        BankAdministration().get_balance_of_account(context['ledger_accounts'][size])
+        return 1
+
+    return Benchmark('balance.get_balance_of_account.n{}'.format(size), 'calls', run)
+
+
+def ledger_aggregate_call(size):
+    """Zum Vergleich: Summieren sämtlicher Buchungen statt Lesen des materialisierten Kontostands."""
+    def run(context):
+        with TransactionMapper() as mapper:
+            mapper.find_balance_aggregate_by_account_id(context['ledger_accounts'][size].get_id())
+        return 1
+
+    return Benchmark('balance.ledger_aggregate.n{}'.format(size), 'calls', run)
+
+
+def get_benchmarks():
+    """Sämtliche Benchmarks in der Reihenfolge ihrer Ausführung."""
+    benchmarks = [
+        mapper_call(CustomerMapper, 'find_all', lambda c: ()),
+        mapper_call(CustomerMapper, 'find_page', lambda c: (0, BATCH_SIZE)),
+        mapper_call(CustomerMapper, 'find_by_last_name', lambda c: (c['customer'].get_last_name(),)),
+        mapper_call(CustomerMapper, 'find_by_key', lambda c: (c['customer'].get_id(),)),
+        mapper_call(CustomerMapper, 'find_by_keys', lambda c: (c['customer_ids'],)),
+
+        mapper_call(AccountMapper, 'find_all', lambda c: ()),
+        mapper_call(AccountMapper, 'find_page', lambda c: (0, BATCH_SIZE)),
+        mapper_call(AccountMapper, 'find_by_owner_id', lambda c: (c['customer'].get_id(),)),
+        mapper_call(AccountMapper, 'find_with_balances_by_owner_id', lambda c: (c['customer'].get_id(),)),
+        mapper_call(AccountMapper, 'find_by_key', lambda c: (c['account'].get_id(),)),
+        mapper_call(AccountMapper, 'find_by_keys', lambda c: (c['account_ids'],)),
+        mapper_call(AccountMapper, 'find_existing_ids', lambda c: (c['account_ids'],)),
+
+        mapper_call(TransactionMapper, 'find_all', lambda c: ()),
+        mapper_call(TransactionMapper, 'find_by_source_account_id', lambda c: (c['account'].get_id(),)),
+        mapper_call(TransactionMapper, 'find_page_by_source_account_id',
+                    lambda c: (c['account'].get_id(), 0, BATCH_SIZE)),
+        mapper_call(TransactionMapper, 'find_by_target_account_id', lambda c: (c['ledger_accounts'][1000].get_id(),)),
+        mapper_call(TransactionMapper, 'find_page_by_target_account_id',
+                    lambda c: (c['ledger_accounts'][1000].get_id(), 0, BATCH_SIZE)),
+        mapper_call(TransactionMapper, 'find_by_key', lambda c: (c['transaction_ids'][0],)),
+        mapper_call(TransactionMapper, 'find_by_keys', lambda c: (c['transaction_ids'],)),
+
+        mapper_call(UserMapper, 'find_all', lambda c: ()),
+        mapper_call(UserMapper, 'find_by_name', lambda c: (c['user'].get_name(),)),
+        mapper_call(UserMapper, 'find_by_email', lambda c: (c['user'].get_email(),)),
+        mapper_call(UserMapper, 'find_by_google_user_id', lambda c: (c['user'].get_user_id(),)),
+        mapper_call(UserMapper, 'find_by_key', lambda c: (c['user'].get_id(),)),
+    ]
+
+    benchmarks.extend(balance_call(size) for size in LEDGER_SIZES)
+    benchmarks.extend(ledger_aggregate_call(size) for size in LEDGER_SIZES)
+
+    benchmarks.extend([
+        bo_call('bo.Customer.from_dict', Customer.from_dict, 'customer_dicts'),
+        bo_call('bo.Account.from_dict', Account.from_dict, 'account_dicts'),
+        bo_call('bo.Transaction.from_dict', Transaction.from_dict, 'transaction_dicts'),
+        bo_call('bo.User.from_dict', User.from_dict, 'user_dicts'),
+        bo_call('bo.Customer.from_tuple', Customer.from_tuple, 'customer_tuples'),
+        bo_call('bo.Account.from_tuple', Account.from_tuple, 'account_tuples'),
+        bo_call('bo.Transaction.from_tuple', Transaction.from_tuple, 'transaction_tuples'),
+        bo_call('bo.User.from_tuple', User.from_tuple, 'user_tuples'),
+    ])
+
+    for (model_name, data_key) in (('customer', 'customers'), ('account', 'accounts'),
+                                   ('transaction', 'transactions'), ('user', 'users'),
+                                   ('customer_overview', 'overviews')):
+        benchmarks.append(marshal_call('marshal.{}'.format(model_name), model_name, data_key))
+        benchmarks.append(marshal_call('serialize.{}'.format(model_name), model_name, data_key, fast=True))
+
+    return benchmarks
+
+
+def prepare_context(use_db):
+    """Bereitstellen der Testdaten sämtlicher Benchmarks.
+
+    Die Daten für from_dict, from_tuple und das Marshalling werden synthetisch erzeugt, alle
+    übrigen stammen aus der (zuvor mit seed befüllten) Datenbank.
+    """
+    import flask_restx
+
+    import main
+    import Serializer
+
+    customer_tuples = [(id, 'Vorname{}'.format(id), 'Nachname{}'.format(id)) for id in range(BATCH_SIZE)]
+    account_tuples = [(id, id // 2) for id in range(BATCH_SIZE)]
+    transaction_tuples = [(id, id, id + 1, id * 1.5) for id in range(BATCH_SIZE)]
+    user_tuples = [(id, 'Benutzer{}'.format(id), 'b{}@example.com'.format(id), 'google-{}'.format(id))
+                   for id in range(BATCH_SIZE)]
+
+    customers = list(map(Customer.from_tuple, customer_tuples))
+    accounts = list(map(Account.from_tuple, account_tuples))
+
+    context = {
+        'main': main,
+        'marshal': flask_restx.marshal,
+        'serialize': Serializer.serialize,
+        'customer_tuples': customer_tuples,
+        'account_tuples': account_tuples,
+        'transaction_tuples': transaction_tuples,
+        'user_tuples': user_tuples,
+        'customer_dicts': [{'id': c[0], 'first_name': c[1], 'last_name': c[2]} for c in customer_tuples],
+        'account_dicts': [{'id': a[0], 'owner': a[1]} for a in account_tuples],
+        'transaction_dicts': [{'id': t[0], 'source_account': t[1], 'target_account': t[2], 'amount': t[3]}
+                              for t in transaction_tuples],
+        'user_dicts': [{'id': u[0], 'name': u[1], 'email': u[2], 'user_id': u[3]} for u in user_tuples],
+        'customers': customers,
+        'accounts': accounts,
+        'transactions': list(map(Transaction.from_tuple, transaction_tuples)),
+        'users': list(map(User.from_tuple, user_tuples)),
+        'overviews': [{'customer': customer,
+                       'accounts': [{'account': account, 'credit': 10.0, 'debit': 5.0, 'balance': 5.0}
+                                    for account in accounts[:3]]}
+                      for customer in customers[:BATCH_SIZE // 4]],
+    }
+
+    if use_db:
+        ledger_accounts = BenchmarkEnvironment.find_ledger_accounts()
+        missing = [size for size in LEDGER_SIZES if size not in ledger_accounts]
+        if missing:
+            raise RuntimeError("Es fehlen Konten mit {} Buchungen. Bitte zuerst python microbench.py seed "
+                               "ausführen.".format(missing))
+
+        adm = BankAdministration()
+        context['customer'] = adm.get_customer_by_id(BenchmarkEnvironment.load_ids('customers')[0])
+        context['account'] = adm.get_accounts_of_customer(context['customer'])[0]
+        context['customer_ids'] = BenchmarkEnvironment.load_ids('customers')[:BATCH_SIZE]
+        context['account_ids'] = BenchmarkEnvironment.load_ids('accounts')[:BATCH_SIZE]
+        context['transaction_ids'] = BenchmarkEnvironment.load_ids('transactions')[:BATCH_SIZE]
+        context['ledger_accounts'] = {size: adm.get_account_by_id(id) for (size, id) in ledger_accounts.items()}
+
+        with UserMapper() as mapper:
+            context['user'] = mapper.find_all()[0]
+
+    return context
+
+
+def seed(args):
+    """Befüllen der Benchmark-Datenbank samt der Konten für die Messung der Kontostände."""
+    BenchmarkEnvironment.check_database(args.force)
+
+    if args.create_schema:
+        for migration in BenchmarkEnvironment.create_schema():
+            print("Angewendet:", migration)
+
+    counts = BenchmarkEnvironment.seed(args.customers, args.accounts_per_customer,
+                                       args.transactions_per_account, args.random_seed)
+    print("Angelegt: {customers} Kunden, {accounts} Konten, {transactions} Buchungen.".format(**counts))
+
+    for (size, account_id) in sorted(BenchmarkEnvironment.seed_ledger_accounts(LEDGER_SIZES).items()):
+        print("Konto {} mit {} Buchungen.".format(account_id, size))
+    return 0
+
+
+def run(args):
+    """Ausführen der Benchmarks, optional mit Vergleich gegen eine Baseline."""
+    use_db = not args.no_db
+    if use_db:
+        BenchmarkEnvironment.check_database(args.force)
+
+    context = prepare_context(use_db)
+    benchmarks = [benchmark for benchmark in get_benchmarks()
+                  if (use_db or not benchmark.needs_db) and (args.filter or '') in benchmark.name]
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as file:
+            baseline = json.load(file)['results']
+
+    results = {}
+    regressions = []
+
+    for benchmark in benchmarks:
+        rate = benchmark.measure(context, args.min_time, args.repeat)
+        results[benchmark.name] = {'rate': round(rate, 1), 'unit': benchmark.unit}
+
+        line = "{:<60}{:>16.1f} {}/s".format(benchmark.name, rate, benchmark.unit)
+
+        previous = (baseline or {}).get(benchmark.name)
+        if previous is not None and previous['rate'] > 0:
+            change = (rate - previous['rate']) / previous['rate'] * 100
+            line += "  ({:+.1f}%)".format(change)
+            if change < -args.max_regression:
+                regressions.append((benchmark.name, change))
+                line += "  REGRESSION"
+
+        print(line)
+
+    if args.save:
+        directory = os.path.dirname(args.save)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(args.save, 'w', encoding='utf-8') as file:
+            json.dump({
+                'label': args.label,
+                'started': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'config': {
+                    'database': BenchmarkEnvironment.get_database_name() if use_db else None,
+                    'scale': BenchmarkEnvironment.count_rows() if use_db else None,
+                    'min_time': args.min_time,
+                    'repeat': args.repeat,
+                    'python': platform.python_version(),
+                },
+                'results': results,
+            }, file, indent=2)
+        print("Ergebnisse abgelegt in", args.save)
+
+    if regressions:
+        print("{} Benchmarks sind um mehr als {}% schlechter als die Baseline:".format(
+            len(regressions), args.max_regression))
+        for (name, change) in regressions:
+            print("  {} ({:+.1f}%)".format(name, change))
+        return 1
+
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Micro-Benchmarks für Mapper und Business Objects.')
+    commands = parser.add_subparsers(dest='command')
+    commands.required = True
+
+    seed_parser = commands.add_parser('seed', help='Benchmark-Datenbank befüllen')
+    seed_parser.add_argument('--create-schema', action='store_true', help='Schema aus dem SQL-Dump anlegen')
+    seed_parser.add_argument('--customers', type=int, default=1000)
+    seed_parser.add_argument('--accounts-per-customer', type=int, default=2)
+    seed_parser.add_argument('--transactions-per-account', type=int, default=20)
+    seed_parser.add_argument('--random-seed', type=int, default=42)
+    seed_parser.set_defaults(handler=seed)
+
+    run_parser = commands.add_parser('run', help='Benchmarks ausführen')
+    run_parser.add_argument('--min-time', type=float, default=0.5, help='Mindestdauer eines Durchgangs in Sekunden')
+    run_parser.add_argument('--repeat', type=int, default=3, help='Anzahl der Durchgänge je Benchmark')
+    run_parser.add_argument('--filter', help='Nur Benchmarks, deren Name diesen Text enthält')
+    run_parser.add_argument('--no-db', action='store_true', help='Nur Benchmarks ohne Datenbank ausführen')
+    run_parser.add_argument('--label', default='', help='Bezeichnung des Laufs, z.B. der Git-Commit')
+    run_parser.add_argument('--save', help='Pfad der JSON-Datei für die Ergebnisse (z.B. als neue Baseline)')
+    run_parser.add_argument('--baseline', help='JSON-Datei eines früheren Laufs zum Vergleich')
+    run_parser.add_argument('--max-regression', type=float, default=10.0,
+                            help='Zulässige Verschlechterung gegenüber der Baseline in Prozent')
+    run_parser.set_defaults(handler=run)
+
+    for subparser in (seed_parser, run_parser):
+        subparser.add_argument('--force', action='store_true',
+                               help='Auch Datenbanken ohne "bench" im Namen verwenden')
+
+    args = parser.parse_args(argv)
+    return args.handler(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -66,6 +66,35 @@ INSERT INTO `customers` VALUES (1,'Herbert','Müller'),(2,'Bernd','Sparbier'),(3
 /*!40000 ALTER TABLE `customers` ENABLE KEYS */;
 UNLOCK TABLES;
 
+--
+-- Table structure for table `id_sequences`
+--
+
+DROP TABLE IF EXISTS `id_sequences`;
+/*!40101 SET @saved_cs_client     = @@character_set_client */;
+/*!40101 SET character_set_client = utf8 */;
+CREATE TABLE `id_sequences` (
+  `name` varchar(64) NOT NULL DEFAULT '',
+  `next_id` int(11) NOT NULL DEFAULT '1',
+  PRIMARY KEY (`name`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8;
+/*!40101 SET character_set_client = @saved_cs_client */;
+
+--
+-- Table structure for table `resource_versions`
+--
+
+DROP TABLE IF EXISTS `resource_versions`;
+/*!40101 SET @saved_cs_client     = @@character_set_client */;
+/*!40101 SET character_set_client = utf8 */;
+CREATE TABLE `resource_versions` (
+  `name` varchar(64) NOT NULL DEFAULT '',
+  `version` bigint NOT NULL DEFAULT '0',
+  `changed_at` datetime(6) NOT NULL,
+  PRIMARY KEY (`name`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8;
+/*!40101 SET character_set_client = @saved_cs_client */;
+
 --
 -- Table structure for table `transactions`
 --
@@ -77,7 +106,7 @@ CREATE TABLE `transactions` (
   `id` int(11) NOT NULL DEFAULT '0',
   `sourceAccount` int(11) NOT NULL DEFAULT '0',
   `targetAccount` int(11) NOT NULL DEFAULT '0',
-  `amount` float NOT NULL DEFAULT '0',
+  `amount` double NOT NULL DEFAULT '0',
   PRIMARY KEY (`id`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8;
 /*!40101 SET character_set_client = @saved_cs_client */;
@@ -92,6 +121,32 @@ INSERT INTO `transactions` VALUES (1,1,2,100),(2,1,2,67.3),(3,2,1,16.5),(4,10000
 /*!40000 ALTER TABLE `transactions` ENABLE KEYS */;
 UNLOCK TABLES;
 
+--
+-- Table structure for table `account_balances`
+--
+
+DROP TABLE IF EXISTS `account_balances`;
+/*!40101 SET @saved_cs_client     = @@character_set_client */;
+/*!40101 SET character_set_client = utf8 */;
+CREATE TABLE `account_balances` (
+  `account` int(11) NOT NULL DEFAULT '0',
+  `credit` double NOT NULL DEFAULT '0',
+  `debit` double NOT NULL DEFAULT '0',
+  PRIMARY KEY (`account`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8;
+/*!40101 SET character_set_client = @saved_cs_client */;
+
+--
+-- Initial data for table `account_balances` (derived from `transactions`)
+--
+
+INSERT INTO `account_balances` (`account`, `credit`, `debit`)
+  SELECT `account`, SUM(`credit`), SUM(`debit`) FROM (
+    SELECT `targetAccount` AS `account`, `amount` AS `credit`, 0 AS `debit` FROM `transactions`
+    UNION ALL
+    SELECT `sourceAccount` AS `account`, 0 AS `credit`, `amount` AS `debit` FROM `transactions`
+  ) AS `ledger` GROUP BY `account`;
+
 --
 -- Table structure for table `users`
 --
@@ -0,0 +1,128 @@
+import zlib
+from datetime import datetime, timedelta, timezone
+
+from flask import current_app, request, Response
+from flask_restx.utils import unpack
+from werkzeug.http import http_date, quote_etag
+
+from SecurityDecorator import is_authenticated
+from StreamingDecorator import requested_stream_format
+from server.BankAdministration import BankAdministration
+
+
+def conditional(*names):
+    """Decorator für bedingte Abrufe (Conditional GET) mittels ETag und Last-Modified.
+
+    Viele Abrufe des Frontends (Polling) liefern unveränderte Daten. Statt jedes Mal die komplette
+    Abfrage samt Marshalling auszuführen, liest dieser Decorator zunächst lediglich die
+    Versionszähler der betroffenen Ressourcen aus (vgl. ResourceVersionMapper). Stimmt der daraus
+    gebildete ETag mit dem Header If-None-Match überein (bzw. liegt die letzte Änderung nicht
+    nach If-Modified-Since), so antworten wir sofort mit 304 Not Modified. Andernfalls wird die
+    dekorierte Methode wie bisher ausgeführt und ihre Antwort um ETag und Last-Modified ergänzt.
+
+    Die Namen der Ressourcen dürfen Platzhalter für die Parameter der Route enthalten, z.B.
+    @conditional('account:{id}') für /accounts/<int:id>.
+
+    Der Decorator muss *oberhalb* von marshal_with bzw. streamable und fast_serialized stehen.
+    Eine 304-Antwort erhalten nur authentifizierte Benutzer, alle anderen Anfragen werden an
+    die dekorierte Methode (und damit an secured) weitergereicht.
+
+    **Hinweis:** Die Versionszähler werden *vor* der eigentlichen Abfrage gelesen. Ändern sich
+    die Daten zwischenzeitlich, erhält der Client schlimmstenfalls einen veralteten ETag und
+    beim nächsten Abruf erneut die vollständige Antwort, nie jedoch fälschlich ein 304.
+    Dasselbe gilt für Last-Modified, das nur ganze Sekunden kennt (vgl. _last_modified).
+    """
+    def decorator(function):
+        def wrapper(*args, **kwargs):
+            if not is_authenticated():
+                return function(*args, **kwargs)
+
+            keys = [name.format(**kwargs) for name in names]
+            now = datetime.now(timezone.utc).replace(tzinfo=None)
+            versions = BankAdministration().get_resource_versions(keys)
+            etag = _etag(keys, versions)
+            changed_at = max([changed_at for (version, changed_at) in versions.values()], default=None)
+            last_modified = _last_modified(changed_at, now)
+
+            if _is_not_modified(etag, changed_at):
+                response = Response(status=304)
+                _set_validators(response.headers, etag, last_modified)
+                return response
+
+            result = function(*args, **kwargs)
+
+            if isinstance(result, Response):
+                if result.status_code == 200:
+                    _set_validators(result.headers, etag, last_modified)
+                return result
+
+            data, code, headers = unpack(result)
+            if code != 200:
+                return result
+
+            headers = dict(headers or {})
+            _set_validators(headers, etag, last_modified)
+            return data, code, headers
+
+        wrapper.__doc__ = function.__doc__
+        wrapper.__name__ = function.__name__
+        wrapper.__dict__.update(function.__dict__)
+        return wrapper
+
+    return decorator
+
+
+def _etag(keys, versions):
+    """Bilden des ETags aus den Versionszählern der Ressourcen.
+
+    Fordert der Client eine andere Darstellung an (X-Fields bzw. Streaming), so erhält diese
+    einen eigenen ETag.
+    """
+    tag = ".".join(str(versions.get(key, (0, None))[0]) for key in keys)
+
+    variant = "{}|{}".format(request.headers.get(current_app.config.get('RESTX_MASK_HEADER', 'X-Fields'), ''),
+                             requested_stream_format() or '')
+    if variant != "|":
+        tag += "-{:08x}".format(zlib.crc32(variant.encode('utf-8')))
+
+    return tag
+
+
+def _round_up(timestamp):
+    """Aufrunden eines Zeitpunkts auf die nächste volle Sekunde."""
+    if timestamp.microsecond == 0:
+        return timestamp
+    return timestamp.replace(microsecond=0) + timedelta(seconds=1)
+
+
+def _last_modified(changed_at, now):
+    """Ermitteln des Zeitpunkts für den Header Last-Modified, der nur ganze Sekunden kennt.
+
+    Die letzte Änderung (changed_at, mit Mikrosekunden) wird auf die nächste volle Sekunde
+    aufgerundet, höchstens jedoch bis zur vollen Sekunde vor dem Lesen der Versionszähler (now).
+    Eine spätere Änderung liegt damit stets *nach* dem Last-Modified, das der Client erhält, auch
+    wenn sie in derselben Sekunde erfolgt (vgl. _is_not_modified).
+    """
+    if changed_at is None:
+        return None
+    return min(_round_up(changed_at), now.replace(microsecond=0))
+
+
+def _is_not_modified(etag, changed_at):
+    """Auswerten von If-None-Match bzw. (nur falls dieser fehlt) If-Modified-Since."""
+    if request.headers.get('If-None-Match') is not None:
+        return request.if_none_match.contains_weak(etag)
+
+    if_modified_since = request.if_modified_since
+    if if_modified_since is not None and changed_at is not None:
+        if if_modified_since.tzinfo is not None:
+            if_modified_since = if_modified_since.astimezone(timezone.utc).replace(tzinfo=None)
+        return _round_up(changed_at) <= if_modified_since
+
+    return False
+
+
+def _set_validators(headers, etag, last_modified):
+    headers['ETag'] = quote_etag(etag)
+    if last_modified is not None:
+        headers['Last-Modified'] = http_date(last_modified.replace(tzinfo=timezone.utc))
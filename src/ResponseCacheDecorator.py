@@ -0,0 +1,99 @@
+import os
+from urllib.parse import urlencode
+
+from flask import current_app, request, Response
+
+from SecurityDecorator import is_authenticated
+from StreamingDecorator import requested_stream_format
+from server.ResponseCache import ResponseCache
+from server.db.Mapper import Mapper
+from server.db.UnitOfWork import UnitOfWork
+
+"""Sollen vollständige Antworten zwischengespeichert werden? (opt-in mit RESPONSE_CACHE=1)
+
+Das Verzeichnis lässt sich über RESPONSE_CACHE_DIR, die maximale Gültigkeitsdauer (Sekunden) über
+RESPONSE_CACHE_TTL festlegen. Alle Worker eines Hosts mit demselben Verzeichnis teilen sich den Cache."""
+enabled = os.getenv('RESPONSE_CACHE', '0') == '1'
+
+response_cache = None
+if enabled:
+    response_cache = ResponseCache(os.getenv('RESPONSE_CACHE_DIR') or None,
+                                   ttl=float(os.getenv('RESPONSE_CACHE_TTL', '60')))
+    Mapper.add_change_listener(response_cache.invalidate)
+
+"""Header der ursprünglichen Antwort, die zusammen mit dem Body abgelegt werden."""
+CACHED_HEADERS = ('ETag', 'Last-Modified', 'Link')
+
+
+def response_cached(*tables):
+    """Decorator, der die vollständige Antwort einer GET-Methode zwischenspeichert (vgl. ResponseCache).
+
+    Manche Abrufe (z.B. GET /bank/customers) liefern jedem Benutzer bis zur nächsten Änderung exakt
+    dieselbe Antwort. Statt jedes Mal SQL, Hydrierung und Serialisierung auszuführen, legen wir die
+    fertigen Bytes der Antwort ab, geordnet nach Pfad und Query-String. Angegeben werden die Tabellen,
+    von denen die Antwort abhängt, z.B. @response_cached('customers'). Jedes insert, update bzw.
+    delete eines Mappers auf einer dieser Tabellen entwertet die abgelegten Antworten.
+
+    Der Decorator muss *oberhalb* aller übrigen Decorators der Methode stehen, insbesondere oberhalb
+    von conditional und fast_serialized. Abgelegt werden nur Antworten mit Status 200, die bereits
+    als Bytes vorliegen (vgl. fast_serialized) und nicht von einem Lesereplikat gelesen wurden, da
+    dieses einen Stand vor der letzten Invalidierung zeigen kann (vgl. ReplicaRouter). Gestreamte Antworten, Abrufe mit X-Fields sowie
+    bedingte Abrufe (If-None-Match, If-Modified-Since) werden unverändert weitergereicht. Eine
+    abgelegte Antwort erhalten nur authentifizierte Benutzer.
+
+    Ohne RESPONSE_CACHE=1 bleibt die dekorierte Methode unverändert.
+    """
+    def decorator(function):
+        if response_cache is None:
+            return function
+
+        def wrapper(*args, **kwargs):
+            if not _is_cacheable() or not is_authenticated():
+                return function(*args, **kwargs)
+
+            key = _key()
+            entry = response_cache.get(key, tables)
+
+            if entry is not None:
+                body, meta = entry
+                response = Response(body, status=200, mimetype=meta['mimetype'])
+                response.headers.extend(meta['headers'])
+                response.headers['X-Response-Cache'] = 'hit'
+                return response
+
+            """Die Zähler werden *vor* dem Erzeugen der Antwort gelesen. Ändern sich die Daten
+            zwischenzeitlich, so ist die abgelegte Antwort von vornherein ungültig."""
+            generations = response_cache.get_generations(tables)
+            result = function(*args, **kwargs)
+
+            uow = UnitOfWork.current()
+            if uow is not None and uow.has_read_from_replica():
+                return result
+
+            if isinstance(result, Response) and result.status_code == 200 and not result.is_streamed:
+                headers = [(name, result.headers[name]) for name in CACHED_HEADERS if name in result.headers]
+                response_cache.put(key, tables, generations, result.get_data(),
+                                   {'mimetype': result.mimetype, 'headers': headers})
+                result.headers['X-Response-Cache'] = 'miss'
+
+            return result
+
+        wrapper.__doc__ = function.__doc__
+        wrapper.__name__ = function.__name__
+        wrapper.__dict__.update(function.__dict__)
+        return wrapper
+
+    return decorator
+
+
+def _is_cacheable():
+    return request.method == 'GET' \
+        and not request.headers.get(current_app.config.get('RESTX_MASK_HEADER', 'X-Fields')) \
+        and request.headers.get('If-None-Match') is None \
+        and request.headers.get('If-Modified-Since') is None \
+        and requested_stream_format() is None
+
+
+def _key():
+    """Bilden des Schlüssels aus Pfad und (sortiertem) Query-String, z.B. /bank/customers?limit=10"""
+    return "{}?{}".format(request.path, urlencode(sorted(request.args.items(multi=True))))
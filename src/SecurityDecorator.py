@@ -1,8 +1,157 @@
 from flask import request
 from google.auth.transport import requests
 import google.oauth2.id_token
+import hashlib
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
 
-from server.BankAdministration import BankAdministration
+from server.UserSynchronizer import UserSynchronizer
+from server.RequestTrace import RequestTrace
+
+
+class TokenCache (object):
+    """Begrenzter LRU-Cache für bereits verifizierte Firebase ID Tokens.
+
+    Schlüssel ist der SHA-256-Hash des Tokens (das Token selbst wird nicht vorgehalten),
+    Wert sind die verifizierten Claims. Ein Eintrag ist gültig, bis der im Token enthaltene
+    Ablaufzeitpunkt (Claim exp) erreicht ist. Wiederholte Anfragen derselben Browser-Session
+    sparen so die Signaturprüfung vollständig ein.
+    """
+
+    def __init__(self, max_size=1024):
+        self._max_size = max_size
+        self._entries = OrderedDict()  # Hash des Tokens -> (Claims, Ablaufzeitpunkt)
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    @staticmethod
+    def _key(id_token):
+        return hashlib.sha256(id_token.encode('utf-8')).hexdigest()
+
+    def get(self, id_token):
+        """Auslesen der Claims eines bereits verifizierten, noch nicht abgelaufenen Tokens.
+
+        :return die Claims oder None, falls das Token (noch) nicht im Cache liegt.
+        """
+        key = TokenCache._key(id_token)
+
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry is not None and entry[1] > time.time():
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return entry[0]
+
+            if entry is not None:
+                del self._entries[key]
+            self._misses += 1
+            return None
+
+    def put(self, id_token, claims):
+        """Ablegen der Claims eines soeben verifizierten Tokens."""
+        expires = claims.get('exp')
+        if expires is None:
+            return
+
+        key = TokenCache._key(id_token)
+
+        with self._lock:
+            self._entries[key] = (claims, float(expires))
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self._max_size:
+                self._entries.popitem(last=False)
+
+    def get_stats(self):
+        """Auslesen der Trefferstatistik als Tupel (Treffer, Fehlschläge, Anzahl Einträge)."""
+        with self._lock:
+            return self._hits, self._misses, len(self._entries)
+
+
+class CachingRequest (object):
+    """Transport-Adapter für google-auth, der die öffentlichen Schlüssel von Google zwischenspeichert.
+
+    Bei einem Cache-Miss im TokenCache muss die Signatur des Tokens geprüft werden. Hierzu lädt
+    google-auth jedes Mal die öffentlichen Zertifikate von Google herunter. Dieser Adapter hält die
+    Antwort so lange vor, wie es der Header Cache-Control (max-age) der Antwort erlaubt. Alle
+    übrigen Anfragen werden an den zugrunde liegenden Adapter durchgereicht, der eine dauerhafte
+    HTTP-Session (Keep-Alive) nutzt.
+    """
+
+    MAX_AGE = re.compile(r'max-age=(\d+)')
+
+    def __init__(self, request_adapter):
+        self._request = request_adapter
+        self._responses = {}  # URL -> (Antwort, Ablaufzeitpunkt)
+        self._lock = threading.Lock()
+
+    def __call__(self, url, method='GET', body=None, headers=None, timeout=None, **kwargs):
+        if method != 'GET' or body is not None:
+            return self._request(url, method=method, body=body, headers=headers, timeout=timeout, **kwargs)
+
+        with self._lock:
+            cached = self._responses.get(url)
+        if cached is not None and cached[1] > time.time():
+            return cached[0]
+
+        response = self._request(url, method=method, headers=headers, timeout=timeout, **kwargs)
+
+        if response.status == 200:
+            match = CachingRequest.MAX_AGE.search(response.headers.get('cache-control', ''))
+            if match is not None:
+                with self._lock:
+                    self._responses[url] = (response, time.time() + int(match.group(1)))
+
+        return response
+
+
+"""Prozessweit genutzte Objekte für die Verifikation: ein Adapter mit dauerhafter HTTP-Session
+und Zertifikats-Cache sowie der Cache für bereits verifizierte Tokens."""
+firebase_request_adapter = CachingRequest(requests.Request())
+token_cache = TokenCache(int(os.getenv('TOKEN_CACHE_SIZE', '1024')))
+
+"""Abgleich der Benutzerdaten. Mit USER_WRITE_BEHIND=1 wird im Hintergrund geschrieben."""
+user_synchronizer = UserSynchronizer(write_behind=os.getenv('USER_WRITE_BEHIND', '0') == '1')
+
+
+def verify_token(id_token):
+    """Verifizieren eines Firebase ID Tokens.
+
+    Bereits verifizierte Tokens werden bis zu ihrem Ablauf aus dem TokenCache beantwortet.
+
+    :return die Claims des Tokens, None falls das Token nicht verifiziert werden konnte.
+    :raise ValueError falls das Token abgelaufen oder ungültig ist.
+    """
+    claims = token_cache.get(id_token)
+
+    if claims is None:
+        claims = google.oauth2.id_token.verify_firebase_token(id_token, firebase_request_adapter)
+        if claims is not None:
+            token_cache.put(id_token, claims)
+
+    return claims
+
+
+def is_authenticated():
+    """Prüfen des Firebase ID Tokens des aktuellen Requests, ohne den Benutzer abzugleichen (vgl. secured).
+
+    Decorators, die eine Antwort ohne Aufruf der dekorierten Methode liefern (z.B. conditional),
+    stellen so sicher, dass dies nur für angemeldete Benutzer geschieht.
+    """
+    id_token = request.cookies.get("token")
+    if not id_token:
+        return False
+
+    try:
+        with RequestTrace.measure('auth'):
+            return verify_token(id_token) is not None
+    except ValueError:
+        return False
 
 
 def secured(function):
@@ -15,11 +164,10 @@ def secured(function):
 
     POLICY: Die hier demonstrierte Policy ist, dass jeder, der einen durch Firebase akzeptierten
     Account besitzt, sich an diesem System anmelden kann. Bei jeder Anmeldung werden Klarname,
-    Mail-Adresse sowie die Google User ID in unserem System gespeichert bzw. geupdated. Auf diese
-    Weise könnte dann für eine Erweiterung des Systems auf jene Daten zurückgegriffen werden.
+    Mail-Adresse sowie die Google User ID in unserem System gespeichert bzw. geupdated, sofern
+    sie sich geändert haben (vgl. UserSynchronizer). Auf diese Weise könnte dann für eine
+    Erweiterung des Systems auf jene Daten zurückgegriffen werden.
     """
-    firebase_request_adapter = requests.Request()
-
     def wrapper(*args, **kwargs):
         # Verify Firebase auth.
         id_token = request.cookies.get("token")
@@ -29,41 +177,33 @@ def secured(function):
 
         if id_token:
             try:
-                # Verify the token against the Firebase Auth API. This example
-                # verifies the token on each page load. For improved performance,
-                # some applications may wish to cache results in an encrypted
-                # session store (see for instance
-                # http://flask.pocoo.org/docs/1.0/quickstart/#sessions).
-                claims = google.oauth2.id_token.verify_firebase_token(
-                    id_token, firebase_request_adapter)
+                # Verify the token against the Firebase Auth API. Tokens that
+                # have already been verified are answered from a process-wide
+                # cache until they expire (see verify_token).
+                with RequestTrace.measure('auth'):
+                    claims = verify_token(id_token)
 
                 if claims is not None:
-                    adm = BankAdministration()
-
                     google_user_id = claims.get("user_id")
                     email = claims.get("email")
                     name = claims.get("name")
 
-                    user = adm.get_user_by_google_user_id(google_user_id)
-                    if user is not None:
-                        """Fall: Der Benutzer ist unserem System bereits bekannt.
-                        Wir gehen davon aus, dass die google_user_id sich nicht ändert.
-                        Wohl aber können sich der zugehörige Klarname (name) und die
-                        E-Mail-Adresse ändern. Daher werden diese beiden Daten sicherheitshalber
-                        in unserem System geupdated."""
-                        user.set_name(name)
-                        user.set_email(email)
-                        adm.save_user(user)
-                    else:
-                        """Fall: Der Benutzer war bislang noch nicht eingelogged. 
-                        Wir legen daher ein neues User-Objekt an, um dieses ggf. später
-                        nutzen zu können.
-                        """
-                        user = adm.create_user(name, email, google_user_id)
+                    """Wir gehen davon aus, dass die google_user_id sich nicht ändert. Wohl aber
+                    können sich der zugehörige Klarname (name) und die E-Mail-Adresse ändern.
+                    Der UserSynchronizer legt unbekannte Benutzer an und aktualisiert bekannte,
+                    schreibt aber nur, wenn sich an deren Daten tatsächlich etwas geändert hat."""
+                    user_synchronizer.sync(google_user_id, name, email)
 
                     print(request.method, request.path, "angefragt durch:", name, email)
 
                     objects = function(*args, **kwargs)
+
+                    """Alles, was nach der Rückkehr der Methode bis zum Ende des Requests geschieht,
+                    ist im Wesentlichen Marshalling (vgl. marshal_with, fast_serialized)."""
+                    trace = RequestTrace.current()
+                    if trace is not None:
+                        trace.start('marshal')
+
                     return objects
                 else:
                     return '', 401  # UNAUTHORIZED !!!
@@ -78,3 +218,45 @@ def secured(function):
     return wrapper
 
 
+"""Google User IDs der Administratoren (kommagetrennt in der Umgebungsvariable ADMIN_USER_IDS).
+Ohne diese Variable gibt es keine Administratoren, administrative Funktionen sind dann gesperrt."""
+admin_user_ids = set(id.strip() for id in os.getenv('ADMIN_USER_IDS', '').split(',') if id.strip() != '')
+
+
+def current_admin_claims():
+    """Auslesen der Claims des aktuellen Benutzers, sofern es sich um einen Administrator handelt.
+
+    :return die Claims oder None, falls kein gültiges Token vorliegt bzw. der Benutzer kein Administrator ist.
+    """
+    id_token = request.cookies.get("token")
+    if not id_token:
+        return None
+
+    try:
+        claims = verify_token(id_token)
+    except ValueError:
+        return None
+
+    if claims is not None and claims.get("user_id") in admin_user_ids:
+        return claims
+    return None
+
+
+def admin_only(function):
+    """Decorator, der eine Methode ausschließlich Administratoren (vgl. ADMIN_USER_IDS) zugänglich macht.
+
+    Anders als bei secured wird der Benutzer hierbei nicht mit unserer Datenbank abgeglichen.
+    """
+    def wrapper(*args, **kwargs):
+        if not request.cookies.get("token"):
+            return '', 401  # UNAUTHORIZED !!!
+
+        if current_admin_claims() is None:
+            return '', 403  # FORBIDDEN !!!
+
+        return function(*args, **kwargs)
+
+    wrapper.__doc__ = function.__doc__
+    wrapper.__name__ = function.__name__
+    wrapper.__dict__.update(function.__dict__)
+    return wrapper
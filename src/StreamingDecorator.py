@@ -0,0 +1,105 @@
+from flask import request, Response
+from flask_restx.utils import unpack
+
+from Serializer import serializer_for, to_json
+
+"""Anzahl der Objekte, die jeweils zu einem Block zusammengefasst an den Client gesendet werden."""
+CHUNK_SIZE = 100
+
+
+def requested_stream_format():
+    """Feststellen, ob und in welchem Format der Client eine gestreamte Antwort wünscht.
+
+    :return 'ndjson' bei Accept: application/x-ndjson oder ?stream=ndjson,
+        'json' bei ?stream=json bzw. ?stream=true, andernfalls None.
+    """
+    stream = request.args.get('stream', '').lower()
+
+    if stream == 'ndjson' or 'application/x-ndjson' in request.headers.get('Accept', ''):
+        return 'ndjson'
+    elif stream in ('json', 'true', '1'):
+        return 'json'
+    else:
+        return None
+
+
+def streamable(model):
+    """Decorator, der eine mit marshal_list_with dekorierte Methode um eine gestreamte Antwort ergänzt.
+
+    Normalerweise baut marshal_list_with eine vollständige Liste von dicts auf, bevor Flask das
+    gesamte Ergebnis auf einmal serialisiert. Wünscht der Client eine gestreamte Antwort (vgl.
+    requested_stream_format), so umgeht dieser Decorator marshal_list_with: Die dekorierte Methode
+    liefert dann einen Generator (z.B. BankAdministration.iter_all_customers), dessen Objekte
+    blockweise serialisiert und als JSON-Array bzw. als NDJSON (ein Objekt je Zeile) gesendet werden.
+    Der Speicherbedarf bleibt so unabhängig von der Größe der Tabelle konstant.
+
+    Der Decorator muss *oberhalb* von marshal_list_with stehen. Die Authentifizierung (secured)
+    bleibt in beiden Fällen wirksam, ebenso die Swagger-Dokumentation von marshal_list_with.
+
+    **Hinweis:** Der Generator wird erst nach dem Ende des Requests durchlaufen und nutzt daher
+    nicht die Arbeitseinheit (UnitOfWork) des Requests, sondern eine eigene Verbindung aus dem Pool.
+    Sind Lesereplikate konfiguriert (vgl. ReplicaRouter), so ist dies stets eine Verbindung zu einem
+    Replikat, auch wenn derselbe Client soeben geschrieben hat.
+    """
+    def decorator(marshalled):
+        unmarshalled = marshalled.__wrapped__
+
+        def wrapper(*args, **kwargs):
+            stream_format = requested_stream_format()
+
+            if stream_format is None:
+                return marshalled(*args, **kwargs)
+
+            result = unmarshalled(*args, **kwargs)
+
+            if isinstance(result, Response):
+                return result
+
+            data, code, headers = unpack(result)
+
+            if code >= 300:
+                """Fall: z.B. 401 durch secured. Die Antwort wird unverändert weitergereicht."""
+                return result
+
+            """Status und Header (z.B. der Link-Header einer Seite, vgl. next_page_header) bleiben erhalten."""
+            if stream_format == 'ndjson':
+                return Response(_ndjson(data, model), status=code, headers=headers, mimetype='application/x-ndjson')
+            else:
+                return Response(_json_array(data, model), status=code, headers=headers, mimetype='application/json')
+
+        wrapper.__doc__ = marshalled.__doc__
+        wrapper.__name__ = marshalled.__name__
+        wrapper.__dict__.update(marshalled.__dict__)
+        return wrapper
+
+    return decorator
+
+
+def _chunks(objects, model):
+    """Serialisieren der Objekte in Blöcken von jeweils CHUNK_SIZE JSON-Texten (vgl. Serializer)."""
+    serializer = serializer_for(model)
+    chunk = []
+
+    for obj in objects:
+        chunk.append(to_json(serializer(obj)))
+        if len(chunk) >= CHUNK_SIZE:
+            yield chunk
+            chunk = []
+
+    if len(chunk) > 0:
+        yield chunk
+
+
+def _json_array(objects, model):
+    separator = b'['
+
+    for chunk in _chunks(objects, model):
+        yield separator + b','.join(chunk)
+        separator = b','
+
+    yield b'[]' if separator == b'[' else b']'
+
+
+def _ndjson(objects, model):
+    for chunk in _chunks(objects, model):
+        yield b'\n'.join(chunk) + b'\n'
@@ -27,8 +27,12 @@ B. Konventionen für dieses Module:
                                 außer evtl. im Header keine weiteren Daten zurückliefern,
                                 wird in dieser Fallstudie auch aus Gründen einer
                                 möglichst einfachen Umsetzung verzichtet.
+        304 Not Modified :      bei bedingten Abrufen (If-None-Match bzw. If-Modified-Since),
+                                sofern sich die angefragte Resource nicht geändert hat.
         401 Unauthorized :      falls der User sich nicht gegenüber dem System
                                 authentisiert hat und daher keinen Zugriff erhält.
+        403 Forbidden    :      falls ein authentisierter User eine administrative
+                                Funktion aufruft, ohne Administrator zu sein.
         404 Not Found    :      falls eine angefragte Resource nicht verfügbar ist
         500 Internal Server Error : falls der Server einen Fehler erkennt,
                                 diesen aber nicht genauer zu bearbeiten weiß.
@@ -42,9 +46,12 @@ B. Konventionen für dieses Module:
 """
 
 # Unser Service basiert auf Flask
-from flask import Flask
+from flask import Flask, Response, g, request, send_from_directory
 # Auf Flask aufbauend nutzen wir RestX
-from flask_restx import Api, Resource, fields
+from flask_restx import Api, Resource, fields, reqparse
+from urllib.parse import urlencode
+import time
+import uuid
 # Wir benutzen noch eine Flask-Erweiterung für Cross-Origin Resource Sharing
 from flask_cors import CORS
 
@@ -55,7 +62,29 @@ from server.bo.Account import Account
 from server.bo.Transaction import Transaction
 
 # Außerdem nutzen wir einen selbstgeschriebenen Decorator, der die Authentifikation übernimmt
-from SecurityDecorator import secured
+from SecurityDecorator import secured, token_cache, admin_only, current_admin_claims
+# Große Listen können über diesen Decorator auch gestreamt (JSON-Array bzw. NDJSON) ausgeliefert werden
+from StreamingDecorator import streamable, requested_stream_format
+# Häufig abgerufene Listen werden mit vorab übersetzten Serialisierungsfunktionen ausgeliefert
+from Serializer import fast_serialized
+# Häufig abgefragte Ressourcen unterstützen bedingte Abrufe (ETag, Last-Modified, 304 Not Modified)
+from ConditionalDecorator import conditional
+# Mit RESPONSE_CACHE=1 werden die Antworten häufig abgefragter Listen zwischen allen Workern geteilt
+from ResponseCacheDecorator import response_cached, response_cache
+
+# Alle Mapper eines Requests teilen sich über eine Arbeitseinheit (Unit of Work) eine Verbindung
+from server.db.UnitOfWork import UnitOfWork
+# Je Request werden SQL-Statements und Zeiten gemessen (Header Server-Timing, Protokollzeile)
+from server.RequestTrace import RequestTrace
+# Optional (METRICS=1) werden Metriken erhoben und unter /metrics ausgeliefert
+from server import Metrics
+from server.db.ConnectionPool import ConnectionPool
+from server.db.ObjectCache import ObjectCache
+# Optional (DB_REPLICAS) lesen find_*-Methoden von Lesereplikaten
+from server.db.ReplicaRouter import ReplicaRouter
+from server.db.ShardRouter import ShardRouter
+# Administratoren können einzelne Requests im laufenden Betrieb profilieren lassen
+from server.Profiler import Profiler
 
 """
 Instanzieren von Flask. Am Ende dieser Datei erfolgt dann erst der 'Start' von Flask.
@@ -64,7 +93,9 @@ app = Flask(__name__)
 
 """
 Alle Ressourcen mit dem Präfix /bank für **Cross-Origin Resource Sharing** (CORS) freigeben.
-Diese eine Zeile setzt die Installation des Package flask-cors voraus. 
+Diese eine Zeile setzt die Installation des Package flask-cors voraus. Der Header Link (vgl. Pagination)
+und der Header ETag (vgl. bedingte Abrufe) sowie Server-Timing (s.u.) und X-Response-Cache (vgl. response_cached)
+werden dabei explizit für den Client lesbar gemacht.
 
 Sofern Frontend und Backend auf getrennte Domains/Rechnern deployed würden, wäre sogar eine Formulierung
 wie etwa diese erforderlich:
@@ -72,7 +103,197 @@ CORS(app, resources={r"/bank/*": {"origins": "*"}})
 Allerdings würde dies dann eine Missbrauch Tür und Tor öffnen, so dass es ratsamer wäre, nicht alle
 "origins" zuzulassen, sondern diese explizit zu nennen. Weitere Infos siehe Doku zum Package flask-cors.
 """
-CORS(app, resources=r'/bank/*')
+CORS(app, resources=r'/bank/*', expose_headers=['Link', 'ETag', 'Server-Timing', 'X-Response-Cache'])
+
+"""
+Profiling im laufenden Betrieb (vgl. Profiler und die Resourcen unter /admin/profiles): Soll ein Request profiliert
+werden, so läuft cProfile von der ersten before_request- bis zur letzten after_request-Funktion. Daher werden
+diese beiden Funktionen vor allen anderen registriert. Der Name der abgelegten Datei steht im Header X-Profile-File.
+"""
+profiler = Profiler()
+
+
+@app.before_request
+def begin_profiling():
+    route = request.url_rule.rule if request.url_rule is not None else None
+    memory = profiler.take(route, request.path)
+
+    if memory is None and 'X-Profile' in request.headers and current_admin_claims() is not None:
+        """Ein Administrator fordert das Profiling dieses Requests an (X-Profile: memory für tracemalloc)."""
+        memory = request.headers['X-Profile'].lower() == 'memory'
+
+    if memory is not None:
+        g.profiling = profiler.start(route, uuid.uuid4().hex[:12], memory)
+
+
+@app.after_request
+def finish_profiling(response):
+    session = g.pop('profiling', None)
+    if session is not None:
+        response.headers['X-Profile-File'] = profiler.stop(session)
+    return response
+
+
+"""
+Für jeden Request zeichnet ein RequestTrace sämtliche SQL-Statements sowie die Dauer der Authentifizierung
+und des Marshallings auf. Die Summen werden als Header Server-Timing ausgeliefert und als JSON-Zeile
+protokolliert. Da Flask die after_request-Funktionen in umgekehrter Reihenfolge ihrer Registrierung aufruft,
+wird finish_request_trace erst nach complete_unit_of_work ausgeführt und erfasst so auch den Commit.
+"""
+
+
+@app.before_request
+def begin_request_trace():
+    RequestTrace.begin(request.method, request.path)
+
+
+@app.after_request
+def finish_request_trace(response):
+    trace = RequestTrace.current()
+    if trace is not None:
+        trace.stop('marshal')
+        response.headers['Server-Timing'] = trace.get_server_timing()
+        print(trace.to_log_line(response.status_code))
+    return response
+
+
+@app.teardown_request
+def end_request_trace(exc):
+    RequestTrace.end()
+
+
+"""
+Mit METRICS=1 werden zusätzlich Metriken erhoben und unter /metrics im Textformat von Prometheus ausgeliefert:
+Anzahl und Latenz der Requests je Route, Antworten je Status Code, Aufrufe und SQL-Statements je Mapper-Methode
+(vgl. Mapper), der Zustand des Connection Pools und ggf. der Lesereplikate und Shards sowie die Trefferquoten des
+Token-, des Objekt- und ggf. des Antwort-Caches. Da die Werte je Prozess gelten, sollte /metrics nicht öffentlich
+erreichbar sein.
+"""
+if Metrics.enabled:
+    def get_object_cache_requests():
+        result = {}
+        for (table, (hits, misses, size)) in ObjectCache.get_instance().get_stats().items():
+            result[(table, 'hit')] = hits
+            result[(table, 'miss')] = misses
+        return result
+
+    if response_cache is not None:
+        Metrics.registry.callback('bank_response_cache_requests_total', 'Abfragen des Antwort-Caches je Ergebnis',
+                                  lambda: {('hit',): response_cache.get_stats()[0],
+                                           ('miss',): response_cache.get_stats()[1]}, ('result',), kind='counter')
+
+    if ReplicaRouter.is_configured():
+        def get_replica_stats(index, default=0):
+            return {(stats[0],): stats[index] if stats[index] is not None else default
+                    for stats in ReplicaRouter.get_instance().get_stats()[0]}
+
+        Metrics.registry.callback('bank_db_replica_available', 'Ist das Lesereplikat verwendbar? (1 bzw. 0)',
+                                  lambda: {key: int(value) for (key, value) in get_replica_stats(1).items()},
+                                  ('replica',))
+        Metrics.registry.callback('bank_db_replica_lag_seconds', 'Zuletzt gemessener Rückstand je Lesereplikat '
+                                  '(-1: unbekannt)', lambda: get_replica_stats(2, -1), ('replica',))
+        Metrics.registry.callback('bank_db_replica_connections', 'Ausgeliehene Verbindungen je Lesereplikat',
+                                  lambda: get_replica_stats(3), ('replica',))
+        Metrics.registry.callback('bank_db_replica_reads_total', 'An das Lesereplikat vergebene Verbindungen',
+                                  lambda: get_replica_stats(4), ('replica',), kind='counter')
+        Metrics.registry.callback('bank_db_replica_fallbacks_total', 'Lesezugriffe, die mangels verwendbarem '
+                                  'Replikat an die primäre Datenbank gingen',
+                                  lambda: ReplicaRouter.get_instance().get_stats()[1], kind='counter')
+
+    if ShardRouter.is_configured():
+        Metrics.registry.callback('bank_db_shard_pool_connections', 'Geöffnete Verbindungen je Shard und Zustand',
+                                  lambda: {key: value for (name, (size, idle, opened, closed))
+                                           in ShardRouter.get_instance().get_stats()
+                                           for (key, value) in (((name, 'open'), size), ((name, 'idle'), idle))},
+                                  ('shard', 'state'))
+
+    Metrics.registry.callback('bank_db_pool_connections', 'Geöffnete Datenbankverbindungen je Zustand',
+                              lambda: {('open',): ConnectionPool.get_instance().get_stats()[0],
+                                       ('idle',): ConnectionPool.get_instance().get_stats()[1]}, ('state',))
+    Metrics.registry.callback('bank_db_pool_opened_total', 'Bisher geöffnete Datenbankverbindungen',
+                              lambda: ConnectionPool.get_instance().get_stats()[2], kind='counter')
+    Metrics.registry.callback('bank_db_pool_closed_total', 'Bisher geschlossene Datenbankverbindungen',
+                              lambda: ConnectionPool.get_instance().get_stats()[3], kind='counter')
+    Metrics.registry.callback('bank_token_cache_requests_total', 'Abfragen des Token-Caches je Ergebnis',
+                              lambda: {('hit',): token_cache.get_stats()[0], ('miss',): token_cache.get_stats()[1]},
+                              ('result',), kind='counter')
+    Metrics.registry.callback('bank_token_cache_hit_ratio', 'Anteil der aus dem Cache beantworteten Token-Prüfungen',
+                              lambda: token_cache.get_stats()[0] / max(1, sum(token_cache.get_stats()[:2])))
+    Metrics.registry.callback('bank_token_cache_entries', 'Anzahl der Einträge im Token-Cache',
+                              lambda: token_cache.get_stats()[2])
+    Metrics.registry.callback('bank_object_cache_requests_total', 'Abfragen des Objekt-Caches je Tabelle und Ergebnis',
+                              get_object_cache_requests, ('table', 'result'), kind='counter')
+    Metrics.registry.callback('bank_object_cache_entries', 'Anzahl der Einträge im Objekt-Cache je Tabelle',
+                              lambda: {(table,): size for (table, (hits, misses, size))
+                                       in ObjectCache.get_instance().get_stats().items()}, ('table',))
+
+    @app.before_request
+    def start_request_metrics():
+        g.request_start = time.perf_counter()
+
+    @app.after_request
+    def record_request_metrics(response):
+        start = g.get('request_start')
+        if start is not None:
+            route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+            Metrics.request_duration.observe(time.perf_counter() - start, (request.method, route))
+            Metrics.responses.inc((request.method, route, str(response.status_code)))
+        return response
+
+    @app.route('/metrics')
+    def metrics():
+        return Response(Metrics.registry.render(), mimetype='text/plain; version=0.0.4')
+
+
+"""
+Jeder Request bildet eine Arbeitseinheit (Unit of Work). Sämtliche Mapper, die während eines Requests
+verwendet werden, teilen sich dadurch eine Datenbankverbindung. Am Ende des Requests wird genau einmal
+committet bzw. im Fehlerfall (Exception oder Status Code 5xx) zurückgerollt.
+
+Sind Lesereplikate konfiguriert (vgl. ReplicaRouter), so soll ein Client, der soeben geschrieben hat, seine
+Änderungen auch in den folgenden Requests sehen, obwohl die Replikate diese evtl. noch nicht erhalten haben.
+Nach jedem committeten Schreibzugriff setzen wir daher ein Cookie, das bis zum angegebenen Zeitpunkt sämtliche
+Lesezugriffe dieses Clients auf die primäre Datenbank lenkt (vgl. UnitOfWork.stick_to_primary).
+"""
+PRIMARY_COOKIE = 'db-primary-until'
+
+
+@app.before_request
+def begin_unit_of_work():
+    uow = UnitOfWork.begin()
+
+    if ReplicaRouter.is_configured():
+        try:
+            sticky = float(request.cookies.get(PRIMARY_COOKIE, '0')) > time.time()
+        except ValueError:
+            sticky = False
+
+        if sticky:
+            uow.stick_to_primary()
+
+
+@app.after_request
+def complete_unit_of_work(response):
+    uow = UnitOfWork.current()
+    if uow is not None:
+        with RequestTrace.measure('commit'):
+            if response.status_code < 500:
+                wrote = uow.is_dirty()
+                uow.commit()
+
+                if wrote and ReplicaRouter.is_configured():
+                    seconds = ReplicaRouter.get_instance().get_sticky_seconds()
+                    response.set_cookie(PRIMARY_COOKIE, '{:.3f}'.format(time.time() + seconds),
+                                        max_age=int(seconds) + 1, httponly=True, samesite='Lax')
+            else:
+                uow.rollback()
+    return response
+
+
+@app.teardown_request
+def end_unit_of_work(exc):
+    UnitOfWork.end(exc)
+
 
 """
 In dem folgenden Abschnitt bauen wir ein Modell auf, das die Datenstruktur beschreibt, 
@@ -119,17 +340,127 @@ transaction = api.inherit('Transaction', bo, {
     'amount': fields.Float(attribute='_amount', description='Betrag bzw. Wert der Buchung')
 })
 
+"""Ergebnis einer Sammelbuchung: die erstellten Buchungen sowie ein Fehler je abgelehnter Buchung."""
+transaction_batch_error = api.model('TransactionBatchError', {
+    'index': fields.Integer(description='Position der abgelehnten Buchung im übermittelten Array'),
+    'message': fields.String(description='Grund für die Ablehnung')
+})
+
+transaction_batch_result = api.model('TransactionBatchResult', {
+    'created': fields.List(fields.Nested(transaction), description='Die erstellten Buchungen'),
+    'errors': fields.List(fields.Nested(transaction_batch_error), description='Die abgelehnten Buchungen')
+})
+
+"""Übersicht über einen Kunden: der Kunde selbst sowie alle seine Konten samt Kontostand."""
+account_overview = api.model('AccountOverview', {
+    'account': fields.Nested(account, description='Das Konto'),
+    'credit': fields.Float(description='Summe aller Gutschriften auf diesem Konto'),
+    'debit': fields.Float(description='Summe aller Lastschriften von diesem Konto'),
+    'balance': fields.Float(description='Kontostand (Saldo) des Kontos')
+})
+
+customer_overview = api.model('CustomerOverview', {
+    'customer': fields.Nested(customer, description='Der Kunde'),
+    'accounts': fields.List(fields.Nested(account_overview), description='Die Konten des Kunden')
+})
+
+"""Parameter für das seitenweise Auslesen (Keyset-Pagination) von Collections.
+
+Wird limit angegeben, so liefert die Resource höchstens limit Objekte mit einer ID größer als after_id.
+Gibt es (möglicherweise) weitere Objekte, so enthält der Header Link einen Verweis auf die nächste Seite.
+Ohne limit wird wie bisher die gesamte Collection ausgeliefert."""
+MAX_PAGE_SIZE = 1000
+
+page_args = reqparse.RequestParser()
+page_args.add_argument('limit', type=int, location='args',
+                       help='Maximale Anzahl von Objekten je Seite (höchstens {})'.format(MAX_PAGE_SIZE))
+page_args.add_argument('after_id', type=int, location='args', default=0,
+                       help='ID des letzten Objekts der vorherigen Seite')
+
+
+def get_page_args():
+    """Auslesen der Pagination-Parameter des aktuellen Requests.
+
+    :return Tupel (after_id, limit), wobei limit None ist, falls nicht seitenweise gelesen werden soll.
+    """
+    args = page_args.parse_args()
+    limit = args['limit']
+    if limit is not None:
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+    return args['after_id'] or 0, limit
+
+
+def id_list(value):
+    """Umwandeln eines Parameters wie 1,2,3 in eine Liste von IDs (höchstens MAX_PAGE_SIZE)."""
+    ids = [int(id) for id in value.split(',') if id.strip() != '']
+    if len(ids) > MAX_PAGE_SIZE:
+        raise ValueError('Es werden höchstens {} IDs angenommen'.format(MAX_PAGE_SIZE))
+    return ids
+
+
+"""Mehrfachabruf: Mit ?ids=1,2,3 liefern die Collection-Resources in einem einzigen Round Trip genau
+die Objekte mit den angegebenen IDs (aufsteigend sortiert, unbekannte IDs werden übergangen)."""
+ids_args = reqparse.RequestParser()
+ids_args.add_argument('ids', type=id_list, location='args',
+                      help='Kommagetrennte Liste von IDs, z.B. 1,2,3 (höchstens {})'.format(MAX_PAGE_SIZE))
+
+
+"""Für Buchungen gibt es nur den Mehrfachabruf, daher ist ids dort ein Pflichtparameter."""
+transaction_ids_args = ids_args.copy()
+transaction_ids_args.replace_argument('ids', type=id_list, location='args', required=True,
+                                      help='Kommagetrennte Liste von IDs, z.B. 1,2,3 (höchstens {})'
+                                      .format(MAX_PAGE_SIZE))
+
+
+def get_ids_arg():
+    """Auslesen der Liste von IDs des aktuellen Requests.
+
+    :return Liste von IDs oder None, falls nicht nach IDs gefragt wurde.
+    """
+    return ids_args.parse_args()['ids']
+
+
+def next_page_header(page, limit):
+    """Erzeugen des Link-Headers, der auf die nächste Seite verweist.
+
+    Ist die Seite nicht voll, so gibt es keine weitere Seite und damit auch keinen Verweis."""
+    if len(page) < limit:
+        return {}
+
+    args = request.args.to_dict()
+    args['limit'] = limit
+    args['after_id'] = page[-1].get_id()
+    return {'Link': '<{}?{}>; rel="next"'.format(request.base_url, urlencode(args))}
+
 
 @banking.route('/customers')
 @banking.response(500, 'Falls es zu einem Server-seitigen Fehler kommt.')
 class CustomerListOperations(Resource):
+    @banking.param('stream', 'json oder ndjson: Ergebnis gestreamt ausliefern (alternativ Accept: application/x-ndjson)')
+    @banking.expect(page_args, ids_args)
+    @response_cached('customers')
+    @conditional('customers')
+    @streamable(customer)
+    @fast_serialized(customer)
     @banking.marshal_list_with(customer)
     @secured
     def get(self):
         """Auslesen aller Customer-Objekte.
 
-        Sollten keine Customer-Objekte verfügbar sein, so wird eine leere Sequenz zurückgegeben."""
+        Sollten keine Customer-Objekte verfügbar sein, so wird eine leere Sequenz zurückgegeben.
+        Mit ```limit``` und ```after_id``` kann seitenweise gelesen werden (vgl. Header Link).
+        Mit ```ids``` (z.B. ?ids=1,2,3) werden nur die Objekte mit diesen IDs ausgelesen.
+        Auf Wunsch (vgl. Parameter ```stream```) wird das Ergebnis mit konstantem Speicherbedarf gestreamt."""
         adm = BankAdministration()
+        ids = get_ids_arg()
+        if ids is not None:
+            return adm.get_customers_by_ids(ids)
+        after_id, limit = get_page_args()
+        if limit is not None:
+            page = adm.get_customers_page(after_id, limit)
+            return page, 200, next_page_header(page, limit)
+        if requested_stream_format() is not None:
+            return adm.iter_all_customers()
         customers = adm.get_all_customers()
         return customers
 
@@ -166,6 +497,7 @@ class CustomerListOperations(Resource):
 @banking.response(500, 'Falls es zu einem Server-seitigen Fehler kommt.')
 @banking.param('id', 'Die ID des Customer-Objekts')
 class CustomerOperations(Resource):
+    @conditional('customer:{id}')
     @banking.marshal_with(customer)
     @secured
     def get(self, id):
@@ -230,13 +562,31 @@ class CustomersByNameOperations(Resource):
 @banking.route('/accounts')
 @banking.response(500, 'Falls es zu einem Server-seitigen Fehler kommt.')
 class AccountListOperations(Resource):
+    @banking.param('stream', 'json oder ndjson: Ergebnis gestreamt ausliefern (alternativ Accept: application/x-ndjson)')
+    @banking.expect(page_args, ids_args)
+    @response_cached('accounts')
+    @conditional('accounts')
+    @streamable(account)
+    @fast_serialized(account)
     @banking.marshal_list_with(account)
     @secured
     def get(self):
         """Auslesen aller Acount-Objekte.
 
-        Sollten keine Account-Objekte verfügbar sein, so wird eine leere Sequenz zurückgegeben."""
+        Sollten keine Account-Objekte verfügbar sein, so wird eine leere Sequenz zurückgegeben.
+        Mit ```limit``` und ```after_id``` kann seitenweise gelesen werden (vgl. Header Link).
+        Mit ```ids``` (z.B. ?ids=1,2,3) werden nur die Objekte mit diesen IDs ausgelesen.
+        Auf Wunsch (vgl. Parameter ```stream```) wird das Ergebnis mit konstantem Speicherbedarf gestreamt."""
         adm = BankAdministration()
+        ids = get_ids_arg()
+        if ids is not None:
+            return adm.get_accounts_by_ids(ids)
+        after_id, limit = get_page_args()
+        if limit is not None:
+            page = adm.get_accounts_page(after_id, limit)
+            return page, 200, next_page_header(page, limit)
+        if requested_stream_format() is not None:
+            return adm.iter_all_accounts()
         account_list = adm.get_all_accounts()
         return account_list
 
@@ -245,6 +595,7 @@ class AccountListOperations(Resource):
 @banking.response(500, 'Falls es zu einem Server-seitigen Fehler kommt.')
 @banking.param('id', 'Die ID des Account-Objekts')
 class AccountOperations(Resource):
+    @conditional('account:{id}')
     @banking.marshal_with(account)
     @secured
     def get(self, id):
@@ -294,6 +645,8 @@ class AccountOperations(Resource):
 @banking.response(500, 'Falls es zu einem Server-seitigen Fehler kommt.')
 @banking.param('id', 'Die ID des Customer-Objekts')
 class CustomerRelatedAccountOperations(Resource):
+    @conditional('accounts')
+    @fast_serialized(account)
     @banking.marshal_with(account)
     @secured
     def get(self, id):
@@ -335,11 +688,33 @@ class CustomerRelatedAccountOperations(Resource):
             return "Customer unknown", 500
 
 
+@banking.route('/customers/<int:id>/overview')
+@banking.response(500, 'Falls es zu einem Server-seitigen Fehler kommt.')
+@banking.param('id', 'Die ID des Customer-Objekts')
+class CustomerOverviewOperations(Resource):
+    @banking.marshal_with(customer_overview)
+    @secured
+    def get(self, id):
+        """Auslesen eines Customer-Objekts samt aller seiner Konten und deren Kontostände.
+
+        Das Customer-Objekt wird durch die ```id``` in dem URI bestimmt. Anstelle von einem Request je Konto
+        (vgl. ```/accounts/<id>/balance```) genügt damit ein einziger Request für die gesamte Kundenansicht.
+        """
+        adm = BankAdministration()
+        overview = adm.get_customer_overview(id)
+
+        if overview is not None:
+            return overview
+        else:
+            return '', 500
+
+
 @banking.route('/accounts/<int:id>/balance')
 @banking.response(500, 'Falls es zu einem Server-seitigen Fehler kommt.')
 @banking.param('id', 'Die ID des Account-Objekts')
 class AccountBalanceOperations(Resource):
     @banking.doc('Read balance of given account')
+    @conditional('balance:{id}')
     @secured
     def get(self, id):
         """Auslesen des Kontostands bzw. des Saldos eines bestimmten Account-Objekts.
@@ -362,6 +737,8 @@ class AccountBalanceOperations(Resource):
 @banking.route('/cash-account')
 @banking.response(500, 'Falls es zu einem Server-seitigen Fehler kommt.')
 class CashAccountOperations(Resource):
+    @response_cached('accounts')
+    @fast_serialized(account)
     @banking.marshal_with(account)
     @secured
     def get(self):
@@ -379,6 +756,20 @@ class CashAccountOperations(Resource):
 @banking.route('/transactions')
 @banking.response(500, 'Falls es zu einem Server-seitigen Fehler kommt.')
 class TransactionListOperations(Resource):
+    @banking.expect(transaction_ids_args)
+    @fast_serialized(transaction)
+    @banking.marshal_list_with(transaction)
+    @secured
+    def get(self):
+        """Auslesen der Buchungen (Transaction-Objekte) mit den gegebenen IDs.
+
+        Die gewünschten Buchungen werden mit dem Parameter ```ids``` (z.B. ?ids=1,2,3) angegeben und
+        in einem einzigen Round Trip ausgeliefert. Unbekannte IDs werden übergangen.
+        """
+        adm = BankAdministration()
+        ids = transaction_ids_args.parse_args()['ids']
+        return adm.get_transactions_by_ids(ids)
+
     @banking.doc('Create a new transaction')
     @banking.marshal_with(transaction, code=201)
     @banking.expect(transaction)
@@ -412,6 +803,47 @@ class TransactionListOperations(Resource):
             return '', 500
 
 
+@banking.route('/transactions/batch')
+@banking.response(500, 'Falls es zu einem Server-seitigen Fehler kommt.')
+class TransactionBatchOperations(Resource):
+    @banking.doc('Create many transactions at once')
+    @banking.marshal_with(transaction_batch_result)
+    @banking.expect([transaction])
+    @secured
+    def post(self):
+        """Erstellen einer ganzen Reihe von Buchungen (Array von Transaction-Objekten) in einem Zug.
+
+        Alle zulässigen Buchungen werden in einer einzigen Datenbanktransaktion gespeichert. Für jede
+        abgelehnte Buchung enthält das Ergebnis einen Eintrag mit ihrer Position im Array und dem Grund
+        der Ablehnung. Fehlerhafte Buchungen verhindern also nicht das Speichern der übrigen.
+        Auch hier ist die Vergabe der IDs nicht Aufgabe des Clients.
+        """
+        adm = BankAdministration()
+        payload = api.payload
+
+        if not isinstance(payload, list):
+            return {'created': [], 'errors': [{'index': 0, 'message': 'Array von Buchungen erwartet'}]}, 400
+
+        proposals = []  # Tupel (Position im Array, Transaction-Objekt)
+        errors = []
+
+        for (index, item) in enumerate(payload):
+            try:
+                item = dict(item)
+                item.setdefault('id', 0)
+                proposals.append((index, Transaction.from_dict(item)))
+            except (KeyError, TypeError, ValueError) as exc:
+                errors.append({'index': index, 'message': 'Unvollständige Buchung: {}'.format(exc)})
+
+        created, rejected = adm.create_transactions([p for (index, p) in proposals])
+
+        for (position, message) in rejected:
+            errors.append({'index': proposals[position][0], 'message': message})
+
+        errors.sort(key=lambda e: e['index'])
+        return {'created': created, 'errors': errors}, 200
+
+
 @banking.route('/transactions/<int:id>')
 @banking.response(500, 'Falls es zu einem Server-seitigen Fehler kommt.')
 @banking.param('id', 'Die ID des Transaction-Objekts.')
@@ -473,6 +905,9 @@ class TransactionOperations(Resource):
 @banking.response(500, 'Falls es zu einem Server-seitigen Fehler kommt.')
 @banking.param('id', 'Die ID des Account-Objekts.')
 class DebitOperations(Resource):
+    @banking.expect(page_args)
+    @conditional('balance:{id}')
+    @fast_serialized(transaction)
     @banking.marshal_with(transaction)
     @secured
     def get(self, id):
@@ -488,7 +923,11 @@ class DebitOperations(Resource):
 
         # Haben wir eine brauchbare Referenz auf ein Customer-Objekt bekommen?
         if acc is not None:
-            # Jetzt erst lesen wir die Konten des Customer aus.
+            # Jetzt erst lesen wir die Buchungen des Kontos aus, ggf. nur eine Seite davon.
+            after_id, limit = get_page_args()
+            if limit is not None:
+                page = adm.get_debits_page_of_account(acc, after_id, limit)
+                return page, 200, next_page_header(page, limit)
             debits = adm.get_debits_of_account(acc)
             return debits
         else:
@@ -498,6 +937,9 @@ class DebitOperations(Resource):
 @banking.response(500, 'Falls es zu einem Server-seitigen Fehler kommt.')
 @banking.param('id', 'Die ID des Account-Objekts.')
 class CreditOperations(Resource):
+    @banking.expect(page_args)
+    @conditional('balance:{id}')
+    @fast_serialized(transaction)
     @banking.marshal_with(transaction)
     @secured
     def get(self, id):
@@ -513,13 +955,139 @@ class CreditOperations(Resource):
 
         # Haben wir eine brauchbare Referenz auf ein Customer-Objekt bekommen?
         if acc is not None:
-            # Jetzt erst lesen wir die Konten des Customer aus.
+            # Jetzt erst lesen wir die Buchungen des Kontos aus, ggf. nur eine Seite davon.
+            after_id, limit = get_page_args()
+            if limit is not None:
+                page = adm.get_credits_page_of_account(acc, after_id, limit)
+                return page, 200, next_page_header(page, limit)
             credits = adm.get_credits_of_account(acc)
             return credits
         else:
             return "Account not found", 500
 
 
+"""Administrative Funktionen, die nur Administratoren (vgl. ADMIN_USER_IDS in SecurityDecorator) zur Verfügung stehen."""
+admin = api.namespace('admin', description='Administrative Funktionen des BankBeispiels')
+
+profiling_request = api.model('ProfilingRequest', {
+    'route': fields.String(required=True, description='Route bzw. Pfad, z.B. /bank/account/<int:id>/credits'),
+    'count': fields.Integer(default=1, description='Anzahl der nächsten Requests, die profiliert werden (0: abschalten)'),
+    'memory': fields.Boolean(default=False, description='Zusätzlich einen tracemalloc-Snapshot ablegen')
+})
+
+profile_file = api.model('ProfileFile', {
+    'name': fields.String(description='Name der Datei'),
+    'size': fields.Integer(description='Größe der Datei in Bytes')
+})
+
+profiling_status = api.model('ProfilingStatus', {
+    'armed': fields.List(fields.Nested(profiling_request), description='Routen, für die das Profiling eingeschaltet ist'),
+    'files': fields.List(fields.Nested(profile_file), description='Abgelegte Dateien, neueste zuerst')
+})
+
+
+def get_profiling_status():
+    return {
+        'armed': [{'route': route, 'count': count, 'memory': memory}
+                  for (route, (count, memory)) in sorted(profiler.get_armed().items())],
+        'files': [{'name': name, 'size': size} for (name, size) in profiler.list_files()]
+    }
+
+
+@admin.route('/profiles')
+@admin.response(401, 'Falls der Benutzer nicht authentisiert ist.')
+@admin.response(403, 'Falls der Benutzer kein Administrator ist.')
+class ProfileListOperations(Resource):
+    @admin.marshal_with(profiling_status)
+    @admin_only
+    def get(self):
+        """Auslesen der eingeschalteten Profilings und der abgelegten Dateien."""
+        return get_profiling_status()
+
+    @admin.marshal_with(profiling_status)
+    @admin.expect(profiling_request, validate=True)
+    @admin_only
+    def post(self):
+        """Einschalten des Profilings für die nächsten ```count``` Requests einer Route.
+
+        Alternativ lässt sich jeder einzelne Request eines Administrators mit dem Header ```X-Profile: 1```
+        (bzw. ```X-Profile: memory``` für tracemalloc) profilieren.
+        """
+        proposal = api.payload
+        profiler.arm(proposal['route'], max(0, proposal.get('count', 1)), proposal.get('memory', False))
+        return get_profiling_status()
+
+
+@admin.route('/profiles/<string:name>')
+@admin.response(401, 'Falls der Benutzer nicht authentisiert ist.')
+@admin.response(403, 'Falls der Benutzer kein Administrator ist.')
+@admin.param('name', 'Der Name der Datei (vgl. X-Profile-File)')
+class ProfileFileOperations(Resource):
+    @admin_only
+    def get(self, name):
+        """Herunterladen einer abgelegten Datei (pstats bzw. tracemalloc-Snapshot)."""
+        if profiler.get_path(name) is None:
+            return '', 404
+        return send_from_directory(profiler.get_directory(), name, as_attachment=True)
+
+
+object_cache_table = api.model('ObjectCacheTable', {
+    'table': fields.String(description='Name der Tabelle, z.B. accounts'),
+    'enabled': fields.Boolean(description='Werden Objekte dieser Tabelle zwischengespeichert?'),
+    'hits': fields.Integer(description='Anzahl der aus dem Cache beantworteten Abfragen'),
+    'misses': fields.Integer(description='Anzahl der Abfragen, die die Datenbank erreicht haben'),
+    'entries': fields.Integer(description='Anzahl der Einträge im Cache')
+})
+
+object_cache_setting = api.model('ObjectCacheSetting', {
+    'enabled': fields.Boolean(required=True, description='Cache für diese Tabelle ein- bzw. ausschalten')
+})
+
+
+def get_object_cache_status():
+    cache = ObjectCache.get_instance()
+    stats = cache.get_stats()
+    tables = sorted(set(stats) | cache.get_disabled())
+    return [{'table': table, 'enabled': cache.is_enabled(table), 'hits': stats.get(table, (0, 0, 0))[0],
+             'misses': stats.get(table, (0, 0, 0))[1], 'entries': stats.get(table, (0, 0, 0))[2]}
+            for table in tables]
+
+
+@admin.route('/object-cache')
+@admin.response(401, 'Falls der Benutzer nicht authentisiert ist.')
+@admin.response(403, 'Falls der Benutzer kein Administrator ist.')
+class ObjectCacheOperations(Resource):
+    @admin.marshal_list_with(object_cache_table)
+    @admin_only
+    def get(self):
+        """Auslesen der Trefferstatistik des Objekt-Caches (dieses Prozesses) je Tabelle."""
+        return get_object_cache_status()
+
+    @admin.marshal_list_with(object_cache_table)
+    @admin_only
+    def delete(self):
+        """Leeren des Objekt-Caches dieses Prozesses."""
+        ObjectCache.get_instance().clear()
+        return get_object_cache_status()
+
+
+@admin.route('/object-cache/<string:table>')
+@admin.response(401, 'Falls der Benutzer nicht authentisiert ist.')
+@admin.response(403, 'Falls der Benutzer kein Administrator ist.')
+@admin.param('table', 'Der Name der Tabelle, z.B. accounts')
+class ObjectCacheTableOperations(Resource):
+    @admin.marshal_list_with(object_cache_table)
+    @admin.expect(object_cache_setting, validate=True)
+    @admin_only
+    def put(self, table):
+        """Ein- bzw. Ausschalten des Objekt-Caches dieses Prozesses für eine Tabelle.
+
+        Dauerhaft (und für alle Prozesse) lässt sich der Cache über die Umgebungsvariable
+        ```OBJECT_CACHE_DISABLED``` abschalten, z.B. ```OBJECT_CACHE_DISABLED=customers,accounts```.
+        """
+        ObjectCache.get_instance().set_enabled(table, api.payload['enabled'])
+        return get_object_cache_status()
+
 
 """
 Nachdem wir nun sämtliche Resourcen definiert haben, die wir via REST bereitstellen möchten,
@@ -0,0 +1,136 @@
+"""
+Kommandozeilenwerkzeug für Wartungsaufgaben am Datenbestand des Bank-Beispiels.
+
+Aufruf (im Verzeichnis /src):
+    python manage.py migrate
+        Bringt das Schema der Datenbank auf den aktuellen Stand (Tabellen, Indizes). Kann bei
+        jedem Deployment gefahrlos ausgeführt werden, bereits angewendete Migrationen werden
+        übersprungen. Sind Shards konfiguriert (DB_SHARDS, vgl. ShardRouter), so werden auch
+        diese migriert.
+    python manage.py migration-status
+        Listet alle Migrationen und deren Stand auf.
+    python manage.py shard-transactions
+        Verteilt die bisher in der primären Datenbank gespeicherten Buchungen auf die Shards
+        (einmalig bei der Einführung von Shards, nach python manage.py migrate).
+    python manage.py rebuild-balances
+        Berechnet sämtliche materialisierten Kontostände (Tabelle account_balances)
+        aus den Buchungen neu.
+    python manage.py verify-balances [--account ID]
+        Vergleicht die materialisierten Kontostände mit den Buchungen und listet alle
+        Abweichungen (Drift) auf. Der Exit Code ist 1, sobald eine Abweichung besteht.
+        Mit --account wird nur das gegebene Konto geprüft, ohne sämtliche Buchungen zu summieren.
+
+Es gelten dieselben Verbindungsparameter wie für den Server (vgl. Mapper.get_connection_params).
+"""
+
+import argparse
+import sys
+
+from server.BankAdministration import BankAdministration
+from server.db.MigrationRunner import MigrationRunner
+from server.db.SchemaMigrations import SHARD_MIGRATIONS
+from server.db.ShardRouter import ShardRouter
+
+
+def get_migration_runners():
+    """Auslesen der zu migrierenden Datenbanken als Tupel (Name, MigrationRunner): zuerst die
+    primäre Datenbank, danach ggf. sämtliche Shards."""
+    result = [('primär', MigrationRunner())]
+
+    if ShardRouter.is_configured():
+        router = ShardRouter.get_instance()
+        for (shard, name) in enumerate(router.get_names()):
+            result.append(('Shard {} ({})'.format(shard, name),
+                           MigrationRunner(SHARD_MIGRATIONS, router.get_pool(shard))))
+
+    return result
+
+
+def migrate(args):
+    """Ausführen aller noch nicht angewendeten Migrationen."""
+    for (name, runner) in get_migration_runners():
+        applied = runner.migrate()
+
+        for migration in applied:
+            print("Angewendet ({}):".format(name), migration)
+
+        print("Schema ({}) ist aktuell ({} Migrationen angewendet).".format(name, len(applied)))
+    return 0
+
+
+def migration_status(args):
+    """Auflisten des Migrationsstands."""
+    for (name, runner) in get_migration_runners():
+        print("Datenbank {}:".format(name))
+        for (migration, applied) in runner.status():
+            print("[{}] {}".format("x" if applied else " ", migration))
+    return 0
+
+
+def shard_transactions(args):
+    """Verteilen der Buchungen der primären Datenbank auf die Shards."""
+    if not ShardRouter.is_configured():
+        print("Es sind keine Shards konfiguriert (DB_SHARDS).")
+        return 1
+
+    adm = BankAdministration()
+    count = adm.copy_transactions_to_shards()
+    print("{} Buchungen auf {} Shards verteilt.".format(count, ShardRouter.get_instance().get_shard_count()))
+    return 0
+
+
+def rebuild_balances(args):
+    """Neuberechnen aller Kontostände."""
+    adm = BankAdministration()
+    count = adm.rebuild_account_balances()
+    print("Kontostände für {} Konten neu berechnet.".format(count))
+    return 0
+
+
+def verify_balances(args):
+    """Prüfen aller (bzw. eines einzelnen) Kontostände auf Abweichungen von den Buchungen."""
+    adm = BankAdministration()
+
+    account = None
+    if args.account is not None:
+        account = adm.get_account_by_id(args.account)
+        if account is None:
+            print("Konto {} existiert nicht.".format(args.account))
+            return 1
+
+    drift = adm.verify_account_balances(account)
+
+    for (account_id, expected, stored) in drift:
+        print("Konto {}: laut Buchungen {}, gespeichert {}".format(account_id, expected, stored))
+
+    if len(drift) > 0:
+        print("{} Konten weichen ab. Korrektur mit: python manage.py rebuild-balances".format(len(drift)))
+        return 1
+    else:
+        print("Alle Kontostände sind konsistent.")
+        return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Wartungsaufgaben für das Bank-Beispiel.')
+    commands = parser.add_subparsers(dest='command')
+    commands.required = True
+
+    commands.add_parser('migrate', help='Schema auf den aktuellen Stand bringen') \
+        .set_defaults(handler=migrate)
+    commands.add_parser('migration-status', help='Stand der Migrationen anzeigen') \
+        .set_defaults(handler=migration_status)
+    commands.add_parser('shard-transactions', help='Buchungen auf die Shards verteilen') \
+        .set_defaults(handler=shard_transactions)
+    commands.add_parser('rebuild-balances', help='Kontostände aus den Buchungen neu berechnen') \
+        .set_defaults(handler=rebuild_balances)
+    verify = commands.add_parser('verify-balances', help='Kontostände gegen die Buchungen prüfen')
+    verify.add_argument('--account', type=int, help='Nur das Konto mit dieser ID prüfen')
+    verify.set_defaults(handler=verify_balances)
+
+    args = parser.parse_args(argv)
+    return args.handler(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
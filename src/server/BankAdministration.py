@@ -7,6 +7,7 @@ from .db.UserMapper import UserMapper
 from .db.CustomerMapper import CustomerMapper
 from .db.AccountMapper import AccountMapper
 from .db.TransactionMapper import TransactionMapper
+from .db.ResourceVersionMapper import ResourceVersionMapper
 
 
 class BankAdministration (object):
@@ -98,6 +99,11 @@ class BankAdministration (object):
         with UserMapper() as mapper:
             mapper.update(user)
 
+    def upsert_user(self, user):
+        """Den gegebenen Benutzer anhand seiner Google ID anlegen bzw. aktualisieren."""
+        with UserMapper() as mapper:
+            return mapper.upsert(user)
+
     def delete_user(self, user):
         """Den gegebenen Benutzer aus unserem System löschen."""
         with UserMapper() as mapper:
@@ -127,11 +133,29 @@ class BankAdministration (object):
         with CustomerMapper() as mapper:
             return mapper.find_by_key(number)
 
+    def get_customers_by_ids(self, numbers):
+        """Sämtliche Kunden mit den gegebenen IDs auslesen."""
+        with CustomerMapper() as mapper:
+            return mapper.find_by_keys(numbers)
+
     def get_all_customers(self):
         """Alle Kunden auslesen."""
         with CustomerMapper() as mapper:
             return mapper.find_all()
 
+    def get_customers_page(self, after_id, limit):
+        """Eine Seite von höchstens limit Kunden mit einer ID größer als after_id auslesen."""
+        with CustomerMapper() as mapper:
+            return mapper.find_page(after_id, limit)
+
+    def iter_all_customers(self):
+        """Alle Kunden nacheinander auslesen, ohne sie vollständig in den Speicher zu laden.
+
+        **Hinweis:** Die Datenbankverbindung wird erst beim ersten Zugriff auf den Generator
+        belegt und bleibt bis zu dessen vollständigem Durchlauf (bzw. Abbruch) belegt."""
+        with CustomerMapper() as mapper:
+            yield from mapper.iter_all()
+
     def save_customer(self, customer):
         """Den gegebenen Kunden speichern."""
         with CustomerMapper() as mapper:
@@ -158,16 +182,59 @@ class BankAdministration (object):
         with AccountMapper() as mapper:
             return mapper.find_all()
 
+    def get_accounts_page(self, after_id, limit):
+        """Eine Seite von höchstens limit Konten mit einer ID größer als after_id auslesen."""
+        with AccountMapper() as mapper:
+            return mapper.find_page(after_id, limit)
+
+    def iter_all_accounts(self):
+        """Alle Konten nacheinander auslesen, ohne sie vollständig in den Speicher zu laden.
+
+        **Hinweis:** Die Datenbankverbindung wird erst beim ersten Zugriff auf den Generator
+        belegt und bleibt bis zu dessen vollständigem Durchlauf (bzw. Abbruch) belegt."""
+        with AccountMapper() as mapper:
+            yield from mapper.iter_all()
+
     def get_account_by_id(self, number):
         """Das Konto mit der gegebenen Kontonummer (id) auslesen."""
         with AccountMapper() as mapper:
             return mapper.find_by_key(number)
 
+    def get_accounts_by_ids(self, numbers):
+        """Sämtliche Konten mit den gegebenen Kontonummern auslesen."""
+        with AccountMapper() as mapper:
+            return mapper.find_by_keys(numbers)
+
     def get_accounts_of_customer(self, customer):
         """Alle Konten des gegebenen Kunden auslesen."""
         with AccountMapper() as mapper:
             return mapper.find_by_owner_id(customer.get_id()) # Vorsicht: nicht geprüft!
 
+    def get_customer_overview(self, number):
+        """Den Kunden mit der gegebenen ID samt all seiner Konten und deren Kontoständen auslesen.
+
+        Unabhängig von der Anzahl der Konten genügen hierfür zwei SELECT-Aufrufe: einer für den
+        Kunden und einer für dessen Konten inkl. der materialisierten Kontostände.
+
+        :return ein dict mit dem Customer-Objekt (customer) und je Konto einem dict mit dem
+            Account-Objekt (account), den Gutschriften (credit), Lastschriften (debit) und
+            dem Saldo (balance); None, falls es keinen Kunden mit dieser ID gibt.
+        """
+        with CustomerMapper() as mapper:
+            customer = mapper.find_by_key(number)
+
+        if customer is None:
+            return None
+
+        with AccountMapper() as mapper:
+            accounts = mapper.find_with_balances_by_owner_id(customer.get_id())
+
+        return {
+            'customer': customer,
+            'accounts': [{'account': account, 'credit': credit, 'debit': debit, 'balance': balance}
+                         for (account, credit, debit, balance) in accounts]
+        }
+
     def delete_account(self, account):
         """Das gegebene Konto löschen.
 
@@ -182,11 +249,11 @@ class BankAdministration (object):
 
             if not(debits is None):
                 for transaction in debits:
-                    self.delete(transaction)
+                    self.delete_transaction(transaction)
 
             if not (credits is None):
                 for transaction in credits:
-                    self.delete(transaction)
+                    self.delete_transaction(transaction)
 
             mapper.delete(account)
 
@@ -205,26 +272,41 @@ class BankAdministration (object):
     def get_balance_of_account(self, account):
         """Den Kontostand (Saldo) für ein gegebenes Konto bestimmen.
 
-        **Hinweise:** Beachten Sie auch hier die Verkettung mit anderen Methoden
-        dieser Klasse und die sich daraus ergebende Apllikationslogik. Beachten Sie
-        ebenso, dass nicht alle Eigenschaften von Betrachtungsgegenständen z.B. in
-        Attributen abgelegt werden müssen, sondern ggf. wie hier berechnet werden können.
+        **Hinweise:** Beachten Sie, dass nicht alle Eigenschaften von Betrachtungsgegenständen
+        z.B. in Attributen abgelegt werden müssen, sondern ggf. wie hier berechnet werden können.
+        Der Saldo wird bei jeder Buchung in der Tabelle account_balances fortgeschrieben, so dass
+        wir ihn hier lediglich auslesen müssen. Das gilt insbesondere auch für das Bar-Konto,
+        das an jeder Ein- und Auszahlung beteiligt ist.
         """
-        credit_amount = 0
-        debit_amount = 0
+        with TransactionMapper() as mapper:
+            (credit_amount, debit_amount, balance) = mapper.find_balance_by_account_id(account.get_id())
+            return balance
 
-        debits = self.get_debits_of_account(account)
-        credits = self.get_credits_of_account(account)
+    def rebuild_account_balances(self):
+        """Sämtliche materialisierten Kontostände aus den Buchungen neu berechnen.
 
-        if not(debits is None):
-            for transaction in debits:
-                debit_amount += transaction.get_amount()
+        :return Anzahl der neu geschriebenen Kontostände.
+        """
+        with TransactionMapper() as mapper:
+            return mapper.rebuild_balances()
 
-        if not(credits is None):
-            for transaction in credits:
-                credit_amount += transaction.get_amount()
+    def verify_account_balances(self, account=None):
+        """Die materialisierten Kontostände gegen die Buchungen prüfen.
 
-        return credit_amount - debit_amount
+        :param account ein einzelnes zu prüfendes Konto, standardmäßig werden alle Konten geprüft.
+        :return Eine Sammlung von Tupeln (Konto, Saldo laut Buchungen, materialisierter Saldo)
+            aller abweichenden Konten. Eine leere Sammlung bedeutet: alles konsistent.
+        """
+        with TransactionMapper() as mapper:
+            return mapper.find_balance_drift(account_id=account.get_id() if account is not None else None)
+
+    def copy_transactions_to_shards(self):
+        """Die bisher in der primären Datenbank gespeicherten Buchungen auf die Shards verteilen.
+
+        :return Anzahl der kopierten Buchungen.
+        """
+        with TransactionMapper() as mapper:
+            return mapper.copy_to_shards()
 
     def get_debits_of_account(self, account):
         """Alle Kontobelastungen (Sollbuchungen) eines gegebenen Kontos auslesen."""
@@ -250,6 +332,16 @@ class BankAdministration (object):
 
             return result
 
+    def get_debits_page_of_account(self, account, after_id, limit):
+        """Eine Seite von Kontobelastungen (Sollbuchungen) eines gegebenen Kontos auslesen."""
+        with TransactionMapper() as mapper:
+            return mapper.find_page_by_source_account_id(account.get_id(), after_id, limit)
+
+    def get_credits_page_of_account(self, account, after_id, limit):
+        """Eine Seite von Guthabenbuchungen (Habenbuchungen) eines gegebenen Kontos auslesen."""
+        with TransactionMapper() as mapper:
+            return mapper.find_page_by_target_account_id(account.get_id(), after_id, limit)
+
     def save_account(self, account):
         """Eine Konto-Instanz speichern."""
         with AccountMapper() as mapper:
@@ -281,6 +373,62 @@ class BankAdministration (object):
         with TransactionMapper() as mapper:
             return mapper.insert(t)
 
+    def create_transactions(self, proposals):
+        """Eine ganze Reihe von Buchungen in einem Zug erstellen (z.B. nächtliche Abrechnungsdateien).
+
+        Jede Buchung wird zunächst geprüft. Fehlerhafte Buchungen werden nicht gespeichert,
+        verhindern aber auch nicht das Speichern der übrigen.
+
+        :param proposals eine Sammlung von Transaction-Objekten
+        :return Tupel (Liste der erstellten Buchungen, Liste von Tupeln (Index, Fehlermeldung)
+            für jede abgelehnte Buchung, wobei Index die Position in proposals bezeichnet).
+        """
+        errors = []
+        candidates = []
+
+        with AccountMapper() as mapper:
+            existing = mapper.find_existing_ids(
+                [a for p in proposals for a in (p.get_source_account(), p.get_target_account())
+                 if isinstance(a, int)])
+
+        for (index, proposal) in enumerate(proposals):
+            message = self.__check_transaction(proposal, existing)
+            if message is not None:
+                errors.append((index, message))
+            else:
+                t = Transaction()
+                t.set_id(1)
+                t.set_source_account(proposal.get_source_account())
+                t.set_target_account(proposal.get_target_account())
+                t.set_amount(float(proposal.get_amount()))
+                candidates.append(t)
+
+        with TransactionMapper() as mapper:
+            return mapper.insert_many(candidates), errors
+
+    def __check_transaction(self, proposal, existing_accounts):
+        """Prüfen einer vorgeschlagenen Buchung.
+
+        :return Fehlermeldung oder None, falls die Buchung zulässig ist.
+        """
+        source = proposal.get_source_account()
+        target = proposal.get_target_account()
+        amount = proposal.get_amount()
+
+        for account_id in (source, target):
+            if not isinstance(account_id, int) or isinstance(account_id, bool):
+                return "Ungültige Kontonummer: {}".format(account_id)
+            if account_id not in existing_accounts:
+                return "Konto {} existiert nicht".format(account_id)
+
+        if source == target:
+            return "Quell- und Zielkonto sind identisch"
+
+        if not isinstance(amount, (int, float)) or isinstance(amount, bool) or not amount > 0:
+            return "Ungültiger Betrag: {}".format(amount)
+
+        return None
+
     def save_transaction(self, trans):
         """Eine Buchung speichern."""
         with TransactionMapper() as mapper:
@@ -302,6 +450,11 @@ class BankAdministration (object):
         with TransactionMapper() as mapper:
             return mapper.find_by_key(number)
 
+    def get_transactions_by_ids(self, numbers):
+        """Sämtliche Buchungen mit den gegebenen Buchungs-IDs auslesen."""
+        with TransactionMapper() as mapper:
+            return mapper.find_by_keys(numbers)
+
     def create_withdrawal(self, customer_account, amount):
         """Eine Bar-Auszahlung (Abhebung) von einem gegebenen Konto erstellen.
 
@@ -329,3 +482,13 @@ class BankAdministration (object):
         else:
             return None
 
+    """
+    Methoden für bedingte Abrufe (ETag, Last-Modified)
+    """
+    def get_resource_versions(self, names):
+        """Auslesen der Versionsstände der gegebenen Ressourcen (vgl. ResourceVersionMapper).
+
+        :return Ein dict Name der Ressource -> (Version, Zeitpunkt der Änderung)
+        """
+        with ResourceVersionMapper() as mapper:
+            return mapper.find_by_keys(names)
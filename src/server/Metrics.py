@@ -0,0 +1,171 @@
+import os
+import threading
+
+"""Sollen Metriken erhoben und unter /metrics ausgeliefert werden? (opt-in mit METRICS=1)"""
+enabled = os.getenv('METRICS', '0') == '1'
+
+"""Obergrenzen (Sekunden) der Buckets für Latenz-Histogramme."""
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_labels(names, values, extra=''):
+    """Erzeugen einer Label-Liste wie {route="/bank/accounts",method="GET"} im Textformat."""
+    pairs = ['{}="{}"'.format(name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+             for (name, value) in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter (object):
+    """Monoton steigender Zähler, optional je Kombination von Label-Werten."""
+
+    def __init__(self, name, description, labels=()):
+        self._name = name
+        self._description = description
+        self._labels = tuple(labels)
+        self._values = {}  # Label-Werte -> Zählerstand
+        self._lock = threading.Lock()
+
+    def inc(self, labels=(), amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def get_value(self, labels=()):
+        with self._lock:
+            return self._values.get(labels, 0)
+
+    def collect(self):
+        """Erzeugen der Zeilen dieses Zählers im Textformat."""
+        with self._lock:
+            values = sorted(self._values.items())
+
+        lines = ['# HELP {} {}'.format(self._name, self._description), '# TYPE {} counter'.format(self._name)]
+        lines.extend('{}{} {}'.format(self._name, _format_labels(self._labels, labels), _format_value(value))
+                     for (labels, value) in values)
+        return lines
+
+
+class Histogram (object):
+    """Verteilung von Messwerten (z.B. Latenzen) in kumulativen Buckets samt Summe und Anzahl."""
+
+    def __init__(self, name, description, labels=(), buckets=DEFAULT_BUCKETS):
+        self._name = name
+        self._description = description
+        self._labels = tuple(labels)
+        self._buckets = tuple(sorted(buckets))
+        self._values = {}  # Label-Werte -> [Anzahl je Bucket..., Anzahl gesamt, Summe]
+        self._lock = threading.Lock()
+
+    def observe(self, value, labels=()):
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = [0] * (len(self._buckets) + 1) + [0.0]
+                self._values[labels] = entry
+
+            for (index, bound) in enumerate(self._buckets):
+                if value <= bound:
+                    entry[index] += 1
+            entry[-2] += 1
+            entry[-1] += value
+
+    def collect(self):
+        """Erzeugen der Zeilen dieses Histogramms im Textformat."""
+        with self._lock:
+            values = sorted((labels, list(entry)) for (labels, entry) in self._values.items())
+
+        lines = ['# HELP {} {}'.format(self._name, self._description), '# TYPE {} histogram'.format(self._name)]
+        for (labels, entry) in values:
+            for (index, bound) in enumerate(self._buckets):
+                lines.append('{}_bucket{} {}'.format(
+                    self._name, _format_labels(self._labels, labels, 'le="{}"'.format(bound)), entry[index]))
+            lines.append('{}_bucket{} {}'.format(
+                self._name, _format_labels(self._labels, labels, 'le="+Inf"'), entry[-2]))
+            lines.append('{}_sum{} {}'.format(self._name, _format_labels(self._labels, labels), repr(entry[-1])))
+            lines.append('{}_count{} {}'.format(self._name, _format_labels(self._labels, labels), entry[-2]))
+        return lines
+
+
+class CallbackMetric (object):
+    """Metrik, deren Wert(e) erst beim Abruf von /metrics über eine Funktion ermittelt werden.
+
+    So lassen sich Zähler und Momentaufnahmen anderer Komponenten (z.B. ConnectionPool.get_stats)
+    übernehmen, ohne diese selbst zu verändern. Die Funktion liefert ein dict Label-Werte -> Wert
+    bzw. ohne Labels direkt den Wert. kind ist 'gauge' oder 'counter'.
+    """
+
+    def __init__(self, name, description, function, labels=(), kind='gauge'):
+        self._name = name
+        self._description = description
+        self._function = function
+        self._labels = tuple(labels)
+        self._kind = kind
+
+    def collect(self):
+        values = self._function()
+        if not isinstance(values, dict):
+            values = {(): values}
+
+        lines = ['# HELP {} {}'.format(self._name, self._description), '# TYPE {} {}'.format(self._name, self._kind)]
+        lines.extend('{}{} {}'.format(self._name, _format_labels(self._labels, labels), _format_value(value))
+                     for (labels, value) in sorted(values.items()))
+        return lines
+
+
+class MetricsRegistry (object):
+    """Sammlung aller Metriken eines Prozesses, die gemeinsam unter /metrics ausgeliefert werden.
+
+    Das Ausgabeformat ist das Textformat von Prometheus (text/plain; version=0.0.4), so dass die
+    Metriken ohne weiteren Dienst z.B. mit curl gelesen oder von einem Prometheus-Server
+    abgefragt werden können. Die Werte gelten je Prozess (Worker).
+    """
+
+    def __init__(self):
+        self._metrics = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, description, labels=()):
+        return self.register(Counter(name, description, labels))
+
+    def histogram(self, name, description, labels=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, description, labels, buckets))
+
+    def callback(self, name, description, function, labels=(), kind='gauge'):
+        return self.register(CallbackMetric(name, description, function, labels, kind))
+
+    def render(self):
+        """Erzeugen der Textdarstellung sämtlicher Metriken."""
+        with self._lock:
+            metrics = list(self._metrics)
+
+        lines = []
+        for metric in metrics:
+            try:
+                lines.extend(metric.collect())
+            except Exception as exc:
+                """Eine einzelne fehlerhafte Metrik (z.B. DB nicht erreichbar) soll nicht alle verhindern."""
+                print("Metrik konnte nicht erhoben werden:", exc)
+        return '\n'.join(lines) + '\n'
+
+
+"""Die prozessweite Registry sowie die Metriken, die an mehreren Stellen erhoben werden."""
+registry = MetricsRegistry()
+
+request_duration = registry.histogram(
+    'bank_http_request_duration_seconds', 'Dauer der Requests je Route', ('method', 'route'))
+responses = registry.counter(
+    'bank_http_responses_total', 'Anzahl der Antworten je Route und Status Code', ('method', 'route', 'status'))
+mapper_duration = registry.histogram(
+    'bank_mapper_call_duration_seconds', 'Dauer der Aufrufe je Mapper-Methode', ('mapper', 'method'))
+mapper_queries = registry.counter(
+    'bank_mapper_queries_total', 'Anzahl der SQL-Statements je Mapper-Methode', ('mapper', 'method'))
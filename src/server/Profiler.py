@@ -0,0 +1,143 @@
+import cProfile
+import os
+import re
+import tempfile
+import threading
+import time
+import tracemalloc
+
+
+class ProfilingSession (object):
+    """Profiling eines einzelnen Requests (vgl. Profiler.start und Profiler.stop)."""
+
+    def __init__(self, route, request_id, memory):
+        self.route = route
+        self.request_id = request_id
+        self.memory = memory
+        self.profile = cProfile.Profile()
+
+
+class Profiler (object):
+    """Profiling einzelner Requests im laufenden Betrieb (cProfile, optional tracemalloc).
+
+    Ein Administrator schaltet das Profiling gezielt für die nächsten N Requests einer Route ein
+    (arm), z.B. für /bank/account/<int:id>/credits. Alternativ wird jeder Request profiliert, den ein
+    Administrator mit dem Header X-Profile sendet. Für jeden dieser Requests wird eine pstats-Datei
+    (und mit memory=True zusätzlich ein tracemalloc-Snapshot) im Verzeichnis PROFILE_DIR abgelegt.
+    Der Dateiname enthält den Zeitpunkt, die Route und die Request ID, z.B.
+    20261017-101500-bank_account_id_credits-3f2a9c.pstats
+
+    Die Auswertung erfolgt lokal, etwa mit python -m pstats <Datei> oder snakeviz. So lässt sich
+    unterscheiden, ob die Zeit im SQL (mysql.connector), in der Hydrierung (from_tuple) oder im
+    Marshalling (marshal bzw. Serializer) verbracht wird.
+
+    **Hinweis:** tracemalloc erfasst sämtliche Allokationen des Prozesses. Laufen gleichzeitig weitere
+    Requests, so sind deren Allokationen im Snapshot enthalten.
+    """
+
+    SUFFIXES = ('.pstats', '.tracemalloc')
+
+    def __init__(self, directory=None, max_files=200):
+        self._directory = directory or os.getenv(
+            'PROFILE_DIR', os.path.join(tempfile.gettempdir(), 'bank-profiles'))
+        self._max_files = max_files
+        self._armed = {}  # Route -> [Anzahl noch zu profilierender Requests, tracemalloc ja/nein]
+        self._lock = threading.Lock()
+
+    def get_directory(self):
+        return self._directory
+
+    def arm(self, route, count, memory=False):
+        """Profiling der nächsten count Requests der gegebenen Route (z.B. /bank/accounts/<int:id>).
+
+        Ein count von 0 schaltet das Profiling der Route wieder ab.
+        """
+        with self._lock:
+            if count > 0:
+                self._armed[route] = [count, memory]
+            else:
+                self._armed.pop(route, None)
+
+    def get_armed(self):
+        """Auslesen der Routen, für die das Profiling eingeschaltet ist, als dict Route -> (Anzahl, tracemalloc)."""
+        with self._lock:
+            return {route: tuple(entry) for (route, entry) in self._armed.items()}
+
+    def take(self, route, path):
+        """Prüfen, ob ein Request der gegebenen Route (bzw. dem gegebenen Pfad) profiliert werden soll.
+
+        :return None, falls nicht; sonst True bzw. False, je nachdem ob tracemalloc gewünscht ist.
+        """
+        with self._lock:
+            key = route if route in self._armed else path if path in self._armed else None
+            if key is None:
+                return None
+
+            entry = self._armed[key]
+            entry[0] -= 1
+            if entry[0] <= 0:
+                del self._armed[key]
+            return entry[1]
+
+    def start(self, route, request_id, memory=False):
+        """Beginnen des Profilings des aktuellen Requests."""
+        session = ProfilingSession(route, request_id, memory)
+
+        if memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        else:
+            session.memory = False
+
+        session.profile.enable()
+        return session
+
+    def stop(self, session):
+        """Beenden des Profilings und Ablegen der Ergebnisse.
+
+        :return der Name der pstats-Datei
+        """
+        session.profile.disable()
+
+        os.makedirs(self._directory, exist_ok=True)
+        base = "{}-{}-{}".format(time.strftime('%Y%m%d-%H%M%S'), Profiler.slug(session.route), session.request_id)
+
+        session.profile.dump_stats(os.path.join(self._directory, base + '.pstats'))
+
+        if session.memory:
+            tracemalloc.take_snapshot().dump(os.path.join(self._directory, base + '.tracemalloc'))
+            tracemalloc.stop()
+
+        self._remove_oldest()
+        return base + '.pstats'
+
+    def list_files(self):
+        """Auslesen der abgelegten Dateien als Liste von Tupeln (Name, Größe in Bytes), neueste zuerst."""
+        if not os.path.isdir(self._directory):
+            return []
+
+        names = [name for name in os.listdir(self._directory) if name.endswith(Profiler.SUFFIXES)]
+        return [(name, os.path.getsize(os.path.join(self._directory, name)))
+                for name in sorted(names, reverse=True)]
+
+    def get_path(self, name):
+        """Auslesen des Pfads einer abgelegten Datei, None falls es keine solche Datei gibt.
+
+        Es werden nur Namen aus list_files akzeptiert, so dass kein anderer Pfad erreichbar ist.
+        """
+        if name in dict(self.list_files()):
+            return os.path.join(self._directory, name)
+        return None
+
+    def _remove_oldest(self):
+        """Begrenzen der Anzahl abgelegter Dateien auf max_files."""
+        for (name, size) in self.list_files()[self._max_files:]:
+            try:
+                os.remove(os.path.join(self._directory, name))
+            except OSError:
+                pass
+
+    @staticmethod
+    def slug(route):
+        """Umwandeln einer Route in einen Bestandteil eines Dateinamens, z.B. bank_account_id_credits."""
+        route = re.sub(r'<(?:[^:>]*:)?([^>]*)>', r'\1', route or 'unmatched')
+        return re.sub(r'[^A-Za-z0-9]+', '_', route).strip('_') or 'root'
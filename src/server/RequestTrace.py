@@ -0,0 +1,171 @@
+import json
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+
+class Statement (object):
+    """Ein während eines Requests ausgeführtes SQL-Statement (vgl. RequestTrace)."""
+    __slots__ = ('fingerprint', 'rows', 'duration')
+
+    def __init__(self, fingerprint, rows, duration):
+        self.fingerprint = fingerprint  # Das Statement ohne konkrete Werte (vgl. RequestTrace.fingerprint)
+        self.rows = rows  # Anzahl der gelesenen bzw. geänderten Zeilen
+        self.duration = duration  # Dauer in Sekunden (Ausführung und Lesen des Ergebnisses)
+
+
+class RequestTrace (object):
+    """Messwerte eines einzelnen Requests.
+
+    Wie die Arbeitseinheit (vgl. UnitOfWork) ist ein RequestTrace an den aktuellen Thread gebunden.
+    Solange er aktiv ist, zeichnen die Mapper jedes SQL-Statement samt Zeilenzahl und Dauer sowie
+    die Zeit für das Beschaffen der Verbindung auf (vgl. TracedConnection). Weitere Abschnitte, etwa
+    die Verifikation des Tokens (secured) oder das Marshalling, werden über measure bzw. start und
+    stop erfasst.
+
+    Am Ende des Requests (vgl. main.py) werden die Summen als Header Server-Timing ausgeliefert und
+    als eine JSON-Zeile protokolliert. Dauert ein Request länger als SLOW_REQUEST_MS Millisekunden
+    (Standard: 500), so enthält die Zeile zusätzlich die vollständige Liste der Statements.
+    Mit REQUEST_TRACE=0 lässt sich die Aufzeichnung abschalten.
+    """
+
+    __local = threading.local()
+
+    enabled = os.getenv('REQUEST_TRACE', '1') != '0'
+    slow_threshold = float(os.getenv('SLOW_REQUEST_MS', '500')) / 1000.0
+
+    def __init__(self, method, path):
+        self._method = method
+        self._path = path
+        self._start = time.perf_counter()
+        self._statements = []
+        self._connect = 0.0
+        self._timings = {}  # Name des Abschnitts -> Dauer in Sekunden
+        self._running = {}  # Name des Abschnitts -> Startzeitpunkt
+
+    @staticmethod
+    def begin(method, path):
+        """Einen neuen RequestTrace für den aktuellen Thread beginnen (sofern nicht abgeschaltet)."""
+        trace = RequestTrace(method, path) if RequestTrace.enabled else None
+        RequestTrace.__local.current = trace
+        return trace
+
+    @staticmethod
+    def current():
+        """Auslesen des RequestTrace des aktuellen Threads, None falls keiner aktiv ist."""
+        return getattr(RequestTrace.__local, 'current', None)
+
+    @staticmethod
+    def end():
+        """Den RequestTrace des aktuellen Threads beenden."""
+        RequestTrace.__local.current = None
+
+    @staticmethod
+    @contextmanager
+    def measure(name):
+        """Messen der Dauer eines Abschnitts im RequestTrace des aktuellen Threads (falls vorhanden).
+
+        Beispiel:
+            with RequestTrace.measure('auth'):
+                claims = verify_token(id_token)
+        """
+        trace = RequestTrace.current()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            if trace is not None:
+                trace.add_timing(name, time.perf_counter() - start)
+
+    """Normalisieren von SQL-Statements: Literale und Parameter werden durch ? ersetzt, Listen wie
+    IN (?, ?, ?) zu IN (?+) zusammengefasst. Statements, die sich nur in ihren Werten unterscheiden,
+    erhalten so denselben Fingerabdruck."""
+    __STRINGS = re.compile(r"'(?:[^'\\]|\\.)*'")
+    __NUMBERS = re.compile(r"\b\d+(?:\.\d+)?\b")
+    __LISTS = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+    __VALUES = re.compile(r"(?:\(\?\+\)\s*,\s*)+\(\?\+\)")
+    __SPACES = re.compile(r"\s+")
+
+    @staticmethod
+    def fingerprint(sql):
+        """Erzeugen des Fingerabdrucks eines SQL-Statements, z.B. SELECT ... WHERE id IN (?+)"""
+        if isinstance(sql, bytes):
+            sql = sql.decode('utf-8', 'replace')
+        sql = sql.replace('%s', '?')
+        sql = RequestTrace.__STRINGS.sub('?', sql)
+        sql = RequestTrace.__NUMBERS.sub('?', sql)
+        sql = RequestTrace.__LISTS.sub('(?+)', sql)
+        sql = RequestTrace.__VALUES.sub('(?+)', sql)
+        return RequestTrace.__SPACES.sub(' ', sql).strip()
+
+    def add_statement(self, sql, rows, duration):
+        """Aufzeichnen eines ausgeführten Statements.
+
+        :return das aufgezeichnete Statement, um z.B. beim Lesen des Ergebnisses Zeilen und Dauer zu ergänzen.
+        """
+        statement = Statement(RequestTrace.fingerprint(sql), rows, duration)
+        self._statements.append(statement)
+        return statement
+
+    def add_connect(self, duration):
+        """Aufzeichnen der Zeit für das Beschaffen einer Verbindung (Pool bzw. Verbindungsaufbau)."""
+        self._connect += duration
+
+    def add_timing(self, name, duration):
+        """Aufzeichnen der Dauer eines Abschnitts. Mehrfache Abschnitte gleichen Namens werden summiert."""
+        self._timings[name] = self._timings.get(name, 0.0) + duration
+
+    def start(self, name):
+        """Beginnen eines Abschnitts, dessen Ende an anderer Stelle erreicht wird (vgl. stop)."""
+        self._running[name] = time.perf_counter()
+
+    def stop(self, name):
+        """Beenden eines mit start begonnenen Abschnitts. Wurde er nicht begonnen, geschieht nichts."""
+        start = self._running.pop(name, None)
+        if start is not None:
+            self.add_timing(name, time.perf_counter() - start)
+
+    def get_statements(self):
+        return self._statements
+
+    def get_query_count(self):
+        return len(self._statements)
+
+    def get_db_duration(self):
+        return sum(statement.duration for statement in self._statements)
+
+    def get_duration(self):
+        """Bisherige Dauer des Requests in Sekunden."""
+        return time.perf_counter() - self._start
+
+    def get_server_timing(self):
+        """Erzeugen des Headers Server-Timing, z.B. db;dur=3.1;desc="4 queries", auth;dur=0.2, total;dur=5.0"""
+        entries = ['db;dur={:.1f};desc="{} queries"'.format(self.get_db_duration() * 1000, self.get_query_count()),
+                   'connect;dur={:.1f}'.format(self._connect * 1000)]
+        entries.extend('{};dur={:.1f}'.format(name, duration * 1000) for (name, duration) in self._timings.items())
+        entries.append('total;dur={:.1f}'.format(self.get_duration() * 1000))
+        return ', '.join(entries)
+
+    def to_log_line(self, status):
+        """Erzeugen der Protokollzeile (JSON) dieses Requests. Alle Dauern in Millisekunden."""
+        duration = self.get_duration()
+        record = {
+            'method': self._method,
+            'path': self._path,
+            'status': status,
+            'duration_ms': round(duration * 1000, 1),
+            'db_ms': round(self.get_db_duration() * 1000, 1),
+            'queries': self.get_query_count(),
+            'connect_ms': round(self._connect * 1000, 1),
+        }
+        for (name, value) in self._timings.items():
+            record[name + '_ms'] = round(value * 1000, 1)
+
+        if duration > RequestTrace.slow_threshold:
+            record['slow'] = True
+            record['statements'] = [{'sql': s.fingerprint, 'rows': s.rows, 'ms': round(s.duration * 1000, 2)}
+                                    for s in self._statements]
+
+        return json.dumps(record, ensure_ascii=False)
@@ -0,0 +1,236 @@
+import hashlib
+import json
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+import zlib
+
+try:
+    import fcntl
+except ImportError:
+    """Unter Windows gibt es kein fcntl. Dort läuft der Entwicklungsserver ohnehin in nur einem Prozess."""
+    fcntl = None
+
+
+class GenerationTable (object):
+    """Prozessübergreifende Generationszähler je Tabelle in einer per mmap eingeblendeten Datei.
+
+    Jede committete Änderung an einer Tabelle erhöht deren Zähler (bump). Da alle Prozesse dieselbe
+    Datei einblenden, sehen sämtliche Worker die Erhöhung sofort. Die Tabellen werden über eine
+    Prüfsumme ihres Namens auf eine feste Anzahl von Zählern verteilt; teilen sich zwei Tabellen
+    einen Zähler, führt dies lediglich zu zusätzlichen Invalidierungen.
+    """
+
+    SLOTS = 64
+    SLOT = struct.Struct('<Q')
+
+    def __init__(self, path):
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        size = GenerationTable.SLOTS * GenerationTable.SLOT.size
+
+        self._lock()
+        try:
+            if os.fstat(self._fd).st_size < size:
+                os.ftruncate(self._fd, size)
+        finally:
+            self._unlock()
+
+        self._map = mmap.mmap(self._fd, size)
+        self._thread_lock = threading.Lock()
+
+    def _slot(self, table):
+        return (zlib.crc32(table.encode('utf-8')) % GenerationTable.SLOTS) * GenerationTable.SLOT.size
+
+    def _lock(self):
+        if fcntl is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+
+    def _unlock(self):
+        if fcntl is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def get(self, table):
+        """Auslesen des aktuellen Zählers einer Tabelle."""
+        return GenerationTable.SLOT.unpack_from(self._map, self._slot(table))[0]
+
+    def bump(self, table):
+        """Erhöhen des Zählers einer Tabelle (unter einer Dateisperre, da mehrere Prozesse schreiben)."""
+        offset = self._slot(table)
+
+        with self._thread_lock:
+            self._lock()
+            try:
+                (value,) = GenerationTable.SLOT.unpack_from(self._map, offset)
+                GenerationTable.SLOT.pack_into(self._map, offset, value + 1)
+            finally:
+                self._unlock()
+
+
+class ResponseCache (object):
+    """Zwischenspeicher für vollständig serialisierte Antworten, den sich alle Worker eines Hosts teilen.
+
+    Jede Antwort wird als eigene Datei im Verzeichnis directory abgelegt. Standardmäßig ist dies
+    /dev/shm/bank-response-cache, also ein Dateisystem im Hauptspeicher. Die Datei enthält neben den
+    Bytes der Antwort die Generationszähler (vgl. GenerationTable) der Tabellen, von denen die
+    Antwort abhängt, so wie sie *vor* dem Erzeugen der Antwort gelesen wurden. Eine abgelegte
+    Antwort gilt nur, solange diese Zähler unverändert sind; eine Änderung an einer der Tabellen
+    (vgl. Mapper.add_change_listener) entwertet somit sofort alle betroffenen Antworten in allen
+    Workern, ohne dass Dateien gelöscht werden müssen. Zusätzlich verfällt jede Antwort nach ttl
+    Sekunden, z.B. für Änderungen, die an der Anwendung vorbei direkt in der Datenbank erfolgen.
+
+    **Hinweis:** Die Invalidierung wirkt nur innerhalb eines Hosts. Laufen mehrere Instanzen auf
+    verschiedenen Rechnern, so sieht jede Instanz die Änderungen der anderen erst nach ttl Sekunden.
+    """
+
+    HEADER = struct.Struct('<4sdHI')  # Kennung, Ablaufzeitpunkt, Anzahl Tabellen, Länge der Metadaten
+    MAGIC = b'BRC1'
+
+    def __init__(self, directory=None, ttl=60.0, max_body_size=4 * 1024 * 1024, max_entries=1000):
+        if directory is None:
+            base = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+            directory = os.path.join(base, 'bank-response-cache')
+
+        os.makedirs(directory, exist_ok=True)
+        self._directory = directory
+        self._ttl = ttl
+        self._max_body_size = max_body_size
+        self._max_entries = max_entries
+        self._generations = GenerationTable(os.path.join(directory, 'generations'))
+        self._hits = 0
+        self._misses = 0
+        self._puts = 0  # Anzahl der erfolgreich abgelegten Antworten (vgl. _prune).
+        self._pruning = False  # Läuft gerade ein Aufräumen im Hintergrund?
+        self._lock = threading.Lock()
+
+    def _path(self, key):
+        return os.path.join(self._directory, hashlib.sha1(key.encode('utf-8')).hexdigest() + '.entry')
+
+    def get_generations(self, tables):
+        """Auslesen der Generationszähler der Tabellen. Muss *vor* dem Erzeugen der Antwort erfolgen."""
+        return [self._generations.get(table) for table in tables]
+
+    def invalidate(self, table):
+        """Entwerten sämtlicher Antworten, die von der gegebenen Tabelle abhängen."""
+        self._generations.bump(table)
+
+    def get(self, key, tables):
+        """Auslesen einer abgelegten Antwort.
+
+        :return Tupel (Body, Metadaten) oder None, falls keine gültige Antwort vorliegt.
+        """
+        try:
+            with open(self._path(key), 'rb') as file:
+                data = file.read()
+        except OSError:
+            data = None
+
+        entry = self._decode(data, tables) if data else None
+
+        with self._lock:
+            if entry is None:
+                self._misses += 1
+            else:
+                self._hits += 1
+        return entry
+
+    def _decode(self, data, tables):
+        size = ResponseCache.HEADER.size
+        if len(data) < size:
+            return None
+
+        (magic, expires, count, meta_length) = ResponseCache.HEADER.unpack_from(data)
+        if magic != ResponseCache.MAGIC or expires < time.time() or count != len(tables):
+            return None
+
+        generations = list(struct.unpack_from('<{}Q'.format(count), data, size))
+        if generations != self.get_generations(tables):
+            return None
+
+        offset = size + 8 * count
+        meta = json.loads(data[offset:offset + meta_length].decode('utf-8'))
+        return data[offset + meta_length:], meta
+
+    def put(self, key, tables, generations, body, meta):
+        """Ablegen einer Antwort.
+
+        :param generations die vor dem Erzeugen der Antwort gelesenen Zähler (vgl. get_generations)
+        :param meta dict mit Angaben zur Antwort, z.B. Mimetype und Header
+        """
+        if len(body) > self._max_body_size:
+            return
+
+        meta_bytes = json.dumps(meta).encode('utf-8')
+        data = ResponseCache.HEADER.pack(ResponseCache.MAGIC, time.time() + self._ttl, len(tables), len(meta_bytes)) \
+            + struct.pack('<{}Q'.format(len(tables)), *generations) + meta_bytes + body
+
+        """Erst in eine temporäre Datei schreiben und dann umbenennen, damit kein anderer Worker
+        eine nur teilweise geschriebene Datei liest."""
+        path = self._path(key)
+        fd, temporary = tempfile.mkstemp(dir=self._directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as file:
+                file.write(data)
+            os.replace(temporary, path)
+        except OSError as exc:
+            print("Antwort konnte nicht zwischengespeichert werden:", exc)
+            try:
+                os.remove(temporary)
+            except OSError:
+                pass
+            return
+
+        """Nach jeweils 100 abgelegten Antworten wird aufgeräumt, und zwar in einem Hintergrund-Thread:
+        _prune liest das gesamte Verzeichnis und sollte den Request nicht verzögern."""
+        with self._lock:
+            self._puts += 1
+            prune = self._puts % 100 == 0 and not self._pruning
+            if prune:
+                self._pruning = True
+
+        if prune:
+            threading.Thread(target=self._prune_in_background, name='ResponseCachePrune', daemon=True).start()
+
+    def _prune_in_background(self):
+        try:
+            self._prune()
+        except Exception as exc:
+            print("Fehler beim Aufräumen des Antwort-Caches:", exc)
+        finally:
+            with self._lock:
+                self._pruning = False
+
+    def _prune(self):
+        """Entfernen verfallener Dateien und Begrenzen der Anzahl der Einträge auf max_entries.
+
+        Es läuft höchstens ein Aufräumen je Prozess zur Zeit (vgl. put)."""
+        entries = []
+        now = time.time()
+
+        for name in os.listdir(self._directory):
+            if not name.endswith('.entry'):
+                continue
+            path = os.path.join(self._directory, name)
+            try:
+                with open(path, 'rb') as file:
+                    header = file.read(ResponseCache.HEADER.size)
+                expires = ResponseCache.HEADER.unpack(header)[1]
+                if expires < now:
+                    os.remove(path)
+                else:
+                    entries.append((os.path.getmtime(path), path))
+            except (OSError, struct.error):
+                pass
+
+        for (mtime, path) in sorted(entries, reverse=True)[self._max_entries:]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def get_stats(self):
+        """Auslesen der Trefferstatistik dieses Prozesses als Tupel (Treffer, Fehlschläge)."""
+        with self._lock:
+            return self._hits, self._misses
@@ -0,0 +1,124 @@
+import queue
+import threading
+from collections import OrderedDict
+
+from .bo.User import User
+from .BankAdministration import BankAdministration
+from .db.UnitOfWork import UnitOfWork
+
+
+class UserSynchronizer (object):
+    """Abgleich der Benutzerdaten aus dem Firebase-Token mit unserer Datenbank.
+
+    Bislang wurde bei jedem authentifizierten Request der Benutzer ausgelesen und anschließend
+    entweder aktualisiert (UPDATE samt Commit, auch ohne jede Änderung) oder neu angelegt. Der
+    Synchronizer merkt sich stattdessen prozessintern, welchen Namen und welche E-Mail-Adresse
+    ein Benutzer zuletzt hatte, und schreibt nur dann, wenn sich tatsächlich etwas geändert hat.
+    Geschrieben wird mit einem einzigen Upsert (vgl. UserMapper.upsert).
+
+    Optional (write_behind=True) erfolgt das Schreiben in einem Hintergrund-Thread, so dass es
+    den Request überhaupt nicht mehr verzögert. Ist die Warteschlange voll, so wird ausnahmsweise
+    direkt geschrieben.
+
+    Wird direkt geschrieben, so committet erst die Arbeitseinheit des Requests (vgl. UnitOfWork) den
+    Upsert. Gemerkt wird der Benutzer daher erst nach deren erfolgreichem Commit; wird der Request
+    zurückgerollt, so versucht der nächste Request den Abgleich erneut.
+    """
+
+    def __init__(self, max_size=4096, write_behind=False, queue_size=1000):
+        self._max_size = max_size
+        self._users = OrderedDict()  # Google User ID -> (Name, E-Mail)
+        self._lock = threading.Lock()
+        self._queue = None
+
+        if write_behind:
+            self._queue = queue.Queue(queue_size)
+            worker = threading.Thread(target=self._work, name='UserWriteBehind', daemon=True)
+            worker.start()
+
+    def sync(self, google_user_id, name, email):
+        """Sicherstellen, dass der Benutzer mit den gegebenen Daten in unserem System gespeichert ist.
+
+        :return True, falls geschrieben wurde bzw. ein Schreibauftrag erteilt wurde, sonst False.
+        """
+        with self._lock:
+            known = self._users.get(google_user_id)
+            if known is not None:
+                self._users.move_to_end(google_user_id)
+
+        if known == (name, email):
+            return False
+
+        if known is None:
+            """Fall: Der Benutzer ist diesem Prozess noch nicht bekannt. Vielleicht aber unserem System."""
+            user = BankAdministration().get_user_by_google_user_id(google_user_id)
+            if user is not None and (user.get_name(), user.get_email()) == (name, email):
+                uow = UnitOfWork.current()
+                if uow is not None and uow.has_read_from_replica():
+                    """Fall: Evtl. von einem veralteten Lesereplikat gelesen (vgl. ReplicaRouter)."""
+                    self._remember_on_commit(uow, google_user_id, name, email)
+                else:
+                    self._remember(google_user_id, name, email)
+                return False
+
+        user = User()
+        user.set_name(name)
+        user.set_email(email)
+        user.set_user_id(google_user_id)
+
+        if self._queue is not None:
+            """Der Hintergrund-Thread vergisst den Benutzer wieder, falls das Schreiben scheitert."""
+            self._remember(google_user_id, name, email)
+            try:
+                self._queue.put_nowait(user)
+                return True
+            except queue.Full:
+                self._forget(google_user_id)
+
+        self._write(user)
+
+        uow = UnitOfWork.current()
+        if uow is not None:
+            self._remember_on_commit(uow, google_user_id, name, email)
+        else:
+            self._remember(google_user_id, name, email)
+        return True
+
+    def _remember(self, google_user_id, name, email):
+        with self._lock:
+            self._users[google_user_id] = (name, email)
+            self._users.move_to_end(google_user_id)
+
+            while len(self._users) > self._max_size:
+                self._users.popitem(last=False)
+
+    def _remember_on_commit(self, uow, google_user_id, name, email):
+        """Merken des Benutzers, sobald die Arbeitseinheit erfolgreich committet hat."""
+        def remember(committed):
+            if committed:
+                self._remember(google_user_id, name, email)
+
+        uow.after_completion(remember)
+
+    def _forget(self, google_user_id):
+        with self._lock:
+            self._users.pop(google_user_id, None)
+
+    def _write(self, user):
+        try:
+            BankAdministration().upsert_user(user)
+        except Exception:
+            """Damit der nächste Request den Abgleich erneut versucht."""
+            self._forget(user.get_user_id())
+            raise
+
+    def _work(self):
+        """Hintergrund-Thread: Abarbeiten der Schreibaufträge außerhalb des Requests."""
+        while True:
+            user = self._queue.get()
+            try:
+                self._write(user)
+            except Exception as exc:
+                print("Benutzer", user.get_user_id(), "konnte nicht gespeichert werden:", exc)
+            finally:
+                self._queue.task_done()
@@ -7,6 +7,8 @@ class Account (bo.BusinessObject):
     Ein Konto besitzt einen Inhaber sowie eine Reihe von Buchungen (vgl. Klasse Transaction),
     mit deren Hilfe auch der Kontostand berechnet werden kann.
     """
+    __slots__ = ('_owner',)
+
     def __init__(self):
         super().__init__()
         self._owner = None  # Fremdschlüsselbeziehung zum Inhaber des Kontos.
@@ -30,3 +32,10 @@ class Account (bo.BusinessObject):
         obj.set_id(dictionary["id"])  # eigentlich Teil von BusinessObject !
         obj.set_owner(dictionary["owner"])
         return obj
+
+    @staticmethod
+    def from_tuple(row):
+        """Umwandeln eines DB-Tupels (id, owner) in ein Account() (vgl. Customer.from_tuple)."""
+        obj = Account.__new__(Account)
+        (obj._id, obj._owner) = row
+        return obj
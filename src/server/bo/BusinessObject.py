@@ -6,7 +6,13 @@ class BusinessObject(ABC):
 
     Zentrales Merkmal ist, dass jedes BusinessObject eine Nummer besitzt, die man in
     einer relationalen Datenbank auch als Primärschlüssel bezeichnen würde.
+
+    Alle BusinessObjects legen ihre Attribute in __slots__ fest. Dadurch benötigt jede Instanz
+    kein eigenes __dict__ und damit deutlich weniger Speicher, was sich bei großen Ergebnismengen
+    der Mapper bemerkbar macht.
     """
+    __slots__ = ('_id',)
+
     def __init__(self):
         self._id = 0   # Die eindeutige Identifikationsnummer einer Instanz dieser Klasse.
 
@@ -17,4 +23,3 @@ class BusinessObject(ABC):
     def set_id(self,value):
         """Setzen der ID."""
         self._id = value
-
@@ -7,6 +7,8 @@ class Customer (bo.BusinessObject):
     Aus Gründen der Vereinfachung besitzt der Kunden in diesem Demonstrator
     lediglich einen Vornamen und einen Nachnamen.
     """
+    __slots__ = ('_first_name', '_last_name')
+
     def __init__(self):
         super().__init__()
         self._first_name = ""  # Der Vorname des Kunden.
@@ -43,3 +45,13 @@ class Customer (bo.BusinessObject):
         obj.set_first_name(dictionary["first_name"])
         obj.set_last_name(dictionary["last_name"])
         return obj
+
+    @staticmethod
+    def from_tuple(row):
+        """Umwandeln eines DB-Tupels (id, firstName, lastName) in einen Customer().
+
+        Anders als bei from_dict werden __init__ und die Setter umgangen, da jedes Attribut
+        ohnehin unmittelbar aus dem Tupel gesetzt wird (vgl. Mapper._build_all)."""
+        obj = Customer.__new__(Customer)
+        (obj._id, obj._first_name, obj._last_name) = row
+        return obj
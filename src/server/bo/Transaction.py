@@ -8,6 +8,8 @@ class Transaction (bo.BusinessObject):
     ein Zielkonto besitzt, zwischen denen ein Betrag, der als Geld
     interopretiert wird, umgebucht wird.
     """
+    __slots__ = ('_source_account', '_target_account', '_amount')
+
     def __init__(self):
         super().__init__()
         self._source_account = None  # Fremdschlüsselbeziehung zum Quellkonto.
@@ -55,3 +57,11 @@ class Transaction (bo.BusinessObject):
         obj.set_target_account(dictionary["target_account"])
         obj.set_amount(dictionary["amount"])
         return obj
+
+    @staticmethod
+    def from_tuple(row):
+        """Umwandeln eines DB-Tupels (id, sourceAccount, targetAccount, amount) in eine
+        Transaction() (vgl. Customer.from_tuple)."""
+        obj = Transaction.__new__(Transaction)
+        (obj._id, obj._source_account, obj._target_account, obj._amount) = row
+        return obj
@@ -8,40 +8,42 @@ class User (bo.BusinessObject):
     lediglich einen einfachen Namen, eine E_Mail-Adresse sowie eine außerhalb
     unseres Systems verwaltete User ID (z.B. die Google ID).
     """
+    __slots__ = ('_name', '_email', '_user_id')
+
     def __init__(self):
         super().__init__()
-        self.__name = ""  # Der Name des Benutzers.
-        self.__email = ""  # Die E-Mail-Adresse des Benutzers.
-        self.__user_id = ""  # Die extern verwaltete User ID.
+        self._name = ""  # Der Name des Benutzers.
+        self._email = ""  # Die E-Mail-Adresse des Benutzers.
+        self._user_id = ""  # Die extern verwaltete User ID.
 
 
     def get_name(self):
         """Auslesen des Benutzernamens."""
-        return self.__name
+        return self._name
 
     def set_name(self, value):
         """Setzen des Benutzernamens."""
-        self.__name = value
+        self._name = value
 
     def get_email(self):
         """Auslesen der E-Mail-Adresse."""
-        return self.__email
+        return self._email
 
     def set_email(self, value):
         """Setzen der E-Mail-Adresse."""
-        self.__email = value
+        self._email = value
 
     def get_user_id(self):
         """Auslesen der externen User ID (z.B. Google ID)."""
-        return self.__user_id
+        return self._user_id
 
     def set_user_id(self, value):
         """Setzen der externen User ID (z.B. Google ID)."""
-        self.__user_id = value
+        self._user_id = value
 
     def __str__(self):
         """Erzeugen einer einfachen textuellen Darstellung der jeweiligen Instanz."""
-        return "User: {}, {}, {}, {}".format(self.get_id(), self.__name, self.__email, self.__user_id)
+        return "User: {}, {}, {}, {}".format(self.get_id(), self._name, self._email, self._user_id)
 
     @staticmethod
     def from_dict(dictionary=dict()):
@@ -52,3 +54,11 @@ class User (bo.BusinessObject):
         obj.set_email(dictionary["email"])
         obj.set_user_id(dictionary["user_id"])
         return obj
+
+    @staticmethod
+    def from_tuple(row):
+        """Umwandeln eines DB-Tupels (id, name, email, google_user_id) in einen User()
+        (vgl. Customer.from_tuple)."""
+        obj = User.__new__(User)
+        (obj._id, obj._name, obj._email, obj._user_id) = row
+        return obj
@@ -19,18 +19,55 @@ class AccountMapper (Mapper):
         :return Eine Sammlung mit Account-Objekten, die sämtliche Konten
                 repräsentieren.
         """
-        result = []
         cursor = self._cnx.cursor()
         cursor.execute("SELECT id, owner from accounts")
         tuples = cursor.fetchall()
 
-        for (id, owner) in tuples:
-            account = Account()
-            account.set_id(id)
-            account.set_owner(owner)
-            result.append(account)
+        result = self._build_all(Account, tuples)
+
+        cursor.close()
+
+        return result
+
+    def iter_all(self, chunk_size=500):
+        """Auslesen aller Konten als Generator.
+
+        Im Gegensatz zu find_all wird das Ergebnis nicht vollständig in den Speicher geladen.
+        Ein ungepufferter Cursor holt die Tupel blockweise (chunk_size) vom Datenbankserver,
+        so dass der Speicherbedarf unabhängig von der Größe der Tabelle konstant bleibt.
+
+        **ACHTUNG:** Solange der Generator nicht vollständig durchlaufen wurde, kann auf
+        derselben Verbindung keine weitere Abfrage ausgeführt werden.
+
+        :param chunk_size Anzahl der Tupel, die jeweils in einem Block gelesen werden.
+        :return Generator, der nacheinander Account-Objekte liefert.
+        """
+        cursor = self._cnx.cursor()
+
+        try:
+            cursor.execute("SELECT id, owner FROM accounts ORDER BY id")
+            tuples = cursor.fetchmany(chunk_size)
+
+            while len(tuples) > 0:
+                yield from map(Account.from_tuple, tuples)
+                tuples = cursor.fetchmany(chunk_size)
+        finally:
+            self._close_streaming_cursor(cursor)
+
+    def find_page(self, after_id, limit):
+        """Auslesen einer Seite von Konten (Keyset-Pagination).
+
+        :param after_id Schlüssel des letzten Kontos der vorherigen Seite (0 für die erste Seite).
+        :param limit maximale Anzahl der Konten auf dieser Seite.
+        :return Eine Sammlung mit höchstens limit Account-Objekten, aufsteigend nach ID sortiert.
+        """
+        cursor = self._cnx.cursor()
+        command = "SELECT id, owner FROM accounts WHERE id > %s ORDER BY id LIMIT %s"
+        cursor.execute(command, (after_id, limit))
+        tuples = cursor.fetchall()
+
+        result = self._build_all(Account, tuples)
 
-        self._cnx.commit()
         cursor.close()
 
         return result
@@ -42,51 +79,76 @@ class AccountMapper (Mapper):
         :return Eine Sammlung mit Account-Objekten, die sämtliche Konten des
                 betreffenden Kunden repräsentieren.
         """
-        result = []
         cursor = self._cnx.cursor()
         command = "SELECT id, owner FROM accounts WHERE owner={} ORDER BY id".format(owner_id)
         cursor.execute(command)
         tuples = cursor.fetchall()
 
-        for (id, owner) in tuples:
-            account = Account()
-            account.set_id(id)
-            account.set_owner(owner)
-            result.append(account)
+        result = self._build_all(Account, tuples)
 
-        self._cnx.commit()
         cursor.close()
 
         return result
 
-    def find_by_key(self, key):
-        """Suchen eines Kontos mit vorgegebener Kontonummer. Da diese eindeutig ist,
-        wird genau ein Objekt zurückgegeben.
+    def find_with_balances_by_owner_id(self, owner_id):
+        """Auslesen aller Konten eines Kunden samt deren Kontoständen mit einem einzigen SELECT.
 
-        :param id Primärschlüsselattribut (->DB)
-        :return Konto-Objekt, das dem übergebenen Schlüssel entspricht, None bei
-            nicht vorhandenem DB-Tupel.
-        """
-        result = None
+        Die Kontostände stammen aus der Tabelle account_balances. Konten ohne Buchungen besitzen
+        dort (noch) keinen Eintrag und erhalten den Kontostand 0.
 
+        :param owner_id Schlüssel des zugehörigen Kunden.
+        :return Eine Sammlung von Tupeln (Account-Objekt, Summe der Gutschriften, Summe der
+            Lastschriften, Saldo), aufsteigend nach Kontonummer sortiert.
+        """
         cursor = self._cnx.cursor()
-        command = "SELECT id, owner FROM accounts WHERE id={}".format(key)
-        cursor.execute(command)
+        command = "SELECT a.id, a.owner, COALESCE(b.credit, 0), COALESCE(b.debit, 0) " \
+                  "FROM accounts AS a LEFT JOIN account_balances AS b ON b.account = a.id " \
+                  "WHERE a.owner=%s ORDER BY a.id"
+        cursor.execute(command, (owner_id,))
         tuples = cursor.fetchall()
 
-        if tuples[0] is not None:
-            (id, owner) = tuples[0]
-            account = Account()
-            account.set_id(id)
-            account.set_owner(owner)
-
-        result = account
+        result = [(Account.from_tuple((id, owner)), credit, debit, credit - debit)
+                  for (id, owner, credit, debit) in tuples]
 
-        self._cnx.commit()
         cursor.close()
 
         return result
 
+    def find_existing_ids(self, keys):
+        """Feststellen, welche der gegebenen Kontonummern tatsächlich existieren.
+
+        :param keys eine Sammlung von Primärschlüsseln
+        :return Menge derjenigen Schlüssel, zu denen ein Konto existiert.
+        """
+        tuples = self._fetch_by_keys("SELECT id FROM accounts WHERE id IN ({})", keys)
+        return set(id for (id,) in tuples)
+
+    def find_by_keys(self, keys):
+        """Auslesen mehrerer Konten anhand ihrer Kontonummern mit möglichst wenigen SELECT-Aufrufen.
+
+        :param keys eine Sammlung von Primärschlüsseln
+        :return Eine Sammlung mit Account-Objekten, aufsteigend nach ID sortiert. Schlüssel, zu
+            denen kein Konto existiert, werden übergangen.
+        """
+        tuples = self._fetch_by_keys("SELECT id, owner FROM accounts WHERE id IN ({}) ORDER BY id", keys)
+        return self._build_all(Account, tuples)
+
+    def find_by_key(self, key):
+        """Suchen eines Kontos mit vorgegebener Kontonummer. Da diese eindeutig ist,
+        wird genau ein Objekt zurückgegeben. Wiederholte Aufrufe werden aus dem
+        ObjectCache beantwortet (vgl. Mapper._find_row_cached).
+
+        :param id Primärschlüsselattribut (->DB)
+        :return Konto-Objekt, das dem übergebenen Schlüssel entspricht, None bei
+            nicht vorhandenem DB-Tupel.
+        """
+        row = self._find_row_cached("accounts", key, "SELECT id, owner FROM accounts WHERE id=%s")
+
+        if row is None:
+            return None
+
+        return Account.from_tuple(row)
+
     def insert(self, account):
         """Einfügen eines Account-Objekts in die Datenbank.
         
@@ -97,17 +159,16 @@ class AccountMapper (Mapper):
         :return das bereits übergebene Objekt, jedoch mit ggf. korrigierter ID.
         """
         cursor = self._cnx.cursor()
-        cursor.execute("SELECT MAX(id) AS maxid FROM accounts ")
-        tuples = cursor.fetchall()
-
-        for (maxid) in tuples:
-            account.set_id(maxid[0]+1)
+        account.set_id(self._allocate_id("accounts"))
 
         command = "INSERT INTO accounts (id, owner) VALUES (%s,%s)"
         data = (account.get_id(), account.get_owner())
         cursor.execute(command, data)
 
-        self._cnx.commit()
+        self._touch(cursor, "accounts", "account:{}".format(account.get_id()))
+
+        self._commit()
+        self._changed("accounts")
         cursor.close()
         return account
 
@@ -122,7 +183,12 @@ class AccountMapper (Mapper):
         data = (account.get_owner(), account.get_id())
         cursor.execute(command, data)
 
-        self._cnx.commit()
+        self._invalidate("accounts", account.get_id())
+
+        self._touch(cursor, "accounts", "account:{}".format(account.get_id()))
+
+        self._commit()
+        self._changed("accounts")
         cursor.close()
 
     def delete(self, account):
@@ -135,7 +201,16 @@ class AccountMapper (Mapper):
         command = "DELETE FROM accounts WHERE id={}".format(account.get_id())
         cursor.execute(command)
 
-        self._cnx.commit()
+        self._invalidate("accounts", account.get_id())
+
+        command = "DELETE FROM account_balances WHERE account=%s"
+        cursor.execute(command, (account.get_id(),))
+
+        self._touch(cursor, "accounts", "account:{}".format(account.get_id()),
+                    "balance:{}".format(account.get_id()))
+
+        self._commit()
+        self._changed("accounts")
         cursor.close()
 
 """Zu Testzwecken können wir diese Datei bei Bedarf auch ausführen, 
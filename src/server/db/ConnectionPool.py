@@ -0,0 +1,213 @@
+import mysql.connector as connector
+import os
+import threading
+import time
+from collections import deque
+
+
+class PoolTimeoutError(Exception):
+    """Wird ausgelöst, wenn innerhalb des Checkout-Timeouts keine Verbindung frei wurde."""
+    pass
+
+
+class ConnectionPool (object):
+    """Prozessweiter, threadsicherer Pool von Datenbankverbindungen.
+
+    Bislang hat jeder Mapper beim Betreten des with-Blocks eine eigene Verbindung
+    aufgebaut und beim Verlassen wieder geschlossen. Ein einziger REST-Aufruf hat so
+    leicht ein Dutzend TCP- und Authentifizierungs-Handshakes ausgelöst. Der Pool hält
+    stattdessen eine Reihe bereits geöffneter Verbindungen vor, die sich die Mapper
+    ausleihen (checkout) und anschließend wieder zurückgeben (release).
+
+    Das Verhalten lässt sich über folgende Parameter steuern:
+    - pool_size: Anzahl der Verbindungen, die dauerhaft offen gehalten werden,
+    - max_overflow: Anzahl zusätzlicher Verbindungen, die bei Lastspitzen geöffnet und
+      bei Rückgabe sofort wieder geschlossen werden,
+    - timeout: maximale Wartezeit (Sekunden) auf eine freie Verbindung,
+    - recycle: maximales Alter (Sekunden) einer Verbindung, bevor sie ersetzt wird,
+    - pre_ping: Prüfen der Verbindung beim Checkout (Health Check).
+
+    Die Standardwerte können über die Umgebungsvariablen DB_POOL_SIZE, DB_POOL_MAX_OVERFLOW,
+    DB_POOL_TIMEOUT, DB_POOL_RECYCLE und DB_POOL_PRE_PING überschrieben werden.
+    """
+
+    __instance = None
+    __instance_lock = threading.Lock()
+
+    def __init__(self, connection_params, pool_size=5, max_overflow=10, timeout=30.0,
+                 recycle=3600.0, pre_ping=True):
+        self._connection_params = dict(connection_params)
+        self._pool_size = pool_size
+        self._max_overflow = max_overflow
+        self._timeout = timeout
+        self._recycle = recycle
+        self._pre_ping = pre_ping
+
+        self._idle = deque()  # Freie Verbindungen als Tupel (Verbindung, Erzeugungszeitpunkt).
+        self._created = {}  # Erzeugungszeitpunkt je ausgeliehener Verbindung (id -> Zeitpunkt).
+        self._size = 0  # Anzahl aktuell geöffneter Verbindungen (frei + ausgeliehen).
+        self._opened = 0  # Anzahl der bisher geöffneten Verbindungen.
+        self._closed = 0  # Anzahl der bisher geschlossenen Verbindungen.
+        self._condition = threading.Condition()
+
+    @staticmethod
+    def get_instance():
+        """Auslesen des prozessweiten Pools. Dieser wird beim ersten Zugriff angelegt."""
+        if ConnectionPool.__instance is None:
+            with ConnectionPool.__instance_lock:
+                if ConnectionPool.__instance is None:
+                    from server.db.Mapper import Mapper
+                    ConnectionPool.__instance = ConnectionPool.create(Mapper.get_connection_params())
+        return ConnectionPool.__instance
+
+    @staticmethod
+    def create(connection_params):
+        """Anlegen eines Pools mit den über Umgebungsvariablen eingestellten Parametern (s.o.)."""
+        return ConnectionPool(connection_params,
+                              pool_size=int(os.getenv('DB_POOL_SIZE', '5')),
+                              max_overflow=int(os.getenv('DB_POOL_MAX_OVERFLOW', '10')),
+                              timeout=float(os.getenv('DB_POOL_TIMEOUT', '30')),
+                              recycle=float(os.getenv('DB_POOL_RECYCLE', '3600')),
+                              pre_ping=os.getenv('DB_POOL_PRE_PING', '1') != '0')
+
+    @staticmethod
+    def create_for(spec):
+        """Anlegen eines Pools für eine weitere Datenbank (z.B. ein Lesereplikat oder einen Shard).
+
+        Benutzer und Passwort entsprechen der primären Datenbank (vgl. Mapper.get_connection_params).
+
+        :param spec Angabe der Form host:port[/database], z.B. localhost:3307 oder localhost:3306/bank_shard1
+        """
+        from server.db.Mapper import Mapper
+
+        params = Mapper.get_connection_params()
+        params.pop('unix_socket', None)
+
+        address, _, database = spec.partition('/')
+        host, _, port = address.partition(':')
+        params['host'] = host
+        params['port'] = int(port) if port != '' else 3306
+        if database != '':
+            params['database'] = database
+
+        return ConnectionPool.create(params)
+
+    def checkout(self):
+        """Ausleihen einer Verbindung.
+
+        Bevorzugt wird eine freie Verbindung aus dem Pool. Ist keine frei, so wird eine
+        neue geöffnet, sofern pool_size + max_overflow noch nicht erreicht ist. Andernfalls
+        wird bis zu timeout Sekunden auf eine Rückgabe gewartet.
+
+        :raise PoolTimeoutError falls in der Wartezeit keine Verbindung frei wurde.
+        """
+        deadline = time.monotonic() + self._timeout
+
+        while True:
+            with self._condition:
+                while not self._idle and self._size >= self._pool_size + self._max_overflow:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise PoolTimeoutError(
+                            "Keine freie Datenbankverbindung nach {} Sekunden".format(self._timeout))
+                    self._condition.wait(remaining)
+
+                if self._idle:
+                    cnx, created = self._idle.pop()
+                else:
+                    """Wir reservieren den Platz bereits jetzt, bauen die Verbindung aber erst
+                    außerhalb des Locks auf, damit andere Threads nicht blockiert werden."""
+                    cnx, created = None, None
+                    self._size += 1
+
+            if cnx is None:
+                try:
+                    cnx = connector.connect(**self._connection_params)
+                except Exception:
+                    self._forget()
+                    raise
+                created = time.monotonic()
+                with self._condition:
+                    self._opened += 1
+            elif not self._is_usable(cnx, created):
+                self._close(cnx)
+                continue
+
+            with self._condition:
+                self._created[id(cnx)] = created
+            return cnx
+
+    def release(self, cnx):
+        """Rückgabe einer zuvor ausgeliehenen Verbindung.
+
+        Eine evtl. noch offene Transaktion wird zurückgerollt, damit der nächste Nutzer
+        eine saubere Verbindung erhält. Verbindungen, die über pool_size hinaus geöffnet
+        wurden, sowie defekte Verbindungen werden geschlossen.
+        """
+        with self._condition:
+            created = self._created.pop(id(cnx), None)
+
+        try:
+            if cnx.unread_result:
+                """Ein nicht vollständig gelesenes Ergebnis (z.B. eines abgebrochenen
+                Streaming-Cursors) lässt sich nicht sinnvoll bereinigen."""
+                raise connector.InterfaceError("Unread result found")
+            if cnx.in_transaction:
+                cnx.rollback()
+        except connector.Error:
+            self._close(cnx)
+            return
+
+        with self._condition:
+            if created is None or len(self._idle) >= self._pool_size:
+                close = True
+            else:
+                self._idle.append((cnx, created))
+                self._condition.notify()
+                close = False
+
+        if close:
+            self._close(cnx)
+
+    def get_stats(self):
+        """Auslesen der Statistik des Pools als Tupel (geöffnete Verbindungen, davon frei,
+        bisher insgesamt geöffnet, bisher insgesamt geschlossen)."""
+        with self._condition:
+            return self._size, len(self._idle), self._opened, self._closed
+
+    def dispose(self):
+        """Schließen aller freien Verbindungen, z.B. beim Herunterfahren des Prozesses."""
+        with self._condition:
+            idle = list(self._idle)
+            self._idle.clear()
+
+        for cnx, created in idle:
+            self._close(cnx)
+
+    def _is_usable(self, cnx, created):
+        """Prüfen, ob eine freie Verbindung weiterverwendet werden darf."""
+        if self._recycle is not None and time.monotonic() - created > self._recycle:
+            return False
+
+        if self._pre_ping:
+            try:
+                cnx.ping(reconnect=False)
+            except connector.Error:
+                return False
+
+        return True
+
+    def _close(self, cnx):
+        """Schließen einer Verbindung und Freigabe ihres Platzes im Pool."""
+        try:
+            cnx.close()
+        except connector.Error:
+            pass
+        with self._condition:
+            self._closed += 1
+        self._forget()
+
+    def _forget(self):
+        with self._condition:
+            self._size -= 1
+            self._condition.notify()
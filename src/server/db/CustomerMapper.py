@@ -19,19 +19,59 @@ class CustomerMapper (Mapper):
         :return Eine Sammlung mit Customer-Objekten, die sämtliche Kunden
                 repräsentieren.
         """
-        result = []
         cursor = self._cnx.cursor()
-        cursor.execute("SELECT * from customers")
+        cursor.execute("SELECT id, firstName, lastName FROM customers")
         tuples = cursor.fetchall()
 
-        for (id, firstName, lastName) in tuples:
-            person = Customer()
-            person.set_id(id)
-            person.set_first_name(firstName)
-            person.set_last_name(lastName)
-            result.append(person)
+        result = self._build_all(Customer, tuples)
+
+        cursor.close()
+
+        return result
+
+    def iter_all(self, chunk_size=500):
+        """Auslesen aller Kunden als Generator.
+
+        Im Gegensatz zu find_all wird das Ergebnis nicht vollständig in den Speicher geladen.
+        Ein ungepufferter Cursor holt die Tupel blockweise (chunk_size) vom Datenbankserver,
+        so dass der Speicherbedarf unabhängig von der Größe der Tabelle konstant bleibt.
+
+        **ACHTUNG:** Solange der Generator nicht vollständig durchlaufen wurde, kann auf
+        derselben Verbindung keine weitere Abfrage ausgeführt werden.
+
+        :param chunk_size Anzahl der Tupel, die jeweils in einem Block gelesen werden.
+        :return Generator, der nacheinander Customer-Objekte liefert.
+        """
+        cursor = self._cnx.cursor()
+
+        try:
+            cursor.execute("SELECT id, firstName, lastName FROM customers ORDER BY id")
+            tuples = cursor.fetchmany(chunk_size)
+
+            while len(tuples) > 0:
+                yield from map(Customer.from_tuple, tuples)
+                tuples = cursor.fetchmany(chunk_size)
+        finally:
+            self._close_streaming_cursor(cursor)
+
+    def find_page(self, after_id, limit):
+        """Auslesen einer Seite von Kunden (Keyset-Pagination).
+
+        Statt mit OFFSET zu blättern, setzen wir direkt hinter dem letzten Schlüssel der
+        vorherigen Seite auf. Über den Primärschlüssel kostet dies unabhängig von der
+        Position in der Tabelle stets nur einen Indexzugriff.
+
+        :param after_id Schlüssel des letzten Kunden der vorherigen Seite (0 für die erste Seite).
+        :param limit maximale Anzahl der Kunden auf dieser Seite.
+        :return Eine Sammlung mit höchstens limit Customer-Objekten, aufsteigend nach ID sortiert.
+        """
+        cursor = self._cnx.cursor()
+        command = "SELECT id, firstName, lastName FROM customers WHERE id > %s ORDER BY id LIMIT %s"
+        cursor.execute(command, (after_id, limit))
+        tuples = cursor.fetchall()
+
+        result = self._build_all(Customer, tuples)
 
-        self._cnx.commit()
         cursor.close()
 
         return result
@@ -43,55 +83,43 @@ class CustomerMapper (Mapper):
         :return Eine Sammlung mit Customer-Objekten, die sämtliche Kunden
             mit dem gewünschten Nachnamen enthält.
         """
-        result = []
         cursor = self._cnx.cursor()
         command = "SELECT id, firstName, lastName FROM customers WHERE lastName LIKE '{}' ORDER BY lastName".format(name)
         cursor.execute(command)
         tuples = cursor.fetchall()
 
-        for (id, firstName, lastName) in tuples:
-            person = Customer()
-            person.set_id(id)
-            person.set_first_name(firstName)
-            person.set_last_name(lastName)
-            result.append(person)
+        result = self._build_all(Customer, tuples)
 
-        self._cnx.commit()
         cursor.close()
 
         return result
 
     def find_by_key(self, key):
         """Suchen eines Kunden mit vorgegebener Kundennummer. Da diese eindeutig ist,
-        wird genau ein Objekt zurückgegeben.
+        wird genau ein Objekt zurückgegeben. Wiederholte Aufrufe werden aus dem
+        ObjectCache beantwortet (vgl. Mapper._find_row_cached).
 
         :param key Primärschlüsselattribut (->DB)
         :return Customer-Objekt, das dem übergebenen Schlüssel entspricht, None bei
             nicht vorhandenem DB-Tupel.
         """
-        result = None
+        row = self._find_row_cached("customers", key, "SELECT id, firstName, lastName FROM customers WHERE id=%s")
 
-        cursor = self._cnx.cursor()
-        command = "SELECT id, firstName, lastName FROM customers WHERE id={}".format(key)
-        cursor.execute(command)
-        tuples = cursor.fetchall()
+        if row is None:
+            return None
 
-        try:
-            (id, firstName, lastName) = tuples[0]
-            person = Customer()
-            person.set_id(id)
-            person.set_first_name(firstName)
-            person.set_last_name(lastName)
-            result = person
-        except IndexError:
-            """Der IndexError wird oben beim Zugriff auf tuples[0] auftreten, wenn der vorherige SELECT-Aufruf
-            keine Tupel liefert, sondern tuples = cursor.fetchall() eine leere Sequenz zurück gibt."""
-            result = None
-
-        self._cnx.commit()
-        cursor.close()
+        return Customer.from_tuple(row)
 
-        return result
+    def find_by_keys(self, keys):
+        """Auslesen mehrerer Kunden anhand ihrer IDs mit möglichst wenigen SELECT-Aufrufen.
+
+        :param keys eine Sammlung von Primärschlüsseln
+        :return Eine Sammlung mit Customer-Objekten, aufsteigend nach ID sortiert. Schlüssel,
+            zu denen kein Kunde existiert, werden übergangen.
+        """
+        tuples = self._fetch_by_keys(
+            "SELECT id, firstName, lastName FROM customers WHERE id IN ({}) ORDER BY id", keys)
+        return self._build_all(Customer, tuples)
 
     def insert(self, person):
         """Einfügen eines Customer-Objekts in die Datenbank.
@@ -103,11 +131,7 @@ class CustomerMapper (Mapper):
         :return das bereits übergebene Objekt, jedoch mit ggf. korrigierter ID.
         """
         cursor = self._cnx.cursor()
-        cursor.execute("SELECT MAX(id) AS maxid FROM customers ")
-        tuples = cursor.fetchall()
-
-        for (maxid) in tuples:
-            person.set_id(maxid[0]+1)
+        person.set_id(self._allocate_id("customers"))
 
         """
         Eine Möglichkeit, ein INSERT zu erstellen, ist diese:
@@ -122,7 +146,10 @@ class CustomerMapper (Mapper):
         data = (person.get_id(), person.get_first_name(), person.get_last_name())
         cursor.execute(command, data)
 
-        self._cnx.commit()
+        self._touch(cursor, "customers", "customer:{}".format(person.get_id()))
+
+        self._commit()
+        self._changed("customers")
         cursor.close()
 
         return person
@@ -138,7 +165,12 @@ class CustomerMapper (Mapper):
         data = (person.get_first_name(), person.get_last_name(), person.get_id())
         cursor.execute(command, data)
 
-        self._cnx.commit()
+        self._invalidate("customers", person.get_id())
+
+        self._touch(cursor, "customers", "customer:{}".format(person.get_id()))
+
+        self._commit()
+        self._changed("customers")
         cursor.close()
 
     def delete(self,person):
@@ -151,7 +183,12 @@ class CustomerMapper (Mapper):
         command = "DELETE FROM customers WHERE id={}".format(person.get_id())
         cursor.execute(command)
 
-        self._cnx.commit()
+        self._invalidate("customers", person.get_id())
+
+        self._touch(cursor, "customers", "customer:{}".format(person.get_id()))
+
+        self._commit()
+        self._changed("customers")
         cursor.close()
 
 
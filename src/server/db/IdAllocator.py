@@ -0,0 +1,139 @@
+import os
+import threading
+from abc import ABC, abstractmethod
+
+from server.db.ConnectionPool import ConnectionPool
+from server.db.ShardRouter import ShardRouter
+
+
+class IdAllocator (ABC):
+    """Abstrakte Basisklasse für die Vergabe von Primärschlüsseln.
+
+    Die Mapper fragen bei jedem insert einen neuen Schlüssel für ihre Tabelle an. Welche
+    Strategie dahinter steckt, ist austauschbar (vgl. Mapper.set_id_allocator)."""
+
+    def next_id(self, table):
+        """Vergeben eines neuen Primärschlüssels für die gegebene Tabelle."""
+        return self.next_ids(table, 1)[0]
+
+    @abstractmethod
+    def next_ids(self, table, count):
+        """Vergeben von count neuen Primärschlüsseln für die gegebene Tabelle.
+
+        :return Eine Liste mit count eindeutigen Schlüsseln.
+        """
+        pass
+
+
+class SequenceTableIdAllocator (IdAllocator):
+    """Blockweise Vergabe von Primärschlüsseln nach dem Hi/Lo-Verfahren.
+
+    Für jede Tabelle wird in der Tabelle id_sequences der nächste freie Schlüssel geführt.
+    Statt für jedes insert SELECT MAX(id) auszuführen, reserviert der Allocator mit einem
+    einzigen atomaren UPDATE gleich einen ganzen Block von block_size Schlüsseln und vergibt
+    diese anschließend prozessintern. Gleichzeitige inserts (auch aus anderen Prozessen)
+    können so nicht mehr denselben Schlüssel erhalten.
+
+    Die Reservierung erfolgt über eine eigene Verbindung mit sofortigem Commit, damit die
+    Zeile in id_sequences nicht bis zum Ende des jeweiligen Requests gesperrt bleibt. Diese
+    Verbindung stammt aus einem eigenen Pool mit genau einer Verbindung (vgl. _get_pool) und nicht
+    aus dem Pool der Requests: Halten sämtliche Requests dort eine Verbindung und benötigen alle
+    einen neuen Block, so könnte sonst keiner von ihnen reservieren.
+    Nicht vergebene Schlüssel eines Blocks gehen beim Beenden des Prozesses verloren; es
+    entstehen also Lücken, aber niemals Duplikate.
+    """
+
+    def __init__(self, block_size=50, pool=None):
+        self._block_size = block_size
+        self._pool = pool  # Pool allein für die Reservierungen, wird bei Bedarf angelegt.
+        self._blocks = {}  # Tabelle -> (nächster freier Schlüssel, Ende des Blocks exklusiv)
+        self._locks = {}  # Tabelle -> (Sperre des Blocks, Sperre für dessen Reservierung)
+        self._lock = threading.Lock()  # Schützt lediglich self._locks und self._pool.
+
+    def next_ids(self, table, count):
+        """Gesperrt wird je Tabelle: Das Reservieren eines Blocks für eine Tabelle hält die Vergabe für
+        andere Tabellen nicht auf. Während der Reservierung (Warten auf eine Verbindung aus dem Pool
+        und Transaktion auf id_sequences) ist zudem nicht der Block selbst gesperrt, sondern lediglich
+        eine zweite Sperre, die gleichzeitige Reservierungen derselben Tabelle verhindert."""
+        result = []
+        (block_lock, reserve_lock) = self._locks_for(table)
+
+        while True:
+            with block_lock:
+                self._take(table, count, result)
+            if len(result) >= count:
+                return result
+
+            with reserve_lock:
+                with block_lock:
+                    (next_id, end) = self._blocks.get(table, (0, 0))
+                if next_id < end:
+                    """Ein anderer Thread hat in der Zwischenzeit bereits reserviert."""
+                    continue
+
+                pool = self._get_pool()
+                cnx = pool.checkout()
+                try:
+                    block = self._reserve(cnx, table, max(self._block_size, count - len(result)))
+                finally:
+                    pool.release(cnx)
+
+                with block_lock:
+                    self._blocks[table] = block
+
+    def _get_pool(self):
+        """Auslesen des Pools für die Reservierungen, standardmäßig mit einer einzigen Verbindung zur
+        primären Datenbank. Die Reservierungen sind kurz; gleichzeitige Reservierungen für verschiedene
+        Tabellen warten aufeinander höchstens DB_POOL_TIMEOUT Sekunden."""
+        with self._lock:
+            if self._pool is None:
+                from server.db.Mapper import Mapper
+                self._pool = ConnectionPool(Mapper.get_connection_params(), pool_size=1, max_overflow=0,
+                                            timeout=float(os.getenv('DB_POOL_TIMEOUT', '30')),
+                                            recycle=float(os.getenv('DB_POOL_RECYCLE', '3600')),
+                                            pre_ping=os.getenv('DB_POOL_PRE_PING', '1') != '0')
+            return self._pool
+
+    def _locks_for(self, table):
+        with self._lock:
+            if table not in self._locks:
+                self._locks[table] = (threading.Lock(), threading.Lock())
+            return self._locks[table]
+
+    def _take(self, table, count, result):
+        """Entnehmen von bis zu count - len(result) Schlüsseln aus dem aktuellen Block der Tabelle."""
+        (next_id, end) = self._blocks.get(table, (0, 0))
+        taken = max(0, min(end - next_id, count - len(result)))
+        result.extend(range(next_id, next_id + taken))
+        self._blocks[table] = (next_id + taken, end)
+
+    def _reserve(self, cnx, table, size):
+        """Reservieren eines Blocks von size Schlüsseln in der Tabelle id_sequences.
+
+        :param cnx eine eigene Verbindung aus dem Pool, auf der sofort committet wird
+        :return Tupel (erster Schlüssel, Ende des Blocks exklusiv)
+        """
+        cursor = cnx.cursor()
+        command = "UPDATE id_sequences SET next_id=LAST_INSERT_ID(next_id+%s) WHERE name=%s"
+        cursor.execute(command, (size, table))
+
+        if cursor.rowcount == 0:
+            """Für diese Tabelle wurde noch nie ein Block reserviert. Wir setzen die Sequenz
+            daher auf den bisher größten Schlüssel der Tabelle auf. Ist die Tabelle auf Shards
+            verteilt (vgl. ShardRouter), so zählen auch deren Schlüssel."""
+            cursor.execute("SELECT COALESCE(MAX(id), 0) FROM {}".format(table))
+            (max_id,) = cursor.fetchone()
+
+            if table in ShardRouter.TABLES and ShardRouter.is_configured():
+                max_id = max(max_id, ShardRouter.get_instance().find_max_id(table))
+
+            cursor.execute("INSERT IGNORE INTO id_sequences (name, next_id) VALUES (%s, %s)", (table, max_id + 1))
+            cursor.execute(command, (size, table))
+
+        cursor.execute("SELECT LAST_INSERT_ID()")
+        (end,) = cursor.fetchone()
+
+        cnx.commit()
+        cursor.close()
+
+        return end - size, end
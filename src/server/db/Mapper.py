@@ -1,19 +1,118 @@
-import mysql.connector as connector
+import functools
+import inspect
 import os
+import time
+import mysql.connector as connector
 from contextlib import AbstractContextManager
 from abc import ABC, abstractmethod
 
+from server.db.ConnectionPool import ConnectionPool
+from server.db.IdAllocator import SequenceTableIdAllocator
+from server.db.ObjectCache import ObjectCache
+from server.db.ReplicaRouter import ReplicaRouter
+from server.db.ShardRouter import ShardRouter
+from server.db.UnitOfWork import UnitOfWork
+from server.db.TracedConnection import TracedConnection
+from server.RequestTrace import RequestTrace
+from server import Metrics
+
 
 class Mapper (AbstractContextManager, ABC):
     """Abstrakte Basisklasse aller Mapper-Klassen"""
 
+    __id_allocator = None  # Prozessweite Strategie zur Vergabe von Primärschlüsseln.
+    __change_listeners = []  # Funktionen, die über committete Änderungen informiert werden.
+
     def __init__(self):
-        self._cnx = None
+        self._cnx = None  # Die Verbindung, die die aktuell ausgeführte Methode nutzt.
+        self._uow = None  # Die Arbeitseinheit, an der dieser Mapper evtl. teilnimmt.
+        self._primary_cnx = None  # Verbindung zur primären Datenbank, sofern bereits benötigt.
+        self._replica = None  # Das Lesereplikat (vgl. ReplicaRouter), sofern bereits benötigt.
+        self._replica_cnx = None  # Verbindung zu diesem Replikat.
+        self._shard_cnxs = {}  # Verbindungen zu den Shards (vgl. ShardRouter), sofern bereits benötigt.
+        self._routing = False  # Läuft gerade eine öffentliche Methode (vgl. _routed)?
+        self._cache_version = None  # Stand des ObjectCache zu Beginn der Transaktion (ohne Arbeitseinheit).
 
-    def __enter__(self):
-        """Was soll geschehen, wenn wir beginnen, mit dem Mapper zu arbeiten?"""
+    def __init_subclass__(cls, **kwargs):
+        """Sind Metriken aktiviert (vgl. Metrics), so werden alle öffentlichen Methoden jeder Mapper-Klasse
+        so ergänzt, dass Dauer und Anzahl der SQL-Statements je Aufruf erfasst werden. Generatoren
+        (z.B. iter_all) bleiben dabei unverändert, da sie erst nach dem Aufruf durchlaufen werden.
+
+        Sind Lesereplikate konfiguriert (vgl. ReplicaRouter), so wählt zudem jede öffentliche Methode
+        vor ihrer Ausführung die passende Verbindung (vgl. _route): find_* und iter_* lesen, alle
+        übrigen Methoden (insert, update, delete usw.) schreiben."""
+        super().__init_subclass__(**kwargs)
+
+        routed = ReplicaRouter.is_configured()
+
+        for (name, attribute) in list(vars(cls).items()):
+            if name.startswith('_') or not inspect.isfunction(attribute):
+                continue
+
+            method = attribute
+            if Metrics.enabled and not inspect.isgeneratorfunction(attribute):
+                method = Mapper._measured(cls.__name__, name, method)
+            if routed:
+                method = Mapper._routed(method, name.startswith(('find_', 'iter_')),
+                                        inspect.isgeneratorfunction(attribute))
+            if method is not attribute:
+                setattr(cls, name, method)
+
+    @staticmethod
+    def _measured(mapper_name, method_name, function):
+        labels = (mapper_name, method_name)
+
+        @functools.wraps(function)
+        def wrapper(self, *args, **kwargs):
+            trace = RequestTrace.current()
+            queries = trace.get_query_count() if trace is not None else 0
+            start = time.perf_counter()
+            try:
+                return function(self, *args, **kwargs)
+            finally:
+                Metrics.mapper_duration.observe(time.perf_counter() - start, labels)
+                if trace is not None:
+                    Metrics.mapper_queries.inc(labels, trace.get_query_count() - queries)
+
+        return wrapper
 
-        """Wir testen, ob der Code im Kontext der lokalen Entwicklungsumgebung oder in der Cloud ausgeführt wird.
+    @staticmethod
+    def _routed(function, read, generator):
+        """Ergänzen einer öffentlichen Methode um die Wahl der Verbindung (vgl. _route).
+
+        Ruft eine Methode ihrerseits eine öffentliche Methode desselben Mappers auf (z.B. update
+        ein find_by_key), so behält diese die Verbindung der äußeren Methode bei. Bricht die Verbindung zu einem Replikat während einer lesenden Methode ab, so wird das
+        Replikat übergangen und die Methode einmalig auf der primären Datenbank wiederholt. Bei
+        Generatoren ist dies nicht möglich, da bereits Ergebnisse geliefert sein können."""
+
+        @functools.wraps(function)
+        def wrapper(self, *args, **kwargs):
+            if self._routing:
+                return function(self, *args, **kwargs)
+
+            self._routing = True
+            try:
+                self._route(read)
+
+                if not read or generator or not self._is_on_replica():
+                    return function(self, *args, **kwargs)
+
+                try:
+                    return function(self, *args, **kwargs)
+                except (connector.InterfaceError, connector.OperationalError) as exc:
+                    self._discard_replica(exc)
+                    self._route(read)
+                    return function(self, *args, **kwargs)
+            finally:
+                self._routing = False
+
+        return wrapper
+
+    @staticmethod
+    def get_connection_params():
+        """Auslesen der Verbindungsparameter für die Datenbank.
+
+        Wir testen, ob der Code im Kontext der lokalen Entwicklungsumgebung oder in der Cloud ausgeführt wird.
         Dies ist erforderlich, da die Modalitäten für den Verbindungsaufbau mit der Datenbank kontextabhängig sind."""
 
         if os.getenv('GAE_ENV', '').startswith('standard'):
@@ -21,23 +120,338 @@ class Mapper (AbstractContextManager, ABC):
             Die App befindet sich somit im **Production Mode** und zwar im *Standard Environment*.
             Hierbei handelt es sich also um die Verbindung zwischen Google App Engine und Cloud SQL."""
 
-            self._cnx = connector.connect(user='demo', password='demo',
-                                          unix_socket='/cloudsql/python-bankprojekt-thies:europe-west3:bank-db-thies',
-                                          database='bankproject')
+            return dict(user='demo', password='demo',
+                        unix_socket='/cloudsql/python-bankprojekt-thies:europe-west3:bank-db-thies',
+                        database='bankproject')
         else:
             """Wenn wir hier ankommen, dann handelt sich offenbar um die Ausführung des Codes in einer lokalen Umgebung,
             also auf einem Local Development Server. Hierbei stellen wir eine einfache Verbindung zu einer lokal
-            installierten mySQL-Datenbank her."""
+            installierten mySQL-Datenbank her. Über Umgebungsvariablen lässt sich z.B. für Tests eine andere
+            lokale Datenbank wählen."""
+
+            return dict(user=os.getenv('DB_USER', 'root'), password=os.getenv('DB_PASSWORD', 'test'),
+                        host=os.getenv('DB_HOST', 'localhost'), port=int(os.getenv('DB_PORT', '3306')),
+                        database=os.getenv('DB_NAME', 'bankproject'))
+
+    def __enter__(self):
+        """Was soll geschehen, wenn wir beginnen, mit dem Mapper zu arbeiten?
+
+        Ist für den aktuellen Request eine Arbeitseinheit (vgl. UnitOfWork) aktiv, so nutzen wir
+        deren gemeinsame Verbindung. Andernfalls leihen wir uns eine bereits geöffnete Verbindung
+        aus dem prozessweiten Pool (vgl. ConnectionPool).
 
-            self._cnx = connector.connect(user='root', password='test',
-                                  host='localhost',
-                                  database='bankproject')
+        Sind Lesereplikate konfiguriert (vgl. ReplicaRouter), so wird die Verbindung erst beim
+        Aufruf der ersten Methode beschafft, da erst dann feststeht, ob gelesen oder geschrieben
+        wird (vgl. _route).
+
+        Ist für den aktuellen Request ein RequestTrace aktiv, so werden die Zeit für das Beschaffen
+        der Verbindung sowie sämtliche Statements dieses Mappers darin aufgezeichnet."""
+
+        self._uow = UnitOfWork.current()
+
+        if not ReplicaRouter.is_configured():
+            self._cnx = self._primary_cnx = self._connect(self._checkout_primary)
 
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        """Was soll geschehen, wenn wir (evtl. vorübergehend) aufhören, mit dem Mapper zu arbeiten?"""
-        self._cnx.close()
+        """Was soll geschehen, wenn wir (evtl. vorübergehend) aufhören, mit dem Mapper zu arbeiten?
+
+        Die Verbindung wird nicht geschlossen, sondern an den Pool zurückgegeben. Gehört sie zu
+        einer Arbeitseinheit, so verbleibt sie dort bis zum Ende des Requests."""
+        if self._uow is not None:
+            if exc_type is not None:
+                self._uow.mark_rollback_only()
+        else:
+            if self._primary_cnx is not None:
+                ConnectionPool.get_instance().release(self._unwrap(self._primary_cnx))
+            for (shard, cnx) in self._shard_cnxs.items():
+                ShardRouter.get_instance().get_pool(shard).release(self._unwrap(cnx))
+
+        if self._replica_cnx is not None:
+            ReplicaRouter.get_instance().release(self._replica, self._unwrap(self._replica_cnx))
+
+        self._cnx = None
+        self._uow = None
+        self._primary_cnx = None
+        self._replica = None
+        self._replica_cnx = None
+        self._shard_cnxs = {}
+        self._cache_version = None
+
+    def _connect(self, checkout):
+        """Beschaffen einer Verbindung über die gegebene Funktion, ggf. samt Aufzeichnung im RequestTrace."""
+        trace = RequestTrace.current()
+        start = time.perf_counter()
+
+        cnx = checkout()
+
+        if trace is not None and cnx is not None:
+            trace.add_connect(time.perf_counter() - start)
+            cnx = TracedConnection(cnx, trace)
+
+        return cnx
+
+    def _checkout_primary(self):
+        if self._uow is not None:
+            return self._uow.get_connection()
+        self._begin_transaction()
+        return ConnectionPool.get_instance().checkout()
+
+    def _checkout_replica(self):
+        checkout = ReplicaRouter.get_instance().checkout()
+        if checkout is None:
+            return None
+
+        self._replica, cnx = checkout
+        return cnx
+
+    def _checkout_shard(self, shard):
+        if self._uow is not None:
+            return self._uow.get_shard_connection(shard)
+        self._begin_transaction()
+        return ShardRouter.get_instance().get_pool(shard).checkout()
+
+    def _shard_cnx(self, shard):
+        """Auslesen der Verbindung zum Shard mit der gegebenen Nummer (vgl. ShardRouter).
+
+        Die Verbindung wird erst bei Bedarf beschafft und bis __exit__ beibehalten. Innerhalb einer
+        Arbeitseinheit ist es deren Verbindung zu diesem Shard. Lesereplikate gibt es für Shards nicht."""
+        if shard not in self._shard_cnxs:
+            self._shard_cnxs[shard] = self._connect(lambda: self._checkout_shard(shard))
+        return self._shard_cnxs[shard]
+
+    def _begin_transaction(self):
+        """Vermerken des Stands des ObjectCache vor dem ersten Statement einer Transaktion."""
+        if self._cache_version is None:
+            self._cache_version = ObjectCache.get_instance().get_version()
+
+    def _cache_version_at_begin(self):
+        """Auslesen des Stands des ObjectCache zu Beginn der laufenden Transaktion.
+
+        Bei REPEATABLE READ sieht ein SELECT den Stand des ersten Statements der Transaktion, innerhalb
+        einer Arbeitseinheit also evtl. den vor einer zwischenzeitlichen Invalidierung (z.B. nachdem
+        secured bereits den Benutzer gelesen hat). Maßgeblich für ObjectCache.put ist daher dieser
+        Stand und nicht der unmittelbar vor dem SELECT (vgl. UnitOfWork.get_cache_version)."""
+        version = self._uow.get_cache_version() if self._uow is not None else self._cache_version
+        return version if version is not None else ObjectCache.get_instance().get_version()
+
+    @staticmethod
+    def _unwrap(cnx):
+        return cnx.get_connection() if isinstance(cnx, TracedConnection) else cnx
+
+    def _route(self, read):
+        """Wahl der Verbindung für die nächste Methode (nur mit Lesereplikaten, vgl. __init_subclass__).
+
+        Lesende Methoden nutzen ein Replikat, sofern eines verwendbar ist und die Arbeitseinheit
+        dies erlaubt (vgl. UnitOfWork.may_read_from_replica). Wurde im laufenden Request bereits
+        geschrieben bzw. hat derselbe Client kurz zuvor geschrieben, so lesen auch sie von der
+        primären Datenbank und sehen damit ihre eigenen Änderungen (Read Your Writes).
+        Beide Verbindungen werden erst bei Bedarf beschafft und bis __exit__ beibehalten."""
+        if read and (self._uow is None or self._uow.may_read_from_replica()):
+            if self._replica_cnx is None:
+                self._replica_cnx = self._connect(self._checkout_replica)
+
+            if self._replica_cnx is not None:
+                if self._uow is not None:
+                    self._uow.mark_replica_read()
+                self._cnx = self._replica_cnx
+                return
+
+        if self._primary_cnx is None:
+            self._primary_cnx = self._connect(self._checkout_primary)
+        self._cnx = self._primary_cnx
+
+    def _is_on_replica(self):
+        """Nutzt die aktuell ausgeführte Methode eine Verbindung zu einem Lesereplikat?"""
+        return self._cnx is not None and self._cnx is self._replica_cnx
+
+    def _discard_replica(self, exc):
+        """Verwerfen der Verbindung zu einem nicht mehr erreichbaren Replikat."""
+        router = ReplicaRouter.get_instance()
+        router.mark_failed(self._replica, exc)
+        router.release(self._replica, self._unwrap(self._replica_cnx))
+
+        self._replica = None
+        self._replica_cnx = None
+        self._cnx = None
+
+    @staticmethod
+    def get_id_allocator():
+        """Auslesen der Strategie zur Vergabe von Primärschlüsseln (vgl. IdAllocator).
+
+        Standardmäßig werden Schlüssel blockweise aus der Tabelle id_sequences vergeben. Die
+        Blockgröße lässt sich über die Umgebungsvariable ID_BLOCK_SIZE einstellen."""
+        if Mapper.__id_allocator is None:
+            Mapper.__id_allocator = SequenceTableIdAllocator(int(os.getenv('ID_BLOCK_SIZE', '50')))
+        return Mapper.__id_allocator
+
+    @staticmethod
+    def set_id_allocator(allocator):
+        """Setzen einer anderen Strategie zur Vergabe von Primärschlüsseln."""
+        Mapper.__id_allocator = allocator
+
+    def _allocate_id(self, table):
+        """Vergeben eines neuen Primärschlüssels für die gegebene Tabelle."""
+        return Mapper.get_id_allocator().next_id(table)
+
+    def _allocate_ids(self, table, count):
+        """Vergeben von count neuen Primärschlüsseln für die gegebene Tabelle."""
+        return Mapper.get_id_allocator().next_ids(table, count)
+
+    def _close_streaming_cursor(self, cursor):
+        """Schließen eines ungepufferten Cursors, dessen Ergebnis evtl. nicht vollständig gelesen wurde.
+
+        Bricht z.B. ein Client das Streaming vorzeitig ab, so verbleiben ungelesene Zeilen auf der
+        Verbindung. Diese wird dann vom Pool verworfen, statt die restlichen Zeilen zu lesen."""
+        try:
+            cursor.close()
+        except connector.Error:
+            pass
+
+    def _build_all(self, bo_class, tuples):
+        """Umwandeln sämtlicher Tupel eines SELECT-Aufrufs in Objekte der gegebenen Klasse.
+
+        Die Spalten müssen in der Reihenfolge von bo_class.from_tuple selektiert werden."""
+        return list(map(bo_class.from_tuple, tuples))
+
+    def _fetch_by_keys(self, command, keys, chunk_size=500, cnx=None):
+        """Auslesen der Tupel zu einer ganzen Reihe von Primärschlüsseln mit SELECT ... IN (...).
+
+        Doppelte Schlüssel werden entfernt. Sehr lange Listen werden in Blöcke von chunk_size
+        Schlüsseln aufgeteilt, damit das einzelne Statement nicht beliebig groß wird.
+
+        :param command SELECT-Statement mit dem Platzhalter {} für die Liste der Schlüssel,
+            z.B. "SELECT id, owner FROM accounts WHERE id IN ({}) ORDER BY id"
+        :param keys eine Sammlung von Primärschlüsseln
+        :param cnx die zu verwendende Verbindung (z.B. zu einem Shard), standardmäßig die des Mappers
+        :return sämtliche gefundenen Tupel, bei sortiertem command aufsteigend nach Schlüssel.
+        """
+        keys = sorted(set(keys))
+        result = []
+
+        if len(keys) == 0:
+            return result
+
+        cursor = (cnx if cnx is not None else self._cnx).cursor()
+
+        for start in range(0, len(keys), chunk_size):
+            chunk = keys[start:start + chunk_size]
+            cursor.execute(command.format(", ".join(["%s"] * len(chunk))), chunk)
+            result.extend(cursor.fetchall())
+
+        cursor.close()
+
+        return result
+
+    def _find_row_cached(self, table, key, command, connections=None):
+        """Auslesen des Tupels zu einem Primärschlüssel, vorrangig aus dem ObjectCache.
+
+        Wurde in der laufenden Arbeitseinheit bereits geschrieben, so wird das gelesene Tupel nicht
+        abgelegt, da es noch nicht committete Änderungen enthalten kann. Ebenso wenig ein Tupel von
+        einem Lesereplikat: Dieses kann einen Stand vor der letzten Invalidierung zeigen. Aus demselben
+        Grund gilt der Stand des Caches zu Beginn der Transaktion (vgl. _cache_version_at_begin).
+
+        :param table Name der Tabelle, zugleich Bereich des Caches, z.B. "accounts"
+        :param command SELECT-Statement mit genau einem Platzhalter für den Schlüssel,
+            z.B. "SELECT id, owner FROM accounts WHERE id=%s"
+        :param connections die Verbindungen, die nacheinander bis zum ersten Treffer abgefragt werden
+            (z.B. die aller Shards), standardmäßig nur die des Mappers
+        :return das Tupel oder None, falls es keinen Datensatz mit diesem Schlüssel gibt.
+        """
+        cache = ObjectCache.get_instance()
+        row = cache.get(table, key)
+
+        if row is not None:
+            return row
+
+        version = self._cache_version_at_begin()
+        tuples = []
+
+        for cnx in connections if connections is not None else [self._cnx]:
+            cursor = cnx.cursor()
+            cursor.execute(command, (key,))
+            tuples = cursor.fetchall()
+            cursor.close()
+
+            if len(tuples) > 0:
+                break
+
+        if len(tuples) == 0:
+            return None
+
+        from_replica = connections is None and self._is_on_replica()
+        if (self._uow is None or not self._uow.is_dirty()) and not from_replica:
+            cache.put(table, key, tuples[0], version)
+
+        return tuples[0]
+
+    def _invalidate(self, table, key):
+        """Entfernen eines geänderten bzw. gelöschten Datensatzes aus dem ObjectCache.
+
+        Innerhalb einer Arbeitseinheit wird der Eintrag nach Abschluss der Transaktion erneut
+        entfernt, da andere Requests bis zum Commit noch den alten Stand lesen und ablegen können."""
+        cache = ObjectCache.get_instance()
+        cache.invalidate(table, key)
+
+        if self._uow is not None:
+            self._uow.after_completion(lambda committed: cache.invalidate(table, key))
+
+    @staticmethod
+    def add_change_listener(listener):
+        """Registrieren einer Funktion, die nach jeder committeten Änderung (insert, update, delete)
+        mit dem Namen der geänderten Tabelle aufgerufen wird (vgl. ResponseCache)."""
+        Mapper.__change_listeners.append(listener)
+
+    @staticmethod
+    def _notify_change_listeners(table):
+        for listener in Mapper.__change_listeners:
+            try:
+                listener(table)
+            except Exception as exc:
+                print("Fehler beim Benachrichtigen über eine Änderung an {}:".format(table), exc)
+
+    def _changed(self, table):
+        """Benachrichtigen der Listener über eine Änderung an der gegebenen Tabelle.
+
+        Innerhalb einer Arbeitseinheit geschieht dies erst nach deren Commit; wird die Transaktion
+        zurückgerollt, so unterbleibt die Benachrichtigung. Muss nach _commit aufgerufen werden."""
+        if len(Mapper.__change_listeners) == 0:
+            return
+
+        if self._uow is not None:
+            self._uow.after_completion(lambda committed: committed and Mapper._notify_change_listeners(table))
+        else:
+            Mapper._notify_change_listeners(table)
+
+    def _touch(self, cursor, *names):
+        """Hochzählen der Versionszähler (Tabelle resource_versions) der gegebenen Ressourcen.
+
+        Die Zähler werden in derselben DB-Transaktion wie die eigentliche Änderung geschrieben
+        und dienen als Grundlage für ETag und Last-Modified (vgl. ConditionalDecorator). Sie
+        werden in aufsteigender Reihenfolge gesperrt, um Deadlocks zu vermeiden.
+
+        :param names Namen der Ressourcen, z.B. 'customers' oder 'account:42'
+        """
+        names = sorted(set(names))
+        command = "INSERT INTO resource_versions (name, version, changed_at) VALUES " \
+                  + ",".join(["(%s, 1, UTC_TIMESTAMP(6))"] * len(names)) \
+                  + " ON DUPLICATE KEY UPDATE version=version+1, changed_at=VALUES(changed_at)"
+        cursor.execute(command, names)
+
+    def _commit(self):
+        """Abschließen einer schreibenden Operation.
+
+        Innerhalb einer Arbeitseinheit wird nicht sofort committet, sondern erst einmalig
+        am Ende des Requests. Ohne Arbeitseinheit committet der Mapper wie bisher selbst,
+        und zwar wie die Arbeitseinheit zuerst auf den Shards und zuletzt auf der primären Datenbank."""
+        if self._uow is not None:
+            self._uow.mark_dirty()
+        else:
+            for shard in sorted(self._shard_cnxs):
+                self._shard_cnxs[shard].commit()
+            self._cnx.commit()
+            self._cache_version = ObjectCache.get_instance().get_version()
 
     """Formuliere nachfolgend sämtliche Auflagen, die instanzierbare Mapper-Subklassen mind. erfüllen müssen."""
 
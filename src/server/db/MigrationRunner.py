@@ -0,0 +1,158 @@
+from server.db.ConnectionPool import ConnectionPool
+
+
+class Migration (object):
+    """Eine versionierte Änderung am Datenbankschema.
+
+    Eine Migration besteht aus einer Versionsnummer, einer kurzen Beschreibung und einer
+    Reihe von Schritten. Jeder Schritt ist eine Funktion, die einen Cursor erhält. Alle Schritte
+    müssen idempotent sein, d.h. sie dürfen auch auf einer Datenbank, in der die Änderung (z.B.
+    durch Import des SQL-Dumps) bereits vorhanden ist, gefahrlos erneut ausgeführt werden.
+    """
+
+    def __init__(self, version, description, *steps):
+        self._version = version
+        self._description = description
+        self._steps = steps
+
+    def get_version(self):
+        """Auslesen der Versionsnummer."""
+        return self._version
+
+    def get_description(self):
+        """Auslesen der Beschreibung."""
+        return self._description
+
+    def apply(self, cursor):
+        """Ausführen sämtlicher Schritte dieser Migration."""
+        for step in self._steps:
+            step(cursor)
+
+    def __str__(self):
+        return "Migration {}: {}".format(self._version, self._description)
+
+
+def execute(command):
+    """Schritt, der eine (idempotente) SQL-Anweisung ausführt, z.B. CREATE TABLE IF NOT EXISTS."""
+    def step(cursor):
+        cursor.execute(command)
+    return step
+
+
+def create_index(table, name, columns, unique=False):
+    """Schritt, der einen Index anlegt, sofern er noch nicht existiert.
+
+    MySQL 5.7 kennt kein CREATE INDEX IF NOT EXISTS, daher prüfen wir vorab information_schema."""
+    def step(cursor):
+        cursor.execute("SELECT COUNT(*) FROM information_schema.statistics "
+                       "WHERE table_schema=DATABASE() AND table_name=%s AND index_name=%s", (table, name))
+        (count,) = cursor.fetchone()
+
+        if count == 0:
+            cursor.execute("CREATE {}INDEX {} ON {} ({})".format(
+                "UNIQUE " if unique else "", name, table, ", ".join(columns)))
+    return step
+
+
+def drop_index(table, name):
+    """Schritt, der einen Index entfernt, sofern er existiert."""
+    def step(cursor):
+        cursor.execute("SELECT COUNT(*) FROM information_schema.statistics "
+                       "WHERE table_schema=DATABASE() AND table_name=%s AND index_name=%s", (table, name))
+        (count,) = cursor.fetchone()
+
+        if count > 0:
+            cursor.execute("DROP INDEX {} ON {}".format(name, table))
+    return step
+
+
+class MigrationRunner (object):
+    """Bringt das Schema einer (auch bereits bestehenden) Datenbank auf den aktuellen Stand.
+
+    Welche Migrationen bereits angewendet wurden, wird in der Tabelle schema_migrations
+    festgehalten. Beim Aufruf von migrate() werden alle noch fehlenden Migrationen in
+    aufsteigender Reihenfolge ihrer Versionsnummern ausgeführt. Ein erneuter Aufruf hat
+    keine Wirkung. Damit parallel startende Deployments sich nicht in die Quere kommen,
+    wird während der Migration eine benannte Sperre (GET_LOCK) gehalten.
+
+    Aufruf z.B. beim Deployment über: python manage.py migrate
+
+    Standardmäßig wird die primäre Datenbank migriert. Für weitere Datenbanken (z.B. die Shards der
+    Buchungen, vgl. ShardRouter) werden deren Pool und eigene Migrationen übergeben.
+    """
+
+    LOCK_NAME = 'bankproject.schema_migrations'
+
+    def __init__(self, migrations=None, pool=None):
+        if migrations is None:
+            from server.db.SchemaMigrations import MIGRATIONS
+            migrations = MIGRATIONS
+        self._migrations = sorted(migrations, key=lambda m: m.get_version())
+        self._pool = pool
+
+    def migrate(self):
+        """Ausführen aller noch nicht angewendeten Migrationen.
+
+        :return Eine Sammlung der in diesem Aufruf angewendeten Migrationen.
+        """
+        result = []
+        pool = self._pool if self._pool is not None else ConnectionPool.get_instance()
+        cnx = pool.checkout()
+
+        try:
+            cursor = cnx.cursor()
+            cursor.execute("SELECT GET_LOCK(%s, 300)", (MigrationRunner.LOCK_NAME,))
+            (locked,) = cursor.fetchone()
+            if locked != 1:
+                raise RuntimeError("Sperre für die Migration konnte nicht erlangt werden.")
+
+            try:
+                self._create_version_table(cursor)
+                applied = self._find_applied_versions(cursor)
+
+                for migration in self._migrations:
+                    if migration.get_version() not in applied:
+                        migration.apply(cursor)
+                        cursor.execute("INSERT INTO schema_migrations (version, description, applied_at) "
+                                       "VALUES (%s, %s, NOW())",
+                                       (migration.get_version(), migration.get_description()))
+                        cnx.commit()
+                        result.append(migration)
+            finally:
+                cursor.execute("SELECT RELEASE_LOCK(%s)", (MigrationRunner.LOCK_NAME,))
+                cursor.fetchone()
+                cursor.close()
+        finally:
+            pool.release(cnx)
+
+        return result
+
+    def status(self):
+        """Auslesen des Migrationsstands.
+
+        :return Eine Sammlung von Tupeln (Migration, angewendet ja/nein).
+        """
+        pool = self._pool if self._pool is not None else ConnectionPool.get_instance()
+        cnx = pool.checkout()
+
+        try:
+            cursor = cnx.cursor()
+            self._create_version_table(cursor)
+            applied = self._find_applied_versions(cursor)
+            cursor.close()
+        finally:
+            pool.release(cnx)
+
+        return [(m, m.get_version() in applied) for m in self._migrations]
+
+    def _create_version_table(self, cursor):
+        cursor.execute("CREATE TABLE IF NOT EXISTS schema_migrations ("
+                       "version int(11) NOT NULL, "
+                       "description varchar(256) NOT NULL DEFAULT '', "
+                       "applied_at datetime NOT NULL, "
+                       "PRIMARY KEY (version)"
+                       ") ENGINE=InnoDB DEFAULT CHARSET=utf8")
+
+    def _find_applied_versions(self, cursor):
+        cursor.execute("SELECT version FROM schema_migrations")
+        return set(version for (version,) in cursor.fetchall())
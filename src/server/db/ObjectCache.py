@@ -0,0 +1,139 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+class ObjectCache (object):
+    """Prozessweiter Read-Through-Cache für das Auslesen einzelner Objekte per Primärschlüssel.
+
+    Viele Requests lesen dieselben Objekte mehrfach, z.B. zuerst das Konto und anschließend dessen
+    Buchungen, oder den Kunden, bevor für ihn ein Konto eröffnet wird. Die Mapper fragen daher in
+    find_by_key zunächst diesen Cache (vgl. Mapper._find_row_cached) und lesen nur bei einem Fehlschlag
+    aus der Datenbank.
+
+    Abgelegt werden nicht die Business Objects selbst, sondern die DB-Tupel, geordnet nach Tabelle
+    und Primärschlüssel. Jeder Treffer erzeugt mit from_tuple ein neues Objekt, so dass Änderungen
+    eines Aufrufers (z.B. set_owner vor update) niemals im Cache landen.
+
+    Die Anzahl der Einträge ist begrenzt (max_size, es wird der am längsten nicht genutzte Eintrag
+    verdrängt), jeder Eintrag verfällt nach ttl Sekunden. update und delete der Mapper entfernen
+    den Eintrag sofort sowie erneut nach Abschluss der Transaktion (vgl. Mapper._invalidate).
+
+    Die Standardwerte können über die Umgebungsvariablen OBJECT_CACHE_SIZE (0 schaltet den Cache
+    ab) und OBJECT_CACHE_TTL überschrieben werden. Mit OBJECT_CACHE_DISABLED lassen sich einzelne
+    Tabellen ausnehmen, z.B. OBJECT_CACHE_DISABLED=customers,accounts.
+
+    **Hinweis:** Jeder Prozess (Worker) hat seinen eigenen Cache. Änderungen, die ein anderer Worker
+    vornimmt, werden hier erst nach Ablauf der ttl sichtbar.
+    """
+
+    __instance = None
+    __instance_lock = threading.Lock()
+
+    def __init__(self, max_size=10000, ttl=30.0, disabled=()):
+        self._max_size = max_size
+        self._ttl = ttl
+        self._disabled = set(disabled)
+        self._entries = OrderedDict()  # (Tabelle, Schlüssel) -> (Tupel, Ablaufzeitpunkt)
+        self._stats = {}  # Tabelle -> [Treffer, Fehlschläge]
+        self._version = 0  # Anzahl der bisherigen Invalidierungen (vgl. put)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def get_instance():
+        """Auslesen des prozessweiten Caches. Dieser wird beim ersten Zugriff angelegt."""
+        if ObjectCache.__instance is None:
+            with ObjectCache.__instance_lock:
+                if ObjectCache.__instance is None:
+                    ObjectCache.__instance = ObjectCache(
+                        max_size=int(os.getenv('OBJECT_CACHE_SIZE', '10000')),
+                        ttl=float(os.getenv('OBJECT_CACHE_TTL', '30')),
+                        disabled=[name.strip() for name in os.getenv('OBJECT_CACHE_DISABLED', '').split(',')
+                                  if name.strip() != ''])
+        return ObjectCache.__instance
+
+    def is_enabled(self, table):
+        """Werden Tupel der gegebenen Tabelle zwischengespeichert?"""
+        return self._max_size > 0 and table not in self._disabled
+
+    def get_disabled(self):
+        """Auslesen der Tabellen, für die der Cache abgeschaltet ist."""
+        with self._lock:
+            return set(self._disabled)
+
+    def set_enabled(self, table, enabled):
+        """Ein- bzw. Ausschalten des Caches für eine Tabelle zur Laufzeit."""
+        with self._lock:
+            if enabled:
+                self._disabled.discard(table)
+            else:
+                self._disabled.add(table)
+                for key in [key for key in self._entries if key[0] == table]:
+                    del self._entries[key]
+
+    def get(self, table, key):
+        """Auslesen des zwischengespeicherten Tupels, None falls es (noch) nicht im Cache liegt."""
+        if not self.is_enabled(table):
+            return None
+
+        with self._lock:
+            stats = self._stats.setdefault(table, [0, 0])
+            entry = self._entries.get((table, key))
+
+            if entry is not None and entry[1] > time.monotonic():
+                self._entries.move_to_end((table, key))
+                stats[0] += 1
+                return entry[0]
+
+            if entry is not None:
+                del self._entries[(table, key)]
+            stats[1] += 1
+            return None
+
+    def get_version(self):
+        """Auslesen des Invalidierungsstands. Muss *vor* dem Lesen aus der Datenbank erfolgen (vgl. put)."""
+        with self._lock:
+            return self._version
+
+    def put(self, table, key, row, version):
+        """Ablegen eines soeben aus der Datenbank gelesenen Tupels.
+
+        Wurde seit dem Auslesen von version (vgl. get_version) irgendein Eintrag invalidiert, so
+        verwerfen wir das Tupel. Es könnte sonst ein veralteter Stand im Cache landen, der
+        zwischen unserem SELECT und der Invalidierung durch einen anderen Request gelesen wurde.
+        """
+        if not self.is_enabled(table):
+            return
+
+        with self._lock:
+            if version != self._version:
+                return
+
+            self._entries[(table, key)] = (row, time.monotonic() + self._ttl)
+            self._entries.move_to_end((table, key))
+
+            while len(self._entries) > self._max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, table, key):
+        """Entfernen des Eintrags zum gegebenen Primärschlüssel."""
+        with self._lock:
+            self._version += 1
+            self._entries.pop((table, key), None)
+
+    def clear(self):
+        """Entfernen sämtlicher Einträge."""
+        with self._lock:
+            self._version += 1
+            self._entries.clear()
+
+    def get_stats(self):
+        """Auslesen der Statistik je Tabelle als dict Tabelle -> (Treffer, Fehlschläge, Anzahl Einträge)."""
+        with self._lock:
+            sizes = {}
+            for (table, key) in self._entries:
+                sizes[table] = sizes.get(table, 0) + 1
+
+            return {table: (hits, misses, sizes.get(table, 0))
+                    for (table, (hits, misses)) in self._stats.items()}
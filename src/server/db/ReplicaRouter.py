@@ -0,0 +1,219 @@
+import mysql.connector as connector
+import os
+import threading
+import time
+
+from server.db.ConnectionPool import ConnectionPool
+
+
+class Replica (object):
+    """Ein Lesereplikat samt eigenem Pool und aktuellem Zustand (vgl. ReplicaRouter)."""
+
+    def __init__(self, name, pool):
+        self.name = name
+        self.pool = pool
+        self.in_flight = 0  # Anzahl aktuell ausgeliehener Verbindungen.
+        self.reads = 0  # Anzahl der bisher an dieses Replikat vergebenen Verbindungen.
+        self.lag = None  # Zuletzt gemessener Rückstand in Sekunden (None: unbekannt bzw. Replikation gestoppt).
+        self.available = False  # Ergebnis der letzten Prüfung.
+        self.checked_at = None  # Zeitpunkt der letzten Prüfung (time.monotonic).
+        self.checking = False  # Läuft gerade eine Prüfung?
+
+
+class ReplicaRouter (object):
+    """Verteilung lesender Zugriffe auf Lesereplikate der Datenbank.
+
+    Schreibende Mapper-Methoden (insert, update, delete usw.) gehen stets an die primäre Datenbank.
+    Lesende Methoden (find_*, iter_*) erhalten dagegen, sofern möglich, eine Verbindung zu einem
+    der Replikate (vgl. Mapper._route). Jedes Replikat hat seinen eigenen ConnectionPool.
+
+    Ausgewählt wird reihum (strategy='round_robin') oder das Replikat mit den wenigsten aktuell
+    ausgeliehenen Verbindungen (strategy='least_loaded'). Höchstens alle check_interval Sekunden wird
+    je Replikat geprüft, wie weit es der primären Datenbank hinterherhinkt (SHOW REPLICA STATUS).
+    Replikate mit einem Rückstand über max_lag Sekunden, mit gestoppter Replikation oder ohne
+    Verbindung werden bis zur nächsten Prüfung übergangen. Ist kein Replikat verwendbar, so wird
+    auch lesend die primäre Datenbank genutzt.
+
+    Konfiguriert wird über Umgebungsvariablen:
+    - DB_REPLICAS: kommagetrennte Liste von host:port, optional mit eigener Datenbank
+      (host:port/database), z.B. DB_REPLICAS=localhost:3307,localhost:3308. Benutzer und Passwort
+      entsprechen der primären Datenbank (vgl. Mapper.get_connection_params). Ohne DB_REPLICAS
+      geht wie bisher alles an die primäre Datenbank.
+    - DB_REPLICA_STRATEGY (round_robin bzw. least_loaded), DB_REPLICA_MAX_LAG,
+      DB_REPLICA_CHECK_INTERVAL und DB_REPLICA_STICKY (vgl. get_sticky_seconds).
+    Größe und Verhalten der Pools der Replikate entsprechen dem primären Pool (DB_POOL_SIZE usw.).
+
+    **Hinweis:** Für Tests genügen weitere lokale MySQL-Instanzen (bzw. weitere Schemas derselben
+    Instanz) mit einer Kopie der Daten. Ohne eingerichtete Replikation liefert SHOW REPLICA STATUS
+    kein Ergebnis; ein solches Replikat gilt dann als aktuell.
+    """
+
+    STRATEGIES = ('round_robin', 'least_loaded')
+
+    __instance = None
+    __instance_lock = threading.Lock()
+
+    def __init__(self, replicas, strategy='round_robin', max_lag=2.0, check_interval=5.0, sticky_seconds=5.0):
+        if strategy not in ReplicaRouter.STRATEGIES:
+            raise ValueError("Unbekannte Strategie '{}' für die Auswahl der Replikate".format(strategy))
+
+        self._replicas = list(replicas)
+        self._strategy = strategy
+        self._max_lag = max_lag
+        self._check_interval = check_interval
+        self._sticky_seconds = sticky_seconds
+        self._next = 0  # Position für die Auswahl reihum.
+        self._fallbacks = 0  # Anzahl der Lesezugriffe, für die kein Replikat verwendbar war.
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def is_configured():
+        """Sind Replikate konfiguriert? Erlaubt die Prüfung, ohne Pools anzulegen (vgl. Mapper.__init_subclass__)."""
+        return os.getenv('DB_REPLICAS', '').strip() != ''
+
+    @staticmethod
+    def get_instance():
+        """Auslesen des prozessweiten Routers. Dieser wird beim ersten Zugriff angelegt."""
+        if ReplicaRouter.__instance is None:
+            with ReplicaRouter.__instance_lock:
+                if ReplicaRouter.__instance is None:
+                    ReplicaRouter.__instance = ReplicaRouter(
+                        [Replica(spec.strip(), ConnectionPool.create_for(spec.strip()))
+                         for spec in os.getenv('DB_REPLICAS', '').split(',') if spec.strip() != ''],
+                        strategy=os.getenv('DB_REPLICA_STRATEGY', 'round_robin'),
+                        max_lag=float(os.getenv('DB_REPLICA_MAX_LAG', '2')),
+                        check_interval=float(os.getenv('DB_REPLICA_CHECK_INTERVAL', '5')),
+                        sticky_seconds=float(os.getenv('DB_REPLICA_STICKY', '5')))
+        return ReplicaRouter.__instance
+
+    def get_sticky_seconds(self):
+        """Wie viele Sekunden nach einem Schreibzugriff liest derselbe Client ausschließlich von der
+        primären Datenbank? Sollte mindestens max_lag betragen (vgl. main.py)."""
+        return max(self._sticky_seconds, self._max_lag)
+
+    def checkout(self):
+        """Ausleihen einer Verbindung zu einem verwendbaren Replikat.
+
+        Schlägt der Verbindungsaufbau fehl, so wird das Replikat bis zur nächsten Prüfung
+        übergangen und das nächste versucht.
+
+        :return Tupel (Replikat, Verbindung) oder None, falls auf die primäre Datenbank
+            ausgewichen werden muss.
+        """
+        tried = set()
+
+        while True:
+            replica = self._choose(tried)
+            if replica is None:
+                with self._lock:
+                    self._fallbacks += 1
+                return None
+
+            tried.add(replica.name)
+            try:
+                cnx = replica.pool.checkout()
+            except connector.Error as exc:
+                self.mark_failed(replica, exc)
+                continue
+
+            with self._lock:
+                replica.in_flight += 1
+                replica.reads += 1
+            return replica, cnx
+
+    def release(self, replica, cnx):
+        """Rückgabe einer zuvor mit checkout ausgeliehenen Verbindung."""
+        with self._lock:
+            replica.in_flight -= 1
+        replica.pool.release(cnx)
+
+    def mark_failed(self, replica, exc=None):
+        """Vermerken, dass ein Replikat nicht erreichbar ist. Es wird bis zur nächsten Prüfung übergangen."""
+        with self._lock:
+            was_available = replica.available
+            replica.available = False
+            replica.checked_at = time.monotonic()
+
+        if was_available:
+            print("Lesereplikat {} nicht erreichbar, weiche auf andere Datenbank aus:".format(replica.name), exc)
+
+    def _choose(self, excluded):
+        """Auswahl eines verwendbaren Replikats gemäß der Strategie, None falls keines verwendbar ist."""
+        for replica in self._replicas:
+            if self._needs_check(replica):
+                self._check(replica)
+
+        with self._lock:
+            candidates = [replica for replica in self._replicas
+                          if replica.available and replica.name not in excluded]
+            if len(candidates) == 0:
+                return None
+
+            start = self._next % len(candidates)
+            self._next += 1
+            candidates = candidates[start:] + candidates[:start]
+
+            if self._strategy == 'least_loaded':
+                return min(candidates, key=lambda replica: replica.in_flight)
+            return candidates[0]
+
+    def _needs_check(self, replica):
+        """Ist die letzte Prüfung älter als check_interval? Es prüft stets nur ein Thread zur Zeit."""
+        with self._lock:
+            if replica.checking:
+                return False
+            if replica.checked_at is not None and time.monotonic() - replica.checked_at < self._check_interval:
+                return False
+            replica.checking = True
+            return True
+
+    def _check(self, replica):
+        """Prüfen der Erreichbarkeit und Messen des Rückstands eines Replikats."""
+        lag = None
+        try:
+            cnx = replica.pool.checkout()
+            try:
+                lag = self._measure_lag(cnx)
+            finally:
+                replica.pool.release(cnx)
+            reachable = True
+        except connector.Error as exc:
+            print("Prüfung des Lesereplikats {} fehlgeschlagen:".format(replica.name), exc)
+            reachable = False
+
+        with self._lock:
+            replica.lag = lag
+            replica.available = reachable and lag is not None and lag <= self._max_lag
+            replica.checked_at = time.monotonic()
+            replica.checking = False
+
+    def _measure_lag(self, cnx):
+        """Auslesen des Rückstands in Sekunden, None falls die Replikation gestoppt ist.
+
+        Ältere MySQL-Versionen kennen nur SHOW SLAVE STATUS mit der Spalte Seconds_Behind_Master.
+        Ohne eingerichtete Replikation (z.B. eine Kopie der Daten für Tests) gilt der Rückstand als 0."""
+        cursor = cnx.cursor()
+        try:
+            try:
+                cursor.execute("SHOW REPLICA STATUS")
+            except connector.ProgrammingError:
+                cursor.execute("SHOW SLAVE STATUS")
+            row = cursor.fetchone()
+            columns = cursor.column_names
+            cursor.fetchall()
+        finally:
+            cursor.close()
+
+        if row is None:
+            return 0.0
+
+        status = dict(zip(columns, row))
+        lag = status.get('Seconds_Behind_Source', status.get('Seconds_Behind_Master'))
+        return float(lag) if lag is not None else None
+
+    def get_stats(self):
+        """Auslesen der Statistik als Tupel (Liste je Replikat, Anzahl der Ausweichzugriffe auf die
+        primäre Datenbank). Je Replikat: (Name, verwendbar, Rückstand, ausgeliehene Verbindungen, Zugriffe)."""
+        with self._lock:
+            return [(replica.name, replica.available, replica.lag, replica.in_flight, replica.reads)
+                    for replica in self._replicas], self._fallbacks
@@ -0,0 +1,105 @@
+from server.db.Mapper import Mapper
+
+
+class ResourceVersionMapper (Mapper):
+    """Mapper-Klasse für die Versionszähler der Ressourcen unserer API (Tabelle resource_versions).
+
+    Jede Ressource, z.B. die Liste aller Kunden ('customers'), ein einzelnes Konto ('account:42')
+    oder dessen Saldo samt Umsätzen ('balance:42'), besitzt einen Zähler, den die übrigen Mapper
+    bei jedem insert, update und delete hochzählen (vgl. Mapper._touch), sowie den Zeitpunkt
+    der letzten Änderung (UTC). Über diese Zähler lässt sich mit einem einzigen Zugriff per
+    Primärschlüssel feststellen, ob sich eine Ressource seit einem früheren Abruf geändert hat.
+
+    Im Unterschied zu den übrigen Mappern bildet dieser Mapper keine BusinessObjects ab.
+    Ein Versionsstand wird als Tupel (Version, Zeitpunkt der Änderung) dargestellt.
+    """
+
+    def __init__(self):
+        super().__init__()
+
+    def find_all(self):
+        """Auslesen sämtlicher Versionszähler.
+
+        :return Ein dict Name der Ressource -> (Version, Zeitpunkt der Änderung)
+        """
+        cursor = self._cnx.cursor()
+        cursor.execute("SELECT name, version, changed_at FROM resource_versions")
+        tuples = cursor.fetchall()
+
+        result = {name: (version, changed_at) for (name, version, changed_at) in tuples}
+
+        cursor.close()
+
+        return result
+
+    def find_by_key(self, key):
+        """Auslesen des Versionsstands einer Ressource.
+
+        :param key Name der Ressource
+        :return (Version, Zeitpunkt der Änderung), None falls die Ressource noch nie geändert wurde.
+        """
+        return self.find_by_keys([key]).get(key)
+
+    def find_by_keys(self, keys):
+        """Auslesen der Versionsstände mehrerer Ressourcen mit einem einzigen SELECT.
+
+        :param keys Namen der Ressourcen
+        :return Ein dict Name der Ressource -> (Version, Zeitpunkt der Änderung). Ressourcen,
+            die noch nie geändert wurden, sind darin nicht enthalten.
+        """
+        keys = list(keys)
+        if len(keys) == 0:
+            return {}
+
+        cursor = self._cnx.cursor()
+        command = "SELECT name, version, changed_at FROM resource_versions WHERE name IN ({})" \
+            .format(",".join(["%s"] * len(keys)))
+        cursor.execute(command, keys)
+        tuples = cursor.fetchall()
+
+        result = {name: (version, changed_at) for (name, version, changed_at) in tuples}
+
+        cursor.close()
+
+        return result
+
+    def insert(self, name):
+        """Hochzählen des Versionszählers einer Ressource. Ein fehlender Zähler wird angelegt.
+
+        :param name Name der Ressource
+        """
+        cursor = self._cnx.cursor()
+
+        self._touch(cursor, name)
+
+        self._commit()
+        cursor.close()
+
+    def update(self, name):
+        """Hochzählen des Versionszählers einer Ressource (vgl. insert)."""
+        self.insert(name)
+
+    def delete(self, name):
+        """Löschen des Versionszählers einer Ressource.
+
+        Achtung: Danach beginnt der Zähler wieder bei 1, so dass ein früher vergebener ETag
+        erneut gültig werden kann. Vorzugsweise sollte man Zähler daher nur hochzählen.
+
+        :param name Name der Ressource
+        """
+        cursor = self._cnx.cursor()
+
+        cursor.execute("DELETE FROM resource_versions WHERE name=%s", (name,))
+
+        self._commit()
+        cursor.close()
+
+
+"""Zu Testzwecken können wir diese Datei bei Bedarf auch ausführen,
+um die grundsätzliche Funktion zu überprüfen.
+
+Anmerkung: Nicht professionell aber hilfreich..."""
+if (__name__ == "__main__"):
+    with ResourceVersionMapper() as mapper:
+        for (name, (version, changed_at)) in sorted(mapper.find_all().items()):
+            print(name, version, changed_at)
@@ -0,0 +1,139 @@
+from server.db.MigrationRunner import Migration, execute, create_index, drop_index
+
+"""Sämtliche Migrationen des Datenbankschemas in aufsteigender Reihenfolge.
+
+Neue Migrationen werden stets am Ende mit der nächsthöheren Versionsnummer angefügt.
+Bereits ausgelieferte Migrationen dürfen nicht mehr verändert werden, da sie auf
+bestehenden Datenbanken nicht erneut ausgeführt werden."""
+
+
+def seed_account_balances(cursor):
+    """Erstmaliges Befüllen der materialisierten Kontostände, sofern die Tabelle noch leer ist."""
+    cursor.execute("SELECT COUNT(*) FROM account_balances")
+    (count,) = cursor.fetchone()
+
+    if count == 0:
+        cursor.execute("INSERT INTO account_balances (account, credit, debit) "
+                       "SELECT account, SUM(credit), SUM(debit) FROM ("
+                       "SELECT targetAccount AS account, amount AS credit, 0 AS debit FROM transactions "
+                       "UNION ALL "
+                       "SELECT sourceAccount AS account, 0 AS credit, amount AS debit FROM transactions"
+                       ") AS ledger GROUP BY account")
+
+
+def remove_duplicate_users(cursor):
+    """Entfernen mehrfach gespeicherter Benutzer (gleiche Google User ID) vor dem Anlegen des eindeutigen Index.
+
+    Das frühere Anlegen unbekannter Benutzer (auslesen, dann einfügen) konnte bei gleichzeitigen Requests
+    denselben Benutzer mehrfach speichern. Erhalten bleibt jeweils der Datensatz mit der kleinsten ID.
+
+    Dieser Schritt wurde Migration 5 nachträglich vorangestellt. Er wirkt nur auf Datenbanken, auf denen
+    Migration 5 noch nicht (bzw. wegen solcher Duplikate nicht erfolgreich) ausgeführt wurde."""
+    cursor.execute("DELETE duplicate FROM users AS duplicate "
+                   "JOIN users AS original ON original.google_user_id = duplicate.google_user_id "
+                   "AND original.id < duplicate.id")
+
+    if cursor.rowcount > 0:
+        print("{} mehrfach gespeicherte Benutzer entfernt".format(cursor.rowcount))
+
+
+"""Die Indizes (sourceAccount) bzw. (targetAccount) aus Migration 3 sind Präfixe der überdeckenden Indizes
+aus Migration 4 und verursachen bei jeder Buchung zusätzliche Schreibarbeit. Ihr einziger Vorteil war die
+implizit enthaltene id (Primärschlüssel), die das seitenweise Lesen der Buchungen eines Kontos (WHERE
+sourceAccount=%s AND id > %s ORDER BY id) ohne Sortierung erlaubt. Die überdeckenden Indizes erhalten daher
+die id an zweiter Stelle: (sourceAccount, id, amount) dient sowohl der Pagination als auch den Summen
+(TransactionMapper.find_balance_aggregate_by_account_id, find_balance_drift, rebuild_balances)."""
+TRANSACTION_INDEX_STEPS = (
+    create_index('transactions', 'idx_transactions_source_id_amount', ['sourceAccount', 'id', 'amount']),
+    create_index('transactions', 'idx_transactions_target_id_amount', ['targetAccount', 'id', 'amount']),
+    drop_index('transactions', 'idx_transactions_source'),
+    drop_index('transactions', 'idx_transactions_target'),
+    drop_index('transactions', 'idx_transactions_source_amount'),
+    drop_index('transactions', 'idx_transactions_target_amount'),
+)
+
+
+MIGRATIONS = [
+    Migration(1, "Materialisierte Kontostände (account_balances)",
+              execute("CREATE TABLE IF NOT EXISTS account_balances ("
+                      "account int(11) NOT NULL DEFAULT '0', "
+                      "credit double NOT NULL DEFAULT '0', "
+                      "debit double NOT NULL DEFAULT '0', "
+                      "PRIMARY KEY (account)"
+                      ") ENGINE=InnoDB DEFAULT CHARSET=utf8"),
+              seed_account_balances),
+
+    Migration(2, "Sequenztabelle für die blockweise Vergabe von IDs (id_sequences)",
+              execute("CREATE TABLE IF NOT EXISTS id_sequences ("
+                      "name varchar(64) NOT NULL DEFAULT '', "
+                      "next_id int(11) NOT NULL DEFAULT '1', "
+                      "PRIMARY KEY (name)"
+                      ") ENGINE=InnoDB DEFAULT CHARSET=utf8")),
+
+    Migration(3, "Indizes für die Fremdschlüssel- und Namenssuchen der Mapper",
+              # TransactionMapper.find_by_source_account_id / find_by_target_account_id (inkl. Pagination)
+              create_index('transactions', 'idx_transactions_source', ['sourceAccount']),
+              create_index('transactions', 'idx_transactions_target', ['targetAccount']),
+              # AccountMapper.find_by_owner_id
+              create_index('accounts', 'idx_accounts_owner', ['owner']),
+              # UserMapper.find_by_google_user_id, bei jedem authentifizierten Request
+              create_index('users', 'idx_users_google_user_id', ['google_user_id']),
+              # CustomerMapper.find_by_last_name
+              create_index('customers', 'idx_customers_last_name', ['lastName'])),
+
+    Migration(4, "Überdeckende Indizes für die Saldenberechnung aus den Buchungen",
+              # TransactionMapper.find_balance_aggregate_by_account_id, find_balance_drift, rebuild_balances:
+              # Die Summen lassen sich allein aus dem Index berechnen, ohne die Tabelle zu lesen.
+              create_index('transactions', 'idx_transactions_source_amount', ['sourceAccount', 'amount']),
+              create_index('transactions', 'idx_transactions_target_amount', ['targetAccount', 'amount'])),
+
+    Migration(5, "Eindeutige Google User ID für UserMapper.upsert (INSERT ... ON DUPLICATE KEY UPDATE)",
+              remove_duplicate_users,
+              create_index('users', 'uq_users_google_user_id', ['google_user_id'], unique=True),
+              drop_index('users', 'idx_users_google_user_id')),
+
+    Migration(6, "Versionszähler der API-Ressourcen für ETag und Last-Modified (resource_versions)",
+              execute("CREATE TABLE IF NOT EXISTS resource_versions ("
+                      "name varchar(64) NOT NULL DEFAULT '', "
+                      "version bigint NOT NULL DEFAULT '0', "
+                      "changed_at datetime NOT NULL, "
+                      "PRIMARY KEY (name)"
+                      ") ENGINE=InnoDB DEFAULT CHARSET=utf8")),
+
+    Migration(7, "Zeitpunkt der letzten Änderung (resource_versions.changed_at) mit Mikrosekunden",
+              # Für Last-Modified wird auf volle Sekunden aufgerundet (vgl. ConditionalDecorator).
+              execute("ALTER TABLE resource_versions MODIFY changed_at datetime(6) NOT NULL")),
+
+    Migration(8, "Beträge der Buchungen (transactions.amount) in doppelter Genauigkeit wie account_balances",
+              # Vgl. TransactionMapper.find_balance_drift
+              execute("ALTER TABLE transactions MODIFY amount double NOT NULL DEFAULT '0'")),
+
+    Migration(9, "Je Konto nur noch ein Index auf den Buchungen statt eines einfachen und eines überdeckenden",
+              *TRANSACTION_INDEX_STEPS),
+]
+
+"""Migrationen der Shards, auf die die Buchungen verteilt werden können (vgl. ShardRouter).
+
+Ein Shard enthält ausschließlich die Tabelle transactions samt der Indizes der primären Datenbank.
+Die Versionsnummern werden unabhängig von MIGRATIONS in der Tabelle schema_migrations des Shards
+festgehalten."""
+SHARD_MIGRATIONS = [
+    Migration(1, "Buchungen (transactions) eines Shards",
+              execute("CREATE TABLE IF NOT EXISTS transactions ("
+                      "id int(11) NOT NULL DEFAULT '0', "
+                      "sourceAccount int(11) NOT NULL DEFAULT '0', "
+                      "targetAccount int(11) NOT NULL DEFAULT '0', "
+                      "amount float NOT NULL DEFAULT '0', "
+                      "PRIMARY KEY (id)"
+                      ") ENGINE=InnoDB DEFAULT CHARSET=utf8"),
+              create_index('transactions', 'idx_transactions_source', ['sourceAccount']),
+              create_index('transactions', 'idx_transactions_target', ['targetAccount']),
+              create_index('transactions', 'idx_transactions_source_amount', ['sourceAccount', 'amount']),
+              create_index('transactions', 'idx_transactions_target_amount', ['targetAccount', 'amount'])),
+
+    Migration(2, "Beträge der Buchungen (transactions.amount) in doppelter Genauigkeit wie account_balances",
+              execute("ALTER TABLE transactions MODIFY amount double NOT NULL DEFAULT '0'")),
+
+    Migration(3, "Je Konto nur noch ein Index auf den Buchungen statt eines einfachen und eines überdeckenden",
+              *TRANSACTION_INDEX_STEPS),
+]
@@ -0,0 +1,96 @@
+import os
+import threading
+
+from server.db.ConnectionPool import ConnectionPool
+
+
+class ShardRouter (object):
+    """Verteilung der Buchungen (Tabelle transactions) auf mehrere Datenbanken (Shards).
+
+    Die Tabelle transactions wächst mit jeder Buchung und wird von sämtlichen Abfragen der Salden,
+    Lastschriften und Gutschriften gelesen. Mit Shards wird sie auf mehrere Datenbanken verteilt.
+    Maßgeblich ist die Kontonummer: Konto k gehört zum Shard k % N (vgl. get_shard_of). Eine Buchung
+    wird auf dem Shard ihres Quellkontos (Lastschrift) und dem Shard ihres Zielkontos (Gutschrift)
+    gespeichert; liegen beide Konten auf demselben Shard, so genügt eine Zeile. Sämtliche Buchungen
+    eines Kontos liegen damit auf genau einem Shard (vgl. TransactionMapper).
+
+    Alle übrigen Tabellen, insbesondere auch die materialisierten Kontostände (account_balances),
+    die Versionszähler (resource_versions) und die Sequenzen der Primärschlüssel (id_sequences),
+    verbleiben in der primären Datenbank. Jeder Shard hat seinen eigenen ConnectionPool.
+
+    Konfiguriert wird über die Umgebungsvariable DB_SHARDS, eine kommagetrennte Liste von
+    host:port/database, z.B. DB_SHARDS=localhost:3306/bank_shard0,localhost:3306/bank_shard1. Benutzer
+    und Passwort entsprechen der primären Datenbank. Ohne DB_SHARDS liegen die Buchungen wie bisher
+    in der primären Datenbank. Tabellen und Indizes der Shards legt python manage.py migrate an.
+
+    **ACHTUNG:** Die Reihenfolge der Shards und deren Anzahl dürfen nachträglich nicht verändert
+    werden, da die Buchungen sonst auf dem falschen Shard gesucht werden. Ein Umverteilen auf eine
+    geänderte Anzahl von Shards ist nicht vorgesehen. Die vor der Einführung der Shards in der
+    primären Datenbank gespeicherten Buchungen verteilt einmalig python manage.py shard-transactions.
+    """
+
+    TABLES = ('transactions',)  # Die auf die Shards verteilten Tabellen.
+
+    __instance = None
+    __instance_lock = threading.Lock()
+
+    def __init__(self, names, pools):
+        self._names = list(names)
+        self._pools = list(pools)
+
+    @staticmethod
+    def is_configured():
+        """Sind Shards konfiguriert? Erlaubt die Prüfung, ohne Pools anzulegen."""
+        return os.getenv('DB_SHARDS', '').strip() != ''
+
+    @staticmethod
+    def get_instance():
+        """Auslesen des prozessweiten Routers. Dieser wird beim ersten Zugriff angelegt."""
+        if ShardRouter.__instance is None:
+            with ShardRouter.__instance_lock:
+                if ShardRouter.__instance is None:
+                    names = [spec.strip() for spec in os.getenv('DB_SHARDS', '').split(',') if spec.strip() != '']
+                    ShardRouter.__instance = ShardRouter(names, [ConnectionPool.create_for(name) for name in names])
+        return ShardRouter.__instance
+
+    def get_shard_count(self):
+        """Auslesen der Anzahl der Shards."""
+        return len(self._pools)
+
+    def get_shard_of(self, account_id):
+        """Auslesen der Nummer (0 bis N-1) des Shards, der die Buchungen des gegebenen Kontos enthält."""
+        return account_id % len(self._pools)
+
+    def get_pool(self, shard):
+        """Auslesen des Pools des Shards mit der gegebenen Nummer."""
+        return self._pools[shard]
+
+    def get_names(self):
+        """Auslesen der Namen (host:port/database) aller Shards in der Reihenfolge ihrer Nummern."""
+        return list(self._names)
+
+    def get_stats(self):
+        """Auslesen der Statistik der Pools als Liste von Tupeln (Name, Statistik des Pools, vgl.
+        ConnectionPool.get_stats)."""
+        return [(name, pool.get_stats()) for (name, pool) in zip(self._names, self._pools)]
+
+    def find_max_id(self, table):
+        """Ermitteln des größten Primärschlüssels einer verteilten Tabelle über alle Shards (vgl. IdAllocator).
+
+        :return der größte Schlüssel bzw. 0, falls die Tabelle auf allen Shards leer ist.
+        """
+        result = 0
+
+        for pool in self._pools:
+            cnx = pool.checkout()
+            try:
+                cursor = cnx.cursor()
+                cursor.execute("SELECT COALESCE(MAX(id), 0) FROM {}".format(table))
+                (max_id,) = cursor.fetchone()
+                cursor.close()
+            finally:
+                pool.release(cnx)
+
+            result = max(result, max_id)
+
+        return result
@@ -0,0 +1,76 @@
+import time
+
+
+class TracedConnection (object):
+    """Hülle um eine Datenbankverbindung, die sämtliche Statements im RequestTrace aufzeichnet.
+
+    Die Mapper nutzen die Hülle genauso wie die Verbindung selbst (vgl. Mapper.__enter__). Alle
+    Methoden außer cursor werden unverändert an die eigentliche Verbindung weitergereicht.
+    """
+
+    def __init__(self, cnx, trace):
+        self._cnx = cnx
+        self._trace = trace
+
+    def get_connection(self):
+        """Auslesen der eigentlichen Verbindung (z.B. für die Rückgabe an den Pool)."""
+        return self._cnx
+
+    def cursor(self, *args, **kwargs):
+        return TracedCursor(self._cnx.cursor(*args, **kwargs), self._trace)
+
+    def __getattr__(self, name):
+        return getattr(self._cnx, name)
+
+
+class TracedCursor (object):
+    """Hülle um einen Cursor, die Dauer und Zeilenzahl jedes Statements misst.
+
+    Die Dauer umfasst sowohl die Ausführung (execute) als auch das Lesen des Ergebnisses (fetch...),
+    da ungepufferte Cursor die Zeilen erst beim Lesen vom Server holen.
+    """
+
+    def __init__(self, cursor, trace):
+        self._cursor = cursor
+        self._trace = trace
+        self._statement = None
+
+    def execute(self, operation, params=None, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return self._cursor.execute(operation, params, *args, **kwargs)
+        finally:
+            self._statement = self._trace.add_statement(operation, max(self._cursor.rowcount, 0),
+                                                        time.perf_counter() - start)
+
+    def executemany(self, operation, seq_params, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return self._cursor.executemany(operation, seq_params, *args, **kwargs)
+        finally:
+            self._statement = self._trace.add_statement(operation, max(self._cursor.rowcount, 0),
+                                                        time.perf_counter() - start)
+
+    def _fetch(self, fetch, *args):
+        start = time.perf_counter()
+        try:
+            return fetch(*args)
+        finally:
+            if self._statement is not None:
+                self._statement.duration += time.perf_counter() - start
+                self._statement.rows = max(self._cursor.rowcount, 0)
+
+    def fetchone(self):
+        return self._fetch(self._cursor.fetchone)
+
+    def fetchmany(self, *args):
+        return self._fetch(self._cursor.fetchmany, *args)
+
+    def fetchall(self):
+        return self._fetch(self._cursor.fetchall)
+
+    def __iter__(self):
+        return iter(self.fetchone, None)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
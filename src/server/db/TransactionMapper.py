@@ -1,5 +1,8 @@
+import heapq
+
 from server.bo.Transaction import Transaction
 from server.db.Mapper import Mapper
+from server.db.ShardRouter import ShardRouter
 
 
 class TransactionMapper (Mapper):
@@ -8,35 +11,132 @@ class TransactionMapper (Mapper):
     gestellt, mit deren Hilfe z.B. Objekte gesucht, erzeugt, modifiziert und
     gelöscht werden können. Das Mapping ist bidirektional. D.h., Objekte können
     in DB-Strukturen und DB-Strukturen in Objekte umgewandelt werden.
+
+    Sind Shards konfiguriert (vgl. ShardRouter), so liegen die Buchungen nicht in der primären
+    Datenbank, sondern verteilt nach Kontonummer auf den Shards. Eine Buchung zwischen Konten auf
+    verschiedenen Shards wird als Lastschrift auf dem Shard des Quellkontos und als Gutschrift auf
+    dem Shard des Zielkontos gespeichert (zwei Zeilen mit derselben ID). Abfragen zu einem Konto
+    gehen an genau einen Shard, alle übrigen Abfragen an sämtliche Shards (Scatter-Gather), deren
+    Ergebnisse anschließend zusammengeführt werden. Die materialisierten Kontostände verbleiben in
+    der primären Datenbank.
     """
 
     def __init__(self):
         super().__init__()
 
+    def _ledger_cnx(self, account_id):
+        """Auslesen der Verbindung zu der Datenbank, die sämtliche Buchungen des gegebenen Kontos enthält."""
+        if not ShardRouter.is_configured():
+            return self._cnx
+        return self._shard_cnx(ShardRouter.get_instance().get_shard_of(account_id))
+
+    def _ledger_cnxs(self):
+        """Auslesen der Verbindungen zu allen Datenbanken mit Buchungen (ohne Shards nur die primäre)."""
+        if not ShardRouter.is_configured():
+            return [self._cnx]
+        return [self._shard_cnx(shard) for shard in range(ShardRouter.get_instance().get_shard_count())]
+
+    def _ledger_cnxs_of(self, source_account, target_account):
+        """Auslesen der Verbindungen zu den Datenbanken, in denen eine Buchung zwischen den gegebenen
+        Konten gespeichert wird: Shard des Quellkontos und, falls abweichend, Shard des Zielkontos."""
+        source = self._ledger_cnx(source_account)
+        target = self._ledger_cnx(target_account)
+        return [source] if source is target else [source, target]
+
+    def _merge_rows(self, tuples):
+        """Zusammenführen der Tupel mehrerer Shards: Eine Buchung zwischen zwei Shards wird von beiden
+        geliefert, aber nur einmal übernommen. Das Ergebnis ist aufsteigend nach ID sortiert."""
+        if not ShardRouter.is_configured():
+            return tuples
+        return sorted({row[0]: row for row in tuples}.values())
+
+    def _insert_rows(self, rows, ignore=False):
+        """Schreiben von Buchungen als Tupel (ID, Quellkonto, Zielkonto, Betrag) in die Tabelle transactions.
+
+        Je Datenbank (bzw. Shard) wird ein einziges Statement bzw. executemany ausgeführt.
+
+        :param ignore bereits vorhandene Buchungen übergehen (INSERT IGNORE, vgl. copy_to_shards)
+        """
+        groups = {}  # id(Verbindung) -> (Verbindung, Tupel)
+        for row in rows:
+            for cnx in self._ledger_cnxs_of(row[1], row[2]):
+                groups.setdefault(id(cnx), (cnx, []))[1].append(row)
+
+        command = "INSERT {}INTO transactions (id, sourceAccount, targetAccount, amount) VALUES (%s,%s,%s,%s)" \
+            .format("IGNORE " if ignore else "")
+
+        for (cnx, data) in groups.values():
+            cursor = cnx.cursor()
+            if len(data) == 1:
+                cursor.execute(command, data[0])
+            else:
+                cursor.executemany(command, data)
+            cursor.close()
+
+    def _delete_rows(self, key, source_account, target_account):
+        """Löschen einer Buchung auf allen Shards, auf denen sie gespeichert ist."""
+        for cnx in self._ledger_cnxs_of(source_account, target_account):
+            cursor = cnx.cursor()
+            cursor.execute("DELETE FROM transactions WHERE id=%s", (key,))
+            cursor.close()
+
     def find_all(self):
         """Auslesen aller Buchungen.
 
         :return Eine Sammlung mit Transaction-Objekten, die sämtliche Buchungen
                 des Systems repräsentieren.
         """
-        result = []
-        cursor = self._cnx.cursor()
+        tuples = []
 
-        cursor.execute("SELECT id, sourceAccount, targetAccount, amount from transactions")
-        tuples = cursor.fetchall()
+        for cnx in self._ledger_cnxs():
+            cursor = cnx.cursor()
+            cursor.execute("SELECT id, sourceAccount, targetAccount, amount from transactions")
+            tuples.extend(cursor.fetchall())
+            cursor.close()
 
-        for (id, sourceAccount, targetAccount, amount) in tuples:
-            transaction = Transaction()
-            transaction.set_id(id)
-            transaction.set_source_account(sourceAccount)
-            transaction.set_target_account(targetAccount)
-            transaction.set_amount(amount)
-            result.append(transaction)
+        return self._build_all(Transaction, self._merge_rows(tuples))
 
-        self._cnx.commit()
-        cursor.close()
+    def iter_all(self, chunk_size=500):
+        """Auslesen aller Buchungen als Generator.
 
-        return result
+        Im Gegensatz zu find_all wird das Ergebnis nicht vollständig in den Speicher geladen.
+        Ein ungepufferter Cursor holt die Tupel blockweise (chunk_size) vom Datenbankserver,
+        so dass der Speicherbedarf unabhängig von der Größe der Tabelle konstant bleibt.
+
+        **ACHTUNG:** Solange der Generator nicht vollständig durchlaufen wurde, kann auf
+        derselben Verbindung keine weitere Abfrage ausgeführt werden.
+
+        Mit Shards wird je Shard ein solcher Cursor geöffnet und deren (jeweils nach ID sortierte)
+        Ergebnisse werden im Reißverschlussverfahren zusammengeführt.
+
+        :param chunk_size Anzahl der Tupel, die jeweils in einem Block gelesen werden.
+        :return Generator, der nacheinander Transaction-Objekte liefert.
+        """
+        cursors = []
+
+        try:
+            for cnx in self._ledger_cnxs():
+                cursor = cnx.cursor()
+                cursors.append(cursor)
+                cursor.execute("SELECT id, sourceAccount, targetAccount, amount FROM transactions ORDER BY id")
+
+            previous = None
+            for row in heapq.merge(*[self._iter_rows(cursor, chunk_size) for cursor in cursors],
+                                   key=lambda row: row[0]):
+                if row[0] != previous:
+                    previous = row[0]
+                    yield Transaction.from_tuple(row)
+        finally:
+            for cursor in cursors:
+                self._close_streaming_cursor(cursor)
+
+    @staticmethod
+    def _iter_rows(cursor, chunk_size):
+        tuples = cursor.fetchmany(chunk_size)
+
+        while len(tuples) > 0:
+            yield from tuples
+            tuples = cursor.fetchmany(chunk_size)
 
     def find_by_source_account_id(self, account_id):
         """Auslesen aller Buchungen eines durch Fremdschlüssel (Kontonr.) gegebenen Quell-Kontos.
@@ -45,21 +145,33 @@ class TransactionMapper (Mapper):
         :return Eine Sammlung mit Transaction-Objekten.
         """
 
-        result = []
-        cursor = self._cnx.cursor()
+        cursor = self._ledger_cnx(account_id).cursor()
         command = "SELECT id, sourceAccount, targetAccount, amount FROM transactions WHERE sourceAccount={} ORDER BY id".format(account_id)
         cursor.execute(command)
         tuples = cursor.fetchall()
 
-        for (id, sourceAccount, targetAccount, amount) in tuples:
-            transaction = Transaction()
-            transaction.set_id(id)
-            transaction.set_source_account(sourceAccount)
-            transaction.set_target_account(targetAccount)
-            transaction.set_amount(amount)
-            result.append(transaction)
+        result = self._build_all(Transaction, tuples)
+
+        cursor.close()
+
+        return result
+
+    def find_page_by_source_account_id(self, account_id, after_id, limit):
+        """Auslesen einer Seite von Buchungen eines gegebenen Quell-Kontos (Keyset-Pagination).
+
+        :param account_id Schlüssel des zugehörigen Kontos.
+        :param after_id Schlüssel der letzten Buchung der vorherigen Seite (0 für die erste Seite).
+        :param limit maximale Anzahl der Buchungen auf dieser Seite.
+        :return Eine Sammlung mit höchstens limit Transaction-Objekten, aufsteigend nach ID sortiert.
+        """
+        cursor = self._ledger_cnx(account_id).cursor()
+        command = "SELECT id, sourceAccount, targetAccount, amount FROM transactions " \
+                  "WHERE sourceAccount=%s AND id > %s ORDER BY id LIMIT %s"
+        cursor.execute(command, (account_id, after_id, limit))
+        tuples = cursor.fetchall()
+
+        result = self._build_all(Transaction, tuples)
 
-        self._cnx.commit()
         cursor.close()
 
         return result
@@ -70,59 +182,270 @@ class TransactionMapper (Mapper):
         :param account_id Schlüssel des zugehörigen Kontos.
         :return Eine Sammlung mit Transaction-Objekten.
         """
-        result = []
-        cursor = self._cnx.cursor()
+        cursor = self._ledger_cnx(account_id).cursor()
         command = "SELECT id, sourceAccount, targetAccount, amount FROM transactions WHERE targetAccount={} ORDER BY id".format(account_id)
         cursor.execute(command)
         tuples = cursor.fetchall()
 
-        for (id, sourceAccount, targetAccount, amount) in tuples:
-            transaction = Transaction()
-            transaction.set_id(id)
-            transaction.set_source_account(sourceAccount)
-            transaction.set_target_account(targetAccount)
-            transaction.set_amount(amount)
-            result.append(transaction)
+        result = self._build_all(Transaction, tuples)
 
-        self._cnx.commit()
         cursor.close()
 
         return result
 
-    def find_by_key(self, key):
-        """Suchen einer Buchung mit vorgegebener Nummer. Da diese eindeutig ist,
-        wird genau ein Objekt zurückgegeben.
+    def find_page_by_target_account_id(self, account_id, after_id, limit):
+        """Auslesen einer Seite von Buchungen eines gegebenen Ziel-Kontos (Keyset-Pagination).
 
-        :param key Primärschlüsselattribut (->DB)
-        :return Transaction-Objekt, das dem übergebenen Schlüssel entspricht, None bei
-            nicht vorhandenem DB-Tupel.
+        :param account_id Schlüssel des zugehörigen Kontos.
+        :param after_id Schlüssel der letzten Buchung der vorherigen Seite (0 für die erste Seite).
+        :param limit maximale Anzahl der Buchungen auf dieser Seite.
+        :return Eine Sammlung mit höchstens limit Transaction-Objekten, aufsteigend nach ID sortiert.
         """
-        result = None
+        cursor = self._ledger_cnx(account_id).cursor()
+        command = "SELECT id, sourceAccount, targetAccount, amount FROM transactions " \
+                  "WHERE targetAccount=%s AND id > %s ORDER BY id LIMIT %s"
+        cursor.execute(command, (account_id, after_id, limit))
+        tuples = cursor.fetchall()
 
+        result = self._build_all(Transaction, tuples)
+
+        cursor.close()
+
+        return result
+
+    def find_balance_aggregate_by_account_id(self, account_id):
+        """Ermitteln der Summen aller Guthaben- und Lastschriftbuchungen eines Kontos.
+
+        Statt sämtliche Buchungen als Transaction-Objekte auszulesen und in Python
+        aufzusummieren, erledigt die Datenbank dies in einer einzigen Abfrage.
+
+        :param account_id Schlüssel des zugehörigen Kontos.
+        :return Tupel (Summe der Gutschriften, Summe der Lastschriften, Saldo).
+        """
+        cursor = self._ledger_cnx(account_id).cursor()
+        command = "SELECT " \
+                  "COALESCE(SUM(CASE WHEN targetAccount=%s THEN amount ELSE 0 END), 0), " \
+                  "COALESCE(SUM(CASE WHEN sourceAccount=%s THEN amount ELSE 0 END), 0) " \
+                  "FROM transactions WHERE sourceAccount=%s OR targetAccount=%s"
+        data = (account_id, account_id, account_id, account_id)
+        cursor.execute(command, data)
+        (credit_amount, debit_amount) = cursor.fetchone()
+
+        cursor.close()
+
+        return credit_amount, debit_amount, credit_amount - debit_amount
+
+    def find_balance_by_account_id(self, account_id):
+        """Auslesen des materialisierten Kontostands eines Kontos.
+
+        Die Tabelle account_balances wird bei jedem insert, update und delete einer Buchung
+        innerhalb derselben DB-Transaktion fortgeschrieben. Das Auslesen des Saldos ist daher
+        ein einfacher Zugriff über den Primärschlüssel, unabhängig von der Anzahl der Buchungen.
+
+        :param account_id Schlüssel des zugehörigen Kontos.
+        :return Tupel (Summe der Gutschriften, Summe der Lastschriften, Saldo).
+        """
         cursor = self._cnx.cursor()
-        command = "SELECT id, sourceAccount, targetAccount, amount FROM transactions WHERE id={}".format(key)
-        cursor.execute(command)
+        command = "SELECT credit, debit FROM account_balances WHERE account=%s"
+        cursor.execute(command, (account_id,))
         tuples = cursor.fetchall()
 
-        if tuples is not None \
-                and len(tuples) > 0 \
-                and tuples[0] is not None:
-            (id, sourceAccount, targetAccount, amount) = tuples[0]
-            transaction = Transaction()
-            transaction.set_id(id)
-            transaction.set_source_account(sourceAccount)
-            transaction.set_target_account(targetAccount)
-            transaction.set_amount(amount)
+        if len(tuples) > 0:
+            (credit_amount, debit_amount) = tuples[0]
+        else:
+            """Für Konten ohne Buchungen existiert (noch) kein Eintrag."""
+            (credit_amount, debit_amount) = (0.0, 0.0)
+
+        cursor.close()
+
+        return credit_amount, debit_amount, credit_amount - debit_amount
+
+    def rebuild_balances(self):
+        """Neuberechnen sämtlicher materialisierter Kontostände aus den Buchungen (Ledger).
+
+        Mit Shards werden die Summen je Shard berechnet (vgl. _find_ledger_sums) und anschließend
+        in die primäre Datenbank geschrieben.
+
+        :return Anzahl der Konten, für die ein Kontostand geschrieben wurde.
+        """
+        cursor = self._cnx.cursor()
+        cursor.execute("DELETE FROM account_balances")
+
+        if not ShardRouter.is_configured():
+            cursor.execute("INSERT INTO account_balances (account, credit, debit) "
+                           "SELECT account, SUM(credit), SUM(debit) FROM ("
+                           "SELECT targetAccount AS account, amount AS credit, 0 AS debit FROM transactions "
+                           "UNION ALL "
+                           "SELECT sourceAccount AS account, 0 AS credit, amount AS debit FROM transactions"
+                           ") AS ledger GROUP BY account")
+            count = cursor.rowcount
+        else:
+            sums = self._find_ledger_sums()
+            command = "INSERT INTO account_balances (account, credit, debit) VALUES (%s,%s,%s)"
+            for start in range(0, len(sums), 1000):
+                cursor.executemany(command, sums[start:start + 1000])
+            count = len(sums)
+
+        cursor.execute("UPDATE resource_versions SET version=version+1, changed_at=UTC_TIMESTAMP(6) "
+                       "WHERE name LIKE 'balance:%'")
+
+        self._commit()
+        cursor.close()
+
+        return count
+
+    def find_balance_drift(self, tolerance=0.005, relative_tolerance=1e-6, account_id=None):
+        """Vergleichen der materialisierten Kontostände mit den aus den Buchungen berechneten.
+
+        Die Kontostände werden als DOUBLE fortgeschrieben, die Beträge der Buchungen waren bis zur
+        Migration 8 jedoch als FLOAT (einfache Genauigkeit) gespeichert. Jeder solche Betrag kann um
+        bis zu etwa 6e-8 seines Werts vom gebuchten Betrag abweichen. Zulässig ist daher neben der
+        festen Toleranz eine zum Umsatz (Summe aller Gut- und Lastschriften) des Kontos relative.
 
-            result = transaction
+        :param tolerance maximal zulässige Abweichung je Konto (Rundungsfehler der Gleitkommaarithmetik)
+        :param relative_tolerance zusätzlich zulässige Abweichung je Einheit Umsatz des Kontos
+        :param account_id Schlüssel eines einzelnen zu prüfenden Kontos. Dessen Saldo laut Buchungen
+            liefert find_balance_aggregate_by_account_id, ohne das gesamte Journal zu summieren.
+            Standardmäßig werden sämtliche Konten geprüft.
+        :return Eine Sammlung von Tupeln (Konto, Saldo laut Buchungen, materialisierter Saldo)
+            für alle Konten, deren Abweichung die Toleranz übersteigt.
+        """
+        cursor = self._cnx.cursor()
+
+        if account_id is None:
+            sums = self._find_ledger_sums()
+            cursor.execute("SELECT account, credit - debit FROM account_balances")
         else:
-            result = None
+            (credit, debit, balance) = self.find_balance_aggregate_by_account_id(account_id)
+            sums = [(account_id, credit, debit)] if credit != 0 or debit != 0 else []
+            cursor.execute("SELECT account, credit - debit FROM account_balances WHERE account=%s", (account_id,))
+
+        stored = dict(cursor.fetchall())
+        expected = {key: (credit - debit, abs(credit) + abs(debit)) for (key, credit, debit) in sums}
 
-        self._cnx.commit()
         cursor.close()
 
+        result = []
+        for key in sorted(set(expected) | set(stored)):
+            (expected_balance, turnover) = expected.get(key, (0.0, 0.0))
+            stored_balance = stored.get(key)
+            allowed = tolerance + relative_tolerance * turnover
+            if stored_balance is None or abs(expected_balance - stored_balance) > allowed:
+                result.append((key, expected_balance, stored_balance))
+
         return result
 
+    def _find_ledger_sums(self):
+        """Berechnen der Summen aller Gut- und Lastschriften je Konto aus den Buchungen.
+
+        Jeder Shard berechnet nur die Summen der Konten, die zu ihm gehören. Die zweite Zeile einer
+        Buchung zwischen zwei Shards wird so nicht doppelt gezählt.
+
+        :return Eine Sammlung von Tupeln (Konto, Summe der Gutschriften, Summe der Lastschriften).
+        """
+        if not ShardRouter.is_configured():
+            cursor = self._cnx.cursor()
+            cursor.execute("SELECT account, SUM(credit), SUM(debit) FROM ("
+                           "SELECT targetAccount AS account, amount AS credit, 0 AS debit FROM transactions "
+                           "UNION ALL "
+                           "SELECT sourceAccount AS account, 0 AS credit, amount AS debit FROM transactions"
+                           ") AS ledger GROUP BY account")
+            result = cursor.fetchall()
+            cursor.close()
+            return result
+
+        count = ShardRouter.get_instance().get_shard_count()
+        result = []
+
+        for (shard, cnx) in enumerate(self._ledger_cnxs()):
+            cursor = cnx.cursor()
+            cursor.execute("SELECT account, SUM(credit), SUM(debit) FROM ("
+                           "SELECT targetAccount AS account, amount AS credit, 0 AS debit FROM transactions "
+                           "WHERE MOD(targetAccount, %s)=%s "
+                           "UNION ALL "
+                           "SELECT sourceAccount AS account, 0 AS credit, amount AS debit FROM transactions "
+                           "WHERE MOD(sourceAccount, %s)=%s"
+                           ") AS ledger GROUP BY account", (count, shard, count, shard))
+            result.extend(cursor.fetchall())
+            cursor.close()
+
+        return result
+
+    def _apply_to_balances(self, cursor, *bookings):
+        """Fortschreiben der materialisierten Kontostände um eine oder mehrere Buchungen.
+
+        Ein negativer Betrag macht eine zuvor verbuchte Buchung wieder rückgängig. Die
+        Versionszähler der Konten (Saldo und Umsätze) werden dabei mit hochgezählt.
+
+        Die Konten werden stets in aufsteigender Reihenfolge gesperrt. Gleichzeitige Buchungen
+        A -> B und B -> A können sich so nicht gegenseitig blockieren (Deadlock).
+
+        :param bookings Tupel (Quellkonto, Zielkonto, Betrag)
+        """
+        deltas = {}  # Konto -> [Summe Gutschriften, Summe Lastschriften]
+        for (source_account, target_account, amount) in bookings:
+            deltas.setdefault(source_account, [0.0, 0.0])[1] += amount
+            deltas.setdefault(target_account, [0.0, 0.0])[0] += amount
+
+        command = "INSERT INTO account_balances (account, credit, debit) VALUES (%s,%s,%s) " \
+                  "ON DUPLICATE KEY UPDATE credit=credit+VALUES(credit), debit=debit+VALUES(debit)"
+        cursor.executemany(command, [(account_id, credit, debit)
+                                     for (account_id, (credit, debit)) in sorted(deltas.items())])
+
+        self._touch(cursor, *["balance:{}".format(account_id) for account_id in deltas])
+
+    def _find_for_update(self, key):
+        """Auslesen und Sperren des in der DB gespeicherten Zustands einer Buchung.
+
+        Mit Shards werden die Shards nacheinander befragt, bis die Buchung gefunden ist."""
+        command = "SELECT sourceAccount, targetAccount, amount FROM transactions WHERE id=%s FOR UPDATE"
+
+        for cnx in self._ledger_cnxs():
+            cursor = cnx.cursor()
+            cursor.execute(command, (key,))
+            tuples = cursor.fetchall()
+            cursor.close()
+
+            if len(tuples) > 0:
+                return tuples[0]
+
+        return None
+
+    def find_by_key(self, key):
+        """Suchen einer Buchung mit vorgegebener Nummer. Da diese eindeutig ist,
+        wird genau ein Objekt zurückgegeben. Wiederholte Aufrufe werden aus dem
+        ObjectCache beantwortet (vgl. Mapper._find_row_cached). Mit Shards werden diese
+        nacheinander befragt, da sich der Shard nicht aus der Nummer der Buchung ergibt.
+
+        :param key Primärschlüsselattribut (->DB)
+        :return Transaction-Objekt, das dem übergebenen Schlüssel entspricht, None bei
+            nicht vorhandenem DB-Tupel.
+        """
+        row = self._find_row_cached(
+            "transactions", key, "SELECT id, sourceAccount, targetAccount, amount FROM transactions WHERE id=%s",
+            self._ledger_cnxs() if ShardRouter.is_configured() else None)
+
+        if row is None:
+            return None
+
+        return Transaction.from_tuple(row)
+
+    def find_by_keys(self, keys):
+        """Auslesen mehrerer Buchungen anhand ihrer Nummern mit möglichst wenigen SELECT-Aufrufen.
+
+        :param keys eine Sammlung von Primärschlüsseln
+        :return Eine Sammlung mit Transaction-Objekten, aufsteigend nach ID sortiert. Schlüssel,
+            zu denen keine Buchung existiert, werden übergangen.
+        """
+        tuples = []
+
+        for cnx in self._ledger_cnxs():
+            tuples.extend(self._fetch_by_keys(
+                "SELECT id, sourceAccount, targetAccount, amount FROM transactions WHERE id IN ({}) ORDER BY id",
+                keys, cnx=cnx))
+
+        return self._build_all(Transaction, self._merge_rows(tuples))
+
     def insert(self, transaction):
         """Einfügen eines Transaction-Objekts in die Datenbank.
 
@@ -133,24 +456,53 @@ class TransactionMapper (Mapper):
         :return das bereits übergebene Objekt, jedoch mit ggf. korrigierter ID.
         """
         cursor = self._cnx.cursor()
-        cursor.execute("SELECT MAX(id) AS maxid FROM transactions ")
-        tuples = cursor.fetchall()
+        transaction.set_id(self._allocate_id("transactions"))
 
-        for (maxid) in tuples:
-            transaction.set_id(maxid[0] + 1)
+        self._insert_rows([(transaction.get_id(),
+                            transaction.get_source_account(),
+                            transaction.get_target_account(),
+                            transaction.get_amount())])
 
-        command = "INSERT INTO transactions (id, sourceAccount, targetAccount, amount) VALUES (%s,%s,%s,%s)"
-        data = (transaction.get_id(),
-                transaction.get_source_account(),
-                transaction.get_target_account(),
-                transaction.get_amount())
-        cursor.execute(command, data)
+        self._apply_to_balances(cursor, (transaction.get_source_account(),
+                                         transaction.get_target_account(),
+                                         transaction.get_amount()))
 
-        self._cnx.commit()
+        self._commit()
+        self._changed("transactions")
         cursor.close()
 
         return transaction
 
+    def insert_many(self, transactions):
+        """Einfügen einer ganzen Reihe von Transaction-Objekten in die Datenbank.
+
+        Die Primärschlüssel werden in einem Zug vergeben und sämtliche Buchungen mit
+        executemany in einer einzigen DB-Transaktion geschrieben. Die Kontostände werden
+        je betroffenem Konto nur einmal fortgeschrieben.
+
+        :param transactions die zu speichernden Objekte
+        :return die bereits übergebenen Objekte, jedoch mit korrigierten IDs.
+        """
+        if len(transactions) == 0:
+            return []
+
+        ids = self._allocate_ids("transactions", len(transactions))
+        for (transaction, id) in zip(transactions, ids):
+            transaction.set_id(id)
+
+        self._insert_rows([(t.get_id(), t.get_source_account(), t.get_target_account(), t.get_amount())
+                           for t in transactions])
+
+        cursor = self._cnx.cursor()
+        self._apply_to_balances(cursor, *[(t.get_source_account(), t.get_target_account(), t.get_amount())
+                                          for t in transactions])
+
+        self._commit()
+        self._changed("transactions")
+        cursor.close()
+
+        return transactions
+
     def update(self, transaction):
         """Wiederholtes Schreiben eines Objekts in die Datenbank.
 
@@ -158,14 +510,38 @@ class TransactionMapper (Mapper):
         """
         cursor = self._cnx.cursor()
 
-        command = "UPDATE transactions " + "SET sourceAccount=%s, targetAccount=%s, amount=%s WHERE id=%s"
-        data = (transaction.get_source_account(),
-                transaction.get_target_account(),
-                transaction.get_amount(),
-                transaction.get_id())
-        cursor.execute(command, data)
-
-        self._cnx.commit()
+        previous = self._find_for_update(transaction.get_id())
+
+        if not ShardRouter.is_configured():
+            command = "UPDATE transactions " + "SET sourceAccount=%s, targetAccount=%s, amount=%s WHERE id=%s"
+            data = (transaction.get_source_account(),
+                    transaction.get_target_account(),
+                    transaction.get_amount(),
+                    transaction.get_id())
+            cursor.execute(command, data)
+        elif previous is not None:
+            """Mit den Konten kann sich auch der Shard der Buchung ändern. Daher wird sie auf den
+            bisherigen Shards gelöscht und anschließend neu geschrieben."""
+            self._delete_rows(transaction.get_id(), previous[0], previous[1])
+            self._insert_rows([(transaction.get_id(),
+                                transaction.get_source_account(),
+                                transaction.get_target_account(),
+                                transaction.get_amount())])
+
+        self._invalidate("transactions", transaction.get_id())
+
+        if previous is not None:
+            """Rückbuchung des bisherigen und Verbuchen des neuen Zustands in einem Schritt, damit
+            auch hier sämtliche Konten in aufsteigender Reihenfolge gesperrt werden."""
+            (source_account, target_account, amount) = previous
+            self._apply_to_balances(cursor,
+                                    (source_account, target_account, -amount),
+                                    (transaction.get_source_account(),
+                                     transaction.get_target_account(),
+                                     transaction.get_amount()))
+
+        self._commit()
+        self._changed("transactions")
         cursor.close()
 
     def delete(self, transaction):
@@ -175,12 +551,62 @@ class TransactionMapper (Mapper):
         """
         cursor = self._cnx.cursor()
 
-        command = "DELETE FROM transactions WHERE id={}".format(transaction.get_id())
-        cursor.execute(command)
+        """Maßgeblich für die Korrektur der Kontostände ist der gespeicherte Zustand der Buchung,
+        nicht der des übergebenen Objekts."""
+        previous = self._find_for_update(transaction.get_id())
+        if previous is not None:
+            (source_account, target_account, amount) = previous
+            self._apply_to_balances(cursor, (source_account, target_account, -amount))
+
+        if not ShardRouter.is_configured():
+            command = "DELETE FROM transactions WHERE id={}".format(transaction.get_id())
+            cursor.execute(command)
+        elif previous is not None:
+            self._delete_rows(transaction.get_id(), previous[0], previous[1])
+
+        self._invalidate("transactions", transaction.get_id())
+
+        self._commit()
+        self._changed("transactions")
+        cursor.close()
+
+    def copy_to_shards(self, chunk_size=5000):
+        """Verteilen der bisher in der primären Datenbank gespeicherten Buchungen auf die Shards.
+
+        Erfolgt einmalig bei der Einführung von Shards (python manage.py shard-transactions). Bereits
+        auf einem Shard vorhandene Buchungen werden übergangen, so dass sich der Aufruf nach einem
+        Abbruch wiederholen lässt. Die Kontostände bleiben unverändert, die Tabelle transactions der
+        primären Datenbank bleibt erhalten und wird danach nicht mehr gelesen.
+
+        :param chunk_size Anzahl der Buchungen, die jeweils in einer Transaktion kopiert werden.
+        :return Anzahl der übertragenen Buchungen (einschließlich bereits vorhandener).
+        """
+        if not ShardRouter.is_configured():
+            raise ValueError("Es sind keine Shards konfiguriert (vgl. DB_SHARDS).")
+
+        cursor = self._cnx.cursor()
+        command = "SELECT id, sourceAccount, targetAccount, amount FROM transactions " \
+                  "WHERE id > %s ORDER BY id LIMIT %s"
+        count = 0
+        after_id = 0
+
+        while True:
+            cursor.execute(command, (after_id, chunk_size))
+            tuples = cursor.fetchall()
+
+            if len(tuples) == 0:
+                break
+
+            self._insert_rows(tuples, ignore=True)
+            self._commit()
+
+            count += len(tuples)
+            after_id = tuples[-1][0]
 
-        self._cnx.commit()
         cursor.close()
 
+        return count
+
 
 """Zu Testzwecken können wir diese Datei bei Bedarf auch ausführen, 
 um die grundsätzliche Funktion zu überprüfen.
@@ -0,0 +1,184 @@
+import threading
+
+from server.db.ConnectionPool import ConnectionPool
+from server.db.ObjectCache import ObjectCache
+from server.db.ShardRouter import ShardRouter
+
+
+class UnitOfWork (object):
+    """Arbeitseinheit (Unit of Work), die an einen einzelnen Request gebunden ist.
+
+    Solange eine Arbeitseinheit für den aktuellen Thread aktiv ist, teilen sich alle
+    Mapper, die währenddessen geöffnet werden, eine einzige Datenbankverbindung. Die
+    Mapper committen dann nicht mehr selbst, sondern die Arbeitseinheit schließt die
+    gesamte Transaktion am Ende des Requests mit genau einem Commit ab bzw. rollt sie
+    im Fehlerfall zurück.
+
+    Sind die Buchungen auf Shards verteilt (vgl. ShardRouter), so hält die Arbeitseinheit zusätzlich
+    je benötigtem Shard eine Verbindung. Beim Commit werden zuerst die Shards und zuletzt die primäre
+    Datenbank committet. Scheitert ein Commit dazwischen, so kann eine Buchung nur auf einem Teil der
+    Shards gespeichert sein bzw. der Kontostand fehlen (vgl. python manage.py verify-balances).
+
+    Typischer Ablauf (vgl. main.py):
+        UnitOfWork.begin()      # zu Beginn des Requests
+        ...                     # beliebig viele (auch verschachtelte) Mapper
+        uow.commit()            # bzw. uow.rollback()
+        UnitOfWork.end()        # Verbindung an den Pool zurückgeben
+    """
+
+    __local = threading.local()
+
+    def __init__(self):
+        self._cnx = None
+        self._shard_cnxs = {}  # Verbindungen zu den Shards (Nummer -> Verbindung), sofern benötigt.
+        self._dirty = False  # Wurde in dieser Arbeitseinheit geschrieben?
+        self._rollback_only = False  # Darf die Arbeitseinheit nur noch zurückgerollt werden?
+        self._callbacks = []  # Funktionen, die nach Abschluss der Transaktion aufgerufen werden.
+        self._primary_only = False  # Darf ausschließlich von der primären Datenbank gelesen werden?
+        self._replica_reads = False  # Wurde von einem Lesereplikat gelesen (vgl. ReplicaRouter)?
+        self._cache_version = None  # Stand des ObjectCache zu Beginn der laufenden DB-Transaktion.
+
+    @staticmethod
+    def begin():
+        """Eine neue Arbeitseinheit für den aktuellen Thread beginnen."""
+        UnitOfWork.end()
+        uow = UnitOfWork()
+        UnitOfWork.__local.current = uow
+        return uow
+
+    @staticmethod
+    def current():
+        """Auslesen der Arbeitseinheit des aktuellen Threads, None falls keine aktiv ist."""
+        return getattr(UnitOfWork.__local, 'current', None)
+
+    @staticmethod
+    def end(exc=None):
+        """Die Arbeitseinheit des aktuellen Threads beenden.
+
+        Noch nicht abgeschlossene Änderungen werden verworfen, die Verbindung geht an den Pool zurück.
+
+        :param exc eine evtl. aufgetretene Exception (vgl. Flask teardown_request)
+        """
+        uow = UnitOfWork.current()
+        UnitOfWork.__local.current = None
+
+        if uow is not None:
+            uow._release()
+
+    def get_connection(self):
+        """Auslesen der gemeinsamen Verbindung. Diese wird erst bei Bedarf aus dem Pool geholt."""
+        if self._cnx is None:
+            self._begin_transaction()
+            self._cnx = ConnectionPool.get_instance().checkout()
+        return self._cnx
+
+    def get_shard_connection(self, shard):
+        """Auslesen der Verbindung zu einem Shard (vgl. ShardRouter). Auch diese wird erst bei Bedarf geholt."""
+        if shard not in self._shard_cnxs:
+            self._begin_transaction()
+            self._shard_cnxs[shard] = ShardRouter.get_instance().get_pool(shard).checkout()
+        return self._shard_cnxs[shard]
+
+    def _begin_transaction(self):
+        if self._cache_version is None:
+            self._cache_version = ObjectCache.get_instance().get_version()
+
+    def get_cache_version(self):
+        """Auslesen des Stands des ObjectCache (vgl. ObjectCache.get_version) *vor* dem ersten Statement
+        der laufenden Transaktion.
+
+        Bei REPEATABLE READ sehen sämtliche Lesezugriffe der Transaktion den Stand ihres ersten
+        Statements. Ein Tupel darf daher nur abgelegt werden, wenn seit diesem Zeitpunkt nichts
+        invalidiert wurde, nicht erst seit dem eigentlichen SELECT (vgl. Mapper._find_row_cached)."""
+        return self._cache_version
+
+    def mark_dirty(self):
+        """Vermerken, dass in dieser Arbeitseinheit Daten geändert wurden."""
+        self._dirty = True
+
+    def is_dirty(self):
+        """Wurden in dieser Arbeitseinheit Daten geändert, die noch nicht committet sind?"""
+        return self._dirty
+
+    def stick_to_primary(self):
+        """Vermerken, dass auch lesend ausschließlich die primäre Datenbank genutzt werden darf, z.B.
+        weil derselbe Client soeben geschrieben hat und seine Änderungen sehen soll (vgl. main.py)."""
+        self._primary_only = True
+
+    def may_read_from_replica(self):
+        """Dürfen lesende Mapper-Methoden ein Lesereplikat nutzen (vgl. Mapper._route)?
+
+        Nicht mehr, sobald in dieser Arbeitseinheit geschrieben wurde: Die noch nicht committeten
+        Änderungen sind nur über die gemeinsame Verbindung zur primären Datenbank sichtbar."""
+        return not self._primary_only and not self._dirty
+
+    def mark_replica_read(self):
+        """Vermerken, dass in dieser Arbeitseinheit von einem Lesereplikat gelesen wurde."""
+        self._replica_reads = True
+
+    def has_read_from_replica(self):
+        """Wurde in dieser Arbeitseinheit von einem (evtl. veralteten) Lesereplikat gelesen?"""
+        return self._replica_reads
+
+    def after_completion(self, callback):
+        """Registrieren einer Funktion, die nach Abschluss der Transaktion aufgerufen wird.
+
+        Die Funktion erhält True, falls committet wurde, sonst (Rollback bzw. Ende der Arbeitseinheit
+        ohne Commit) False. So können z.B. Caches erst dann aktualisiert werden, wenn die Änderungen
+        für alle anderen Verbindungen sichtbar sind.
+        """
+        self._callbacks.append(callback)
+
+    def _complete(self, committed):
+        callbacks = self._callbacks
+        self._callbacks = []
+
+        for callback in callbacks:
+            try:
+                callback(committed)
+            except Exception as exc:
+                print("Fehler nach Abschluss der Transaktion:", exc)
+
+    def mark_rollback_only(self):
+        """Vermerken, dass ein Fehler aufgetreten ist und daher nicht mehr committet werden darf."""
+        self._rollback_only = True
+
+    def commit(self):
+        """Die Transaktion abschließen.
+
+        Ein Commit erfolgt nur, wenn tatsächlich geschrieben wurde. Rein lesende Requests
+        kommen so ohne zusätzlichen Round Trip aus."""
+        if self._rollback_only:
+            self.rollback()
+        else:
+            if self._dirty:
+                for shard in sorted(self._shard_cnxs):
+                    self._shard_cnxs[shard].commit()
+                if self._cnx is not None:
+                    self._cnx.commit()
+                self._dirty = False
+                self._cache_version = ObjectCache.get_instance().get_version()
+            self._complete(True)
+
+    def rollback(self):
+        """Sämtliche Änderungen dieser Arbeitseinheit verwerfen."""
+        for cnx in self._shard_cnxs.values():
+            cnx.rollback()
+        if self._cnx is not None:
+            self._cnx.rollback()
+        self._dirty = False
+        self._cache_version = ObjectCache.get_instance().get_version()
+        self._complete(False)
+
+    def _release(self):
+        self._complete(False)
+
+        shard_cnxs = self._shard_cnxs
+        self._shard_cnxs = {}
+        for (shard, cnx) in shard_cnxs.items():
+            ShardRouter.get_instance().get_pool(shard).release(cnx)
+
+        if self._cnx is not None:
+            cnx = self._cnx
+            self._cnx = None
+            ConnectionPool.get_instance().release(cnx)
@@ -19,20 +19,12 @@ class UserMapper (Mapper):
         :return Eine Sammlung mit User-Objekten, die sämtliche Benutzer
                 des Systems repräsentieren.
         """
-        result = []
         cursor = self._cnx.cursor()
-        cursor.execute("SELECT * from users")
+        cursor.execute("SELECT id, name, email, google_user_id FROM users")
         tuples = cursor.fetchall()
 
-        for (id, name, email, user_id) in tuples:
-            user = User()
-            user.set_id(id)
-            user.set_name(name)
-            user.set_email(email)
-            user.set_user_id(user_id)
-            result.append(user)
+        result = self._build_all(User, tuples)
 
-        self._cnx.commit()
         cursor.close()
 
         return result
@@ -44,21 +36,13 @@ class UserMapper (Mapper):
         :return Eine Sammlung mit User-Objekten, die sämtliche Benutzer
             mit dem gewünschten Namen enthält.
         """
-        result = []
         cursor = self._cnx.cursor()
         command = "SELECT id, name, email, google_user_id FROM users WHERE name LIKE '{}' ORDER BY name".format(name)
         cursor.execute(command)
         tuples = cursor.fetchall()
 
-        for (id, name, email, user_id) in tuples:
-            user = User()
-            user.set_id(id)
-            user.set_name(name)
-            user.set_email(email)
-            user.set_user_id(user_id)
-            result.append(user)
+        result = self._build_all(User, tuples)
 
-        self._cnx.commit()
         cursor.close()
 
         return result
@@ -80,19 +64,12 @@ class UserMapper (Mapper):
         tuples = cursor.fetchall()
 
         try:
-            (id, name, email, user_id) = tuples[0]
-            user = User()
-            user.set_id(id)
-            user.set_name(name)
-            user.set_email(email)
-            user.set_user_id(user_id)
-            result = user
+            result = User.from_tuple(tuples[0])
         except IndexError:
             """Der IndexError wird oben beim Zugriff auf tuples[0] auftreten, wenn der vorherige SELECT-Aufruf
             keine Tupel liefert, sondern tuples = cursor.fetchall() eine leere Sequenz zurück gibt."""
             result = None
 
-        self._cnx.commit()
         cursor.close()
 
         return result
@@ -112,19 +89,12 @@ class UserMapper (Mapper):
         tuples = cursor.fetchall()
 
         try:
-            (id, name, email, user_id) = tuples[0]
-            user = User()
-            user.set_id(id)
-            user.set_name(name)
-            user.set_email(email)
-            user.set_user_id(user_id)
-            result = user
+            result = User.from_tuple(tuples[0])
         except IndexError:
             """Der IndexError wird oben beim Zugriff auf tuples[0] auftreten, wenn der vorherige SELECT-Aufruf
             keine Tupel liefert, sondern tuples = cursor.fetchall() eine leere Sequenz zurück gibt."""
             result = None
 
-        self._cnx.commit()
         cursor.close()
 
         return result
@@ -145,19 +115,12 @@ class UserMapper (Mapper):
         tuples = cursor.fetchall()
 
         try:
-            (id, name, email, google_user_id) = tuples[0]
-            u = User()
-            u.set_id(id)
-            u.set_name(name)
-            u.set_email(email)
-            u.set_user_id(google_user_id)
-            result = u
+            result = User.from_tuple(tuples[0])
         except IndexError:
             """Der IndexError wird oben beim Zugriff auf tuples[0] auftreten, wenn der vorherige SELECT-Aufruf
             keine Tupel liefert, sondern tuples = cursor.fetchall() eine leere Sequenz zurück gibt."""
             result = None
 
-        self._cnx.commit()
         cursor.close()
 
         return result
@@ -172,24 +135,41 @@ class UserMapper (Mapper):
         :return das bereits übergebene Objekt, jedoch mit ggf. korrigierter ID.
         """
         cursor = self._cnx.cursor()
-        cursor.execute("SELECT MAX(id) AS maxid FROM users ")
-        tuples = cursor.fetchall()
-
-        for (maxid) in tuples:
-            if maxid[0] is not None:
-                """Wenn wir eine maximale ID festellen konnten, zählen wir diese
-                um 1 hoch und weisen diesen Wert als ID dem User-Objekt zu."""
-                user.set_id(maxid[0] + 1)
-            else:
-                """Wenn wir KEINE maximale ID feststellen konnten, dann gehen wir
-                davon aus, dass die Tabelle leer ist und wir mit der ID 1 beginnen können."""
-                user.set_id(1)
+        user.set_id(self._allocate_id("users"))
 
         command = "INSERT INTO users (id, name, email, google_user_id) VALUES (%s,%s,%s,%s)"
         data = (user.get_id(), user.get_name(), user.get_email(), user.get_user_id())
         cursor.execute(command, data)
 
-        self._cnx.commit()
+        self._commit()
+        cursor.close()
+
+        return user
+
+    def upsert(self, user):
+        """Einfügen oder Aktualisieren eines User-Objekts mit einer einzigen Anweisung.
+
+        Existiert bereits ein Benutzer mit derselben Google User ID (eindeutiger Index),
+        so werden lediglich Name und E-Mail-Adresse aktualisiert. Andernfalls wird der
+        Benutzer mit einer neu vergebenen ID eingefügt. Im Fall eines Updates bleibt die
+        vorab vergebene ID ungenutzt; es entsteht eine Lücke in id_sequences, aber kein Schaden.
+
+        :param user das zu speichernde Objekt
+        :return das bereits übergebene Objekt, jedoch mit der ID des gespeicherten Datensatzes.
+        """
+        user.set_id(self._allocate_id("users"))
+
+        cursor = self._cnx.cursor()
+        command = "INSERT INTO users (id, name, email, google_user_id) VALUES (%s,%s,%s,%s) " \
+                  "ON DUPLICATE KEY UPDATE id=LAST_INSERT_ID(id), name=VALUES(name), email=VALUES(email)"
+        data = (user.get_id(), user.get_name(), user.get_email(), user.get_user_id())
+        cursor.execute(command, data)
+
+        """Im Fall eines Updates liefert LAST_INSERT_ID(id) die ID des bereits vorhandenen Datensatzes."""
+        if cursor.lastrowid:
+            user.set_id(cursor.lastrowid)
+
+        self._commit()
         cursor.close()
 
         return user
@@ -205,7 +185,7 @@ class UserMapper (Mapper):
         data = (user.get_name(), user.get_email(), user.get_user_id())
         cursor.execute(command, data)
 
-        self._cnx.commit()
+        self._commit()
         cursor.close()
 
     def delete(self, user):
@@ -218,7 +198,7 @@ class UserMapper (Mapper):
         command = "DELETE FROM users WHERE id={}".format(user.get_id())
         cursor.execute(command)
 
-        self._cnx.commit()
+        self._commit()
         cursor.close()
 
 
@@ -0,0 +1,92 @@
+import os
+import sys
+
+import pytest
+
+"""Die Module des Servers liegen in src/ und werden dort ohne Package-Präfix importiert (vgl. main.py)."""
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+
+class FakeCursor (object):
+    """Cursor einer FakeConnection. Beantwortet lediglich die Statements der Schlüsselvergabe
+    (vgl. SequenceTableIdAllocator), alle übrigen liefern kein Ergebnis."""
+
+    def __init__(self, connection):
+        self._connection = connection
+        self._result = []
+        self.rowcount = 0
+
+    def execute(self, command, params=None):
+        self._connection.statements.append(command)
+        sequences = self._connection.sequences
+
+        if command.startswith("UPDATE id_sequences"):
+            (size, table) = params
+            if table in sequences:
+                sequences[table] += size
+                self._connection.last_insert_id = sequences[table]
+                self.rowcount = 1
+            else:
+                self.rowcount = 0
+        elif command.startswith("INSERT IGNORE INTO id_sequences"):
+            (table, next_id) = params
+            sequences.setdefault(table, next_id)
+        elif command == "SELECT LAST_INSERT_ID()":
+            self._result = [(self._connection.last_insert_id,)]
+        elif command.startswith("SELECT COALESCE(MAX(id), 0)"):
+            self._result = [(0,)]
+
+    def fetchone(self):
+        return self._result.pop(0) if self._result else None
+
+    def fetchall(self):
+        result, self._result = self._result, []
+        return result
+
+    def close(self):
+        pass
+
+
+class FakeConnection (object):
+    """Ersatz für eine Verbindung von mysql.connector, um Pool und Allocator ohne Datenbank zu testen."""
+
+    def __init__(self, sequences):
+        self.sequences = sequences  # Gemeinsamer Stand von id_sequences aller Verbindungen.
+        self.statements = []
+        self.last_insert_id = 0
+        self.in_transaction = False
+        self.unread_result = False
+        self.closed = False
+        self.commits = 0
+
+    def cursor(self, **kwargs):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        pass
+
+    def ping(self, reconnect=False):
+        pass
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def fake_connect(monkeypatch):
+    """Ersetzt connector.connect im ConnectionPool. Liefert die Liste aller geöffneten FakeConnections."""
+    import server.db.ConnectionPool as module
+
+    sequences = {}
+    connections = []
+
+    def connect(**params):
+        cnx = FakeConnection(sequences)
+        connections.append(cnx)
+        return cnx
+
+    monkeypatch.setattr(module.connector, 'connect', connect)
+    return connections
@@ -0,0 +1,28 @@
+from server.db.TransactionMapper import TransactionMapper
+
+
+class RecordingCursor (object):
+    def __init__(self):
+        self.rows = []
+
+    def execute(self, command, params=None):
+        pass
+
+    def executemany(self, command, rows):
+        self.rows.extend(rows)
+
+
+def apply(*bookings):
+    cursor = RecordingCursor()
+    TransactionMapper.__new__(TransactionMapper)._apply_to_balances(cursor, *bookings)
+    return cursor.rows
+
+
+def test_accounts_are_locked_in_ascending_order():
+    """Gleichzeitige Buchungen A -> B und B -> A sperren die Kontostände in derselben Reihenfolge."""
+    assert [row[0] for row in apply((9, 2, 5.0))] == [2, 9]
+    assert [row[0] for row in apply((2, 9, 5.0))] == [2, 9]
+
+
+def test_reversal_and_booking_are_combined():
+    assert apply((9, 2, -5.0), (3, 9, 7.0)) == [(2, -5.0, 0.0), (3, 0.0, 7.0), (9, 7.0, -5.0)]
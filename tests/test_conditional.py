@@ -0,0 +1,104 @@
+from datetime import datetime, timezone
+
+import google.oauth2.id_token
+import pytest
+from werkzeug.http import http_date
+
+import ConditionalDecorator
+import main
+import SecurityDecorator
+from ConditionalDecorator import _last_modified, _round_up
+from server.BankAdministration import BankAdministration
+from server.bo.Customer import Customer
+
+CHANGED_AT = datetime(2024, 5, 1, 12, 0, 0, 250000)
+
+
+def make_customer(i):
+    c = Customer()
+    c.set_id(i)
+    c.set_first_name('Vorname {}'.format(i))
+    c.set_last_name('Nachname')
+    return c
+
+
+@pytest.fixture
+def versions():
+    return {'customers': (3, CHANGED_AT)}
+
+
+@pytest.fixture
+def client(monkeypatch, versions):
+    """Testclient mit angemeldetem Benutzer und festen Versionszählern, ohne Datenbank."""
+    calls = []
+    monkeypatch.setattr(google.oauth2.id_token, 'verify_firebase_token',
+                        lambda token, adapter, **kwargs: {'user_id': 'u1', 'email': 'e@example.com', 'name': 'N'})
+    monkeypatch.setattr(SecurityDecorator.user_synchronizer, 'sync', lambda *args: False)
+    monkeypatch.setattr(BankAdministration, 'get_resource_versions',
+                        lambda self, names: {name: versions[name] for name in names if name in versions})
+    monkeypatch.setattr(BankAdministration, 'get_all_customers',
+                        lambda self: calls.append('get_all_customers') or [make_customer(1)])
+
+    client = main.app.test_client()
+    client.set_cookie('localhost', 'token', 'test')
+    client.calls = calls
+    return client
+
+
+def test_matching_etag_answers_304_without_query(client):
+    first = client.get('/bank/customers')
+    etag = first.headers['ETag']
+
+    second = client.get('/bank/customers', headers={'If-None-Match': etag})
+
+    assert first.status_code == 200
+    assert second.status_code == 304
+    assert second.headers['ETag'] == etag
+    assert client.calls == ['get_all_customers']
+
+
+def test_changed_version_answers_200(client, versions):
+    etag = client.get('/bank/customers').headers['ETag']
+    versions['customers'] = (4, CHANGED_AT)
+
+    response = client.get('/bank/customers', headers={'If-None-Match': etag})
+
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+
+
+def test_change_within_same_second_is_not_hidden(client, versions, monkeypatch):
+    class FixedDatetime (datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return datetime(2024, 5, 1, 12, 0, 0, 600000, tzinfo=timezone.utc)
+
+    monkeypatch.setattr(ConditionalDecorator, 'datetime', FixedDatetime)
+    last_modified = client.get('/bank/customers').headers['Last-Modified']
+    versions['customers'] = (4, CHANGED_AT.replace(microsecond=900000))
+
+    response = client.get('/bank/customers', headers={'If-Modified-Since': last_modified})
+
+    assert last_modified == http_date(datetime(2024, 5, 1, 12, 0, 0))
+    assert response.status_code == 200
+
+
+def test_unchanged_since_last_modified_answers_304(client):
+    last_modified = client.get('/bank/customers').headers['Last-Modified']
+
+    response = client.get('/bank/customers', headers={'If-Modified-Since': last_modified})
+
+    assert response.status_code == 304
+
+
+def test_round_up():
+    assert _round_up(datetime(2024, 5, 1, 12, 0, 0)) == datetime(2024, 5, 1, 12, 0, 0)
+    assert _round_up(datetime(2024, 5, 1, 12, 0, 0, 1)) == datetime(2024, 5, 1, 12, 0, 1)
+
+
+def test_last_modified_is_not_after_now():
+    now = datetime(2024, 5, 1, 12, 0, 0, 600000)
+
+    assert _last_modified(None, now) is None
+    assert _last_modified(CHANGED_AT, now) == datetime(2024, 5, 1, 12, 0, 0)
+    assert _last_modified(CHANGED_AT, datetime(2024, 5, 1, 12, 0, 5)) == datetime(2024, 5, 1, 12, 0, 1)
@@ -0,0 +1,85 @@
+import threading
+import time
+
+import pytest
+
+from server.db.ConnectionPool import ConnectionPool, PoolTimeoutError
+
+
+def test_reuses_released_connection(fake_connect):
+    pool = ConnectionPool({}, pool_size=2, max_overflow=0)
+
+    cnx = pool.checkout()
+    pool.release(cnx)
+
+    assert pool.checkout() is cnx
+    assert len(fake_connect) == 1
+
+
+def test_overflow_connections_are_closed_on_release(fake_connect):
+    pool = ConnectionPool({}, pool_size=1, max_overflow=2)
+    connections = [pool.checkout() for n in range(3)]
+
+    assert pool.get_stats() == (3, 0, 3, 0)
+
+    for cnx in connections:
+        pool.release(cnx)
+
+    assert pool.get_stats() == (1, 1, 3, 2)
+    assert [cnx.closed for cnx in connections] == [False, True, True]
+
+
+def test_timeout_when_exhausted(fake_connect):
+    pool = ConnectionPool({}, pool_size=1, max_overflow=1, timeout=0.1)
+    held = [pool.checkout(), pool.checkout()]
+
+    start = time.monotonic()
+    with pytest.raises(PoolTimeoutError):
+        pool.checkout()
+    assert time.monotonic() - start >= 0.1
+
+    pool.release(held[0])
+    assert pool.checkout() is held[0]
+
+
+def test_waiting_checkout_gets_released_connection(fake_connect):
+    pool = ConnectionPool({}, pool_size=1, max_overflow=0, timeout=5)
+    cnx = pool.checkout()
+    result = []
+
+    waiter = threading.Thread(target=lambda: result.append(pool.checkout()))
+    waiter.start()
+    time.sleep(0.05)
+    pool.release(cnx)
+    waiter.join(5)
+
+    assert result == [cnx]
+
+
+def test_open_transaction_is_rolled_back_and_broken_connection_replaced(fake_connect):
+    pool = ConnectionPool({}, pool_size=1, max_overflow=0)
+
+    cnx = pool.checkout()
+    cnx.in_transaction = True
+    rolled_back = []
+    cnx.rollback = lambda: rolled_back.append(cnx)
+    pool.release(cnx)
+    assert rolled_back == [cnx]
+
+    cnx = pool.checkout()
+    cnx.unread_result = True
+    pool.release(cnx)
+
+    assert cnx.closed
+    assert pool.checkout() is not cnx
+
+
+def test_recycle_replaces_old_connections(fake_connect):
+    pool = ConnectionPool({}, pool_size=1, max_overflow=0, recycle=0)
+
+    cnx = pool.checkout()
+    pool.release(cnx)
+    time.sleep(0.01)
+
+    assert pool.checkout() is not cnx
+    assert cnx.closed
@@ -0,0 +1,50 @@
+import threading
+
+import pytest
+
+from server.db.ConnectionPool import ConnectionPool, PoolTimeoutError
+from server.db.IdAllocator import SequenceTableIdAllocator
+
+
+def test_allocates_ascending_blocks(fake_connect):
+    allocator = SequenceTableIdAllocator(block_size=3, pool=ConnectionPool({}, pool_size=1, max_overflow=0))
+
+    assert allocator.next_ids('customers', 2) == [1, 2]
+    assert allocator.next_ids('customers', 2) == [3, 4]
+    assert allocator.next_id('accounts') == 1
+
+
+def test_reserves_while_request_pool_is_exhausted(fake_connect, monkeypatch):
+    """Halten sämtliche Requests eine Verbindung aus ihrem Pool, so kann dennoch reserviert werden."""
+    requests = ConnectionPool({}, pool_size=1, max_overflow=1, timeout=0.1)
+    monkeypatch.setattr(ConnectionPool, 'get_instance', staticmethod(lambda: requests))
+    held = [requests.checkout(), requests.checkout()]
+
+    with pytest.raises(PoolTimeoutError):
+        requests.checkout()
+
+    allocator = SequenceTableIdAllocator(block_size=5)
+    assert allocator.next_ids('transactions', 7) == list(range(1, 8))
+
+    for cnx in held:
+        requests.release(cnx)
+
+
+def test_concurrent_allocation_is_unique(fake_connect):
+    allocator = SequenceTableIdAllocator(block_size=7, pool=ConnectionPool({}, pool_size=1, max_overflow=0))
+    result = []
+    lock = threading.Lock()
+
+    def allocate(table):
+        for i in range(100):
+            ids = allocator.next_ids(table, 1 + i % 4)
+            with lock:
+                result.extend((table, key) for key in ids)
+
+    threads = [threading.Thread(target=allocate, args=(('users', 'accounts')[n % 2],)) for n in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(result) == len(set(result)) == 6 * sum(1 + i % 4 for i in range(100))
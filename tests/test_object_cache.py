@@ -0,0 +1,95 @@
+import pytest
+
+from server.db import ObjectCache as object_cache_module
+from server.db.ObjectCache import ObjectCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(object_cache_module.time, 'monotonic', lambda: now[0])
+    return now
+
+
+def test_put_then_get():
+    cache = ObjectCache()
+    cache.put('accounts', 1, (1, 7), cache.get_version())
+
+    assert cache.get('accounts', 1) == (1, 7)
+    assert cache.get('accounts', 2) is None
+    assert cache.get_stats() == {'accounts': (1, 1, 1)}
+
+
+def test_put_after_invalidate_is_dropped():
+    cache = ObjectCache()
+    version = cache.get_version()
+    cache.invalidate('accounts', 1)
+
+    cache.put('accounts', 1, (1, 7), version)
+
+    assert cache.get('accounts', 1) is None
+
+
+def test_invalidate_of_other_key_also_drops_put():
+    cache = ObjectCache()
+    version = cache.get_version()
+    cache.invalidate('customers', 5)
+
+    cache.put('accounts', 1, (1, 7), version)
+
+    assert cache.get('accounts', 1) is None
+
+
+def test_entries_expire_after_ttl(clock):
+    cache = ObjectCache(ttl=30.0)
+    cache.put('accounts', 1, (1, 7), cache.get_version())
+
+    clock[0] += 29.9
+    assert cache.get('accounts', 1) == (1, 7)
+    clock[0] += 0.1
+    assert cache.get('accounts', 1) is None
+    assert cache.get_stats()['accounts'] == (1, 1, 0)
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = ObjectCache(max_size=2)
+    version = cache.get_version()
+    cache.put('accounts', 1, (1, 7), version)
+    cache.put('accounts', 2, (2, 7), version)
+    cache.get('accounts', 1)
+
+    cache.put('accounts', 3, (3, 7), version)
+
+    assert cache.get('accounts', 1) == (1, 7)
+    assert cache.get('accounts', 2) is None
+    assert cache.get('accounts', 3) == (3, 7)
+
+
+def test_disabled_tables_are_not_cached():
+    cache = ObjectCache(disabled=['customers'])
+    cache.put('customers', 1, (1, 'A', 'B'), cache.get_version())
+
+    assert not cache.is_enabled('customers')
+    assert cache.get('customers', 1) is None
+
+
+def test_disabling_at_runtime_removes_entries():
+    cache = ObjectCache()
+    version = cache.get_version()
+    cache.put('accounts', 1, (1, 7), version)
+    cache.put('customers', 1, (1, 'A', 'B'), version)
+
+    cache.set_enabled('accounts', False)
+
+    assert cache.get_disabled() == {'accounts'}
+    assert cache.get_stats() == {}
+    cache.set_enabled('accounts', True)
+    assert cache.get('accounts', 1) is None
+    assert cache.get('customers', 1) == (1, 'A', 'B')
+
+
+def test_size_zero_disables_cache():
+    cache = ObjectCache(max_size=0)
+    cache.put('accounts', 1, (1, 7), cache.get_version())
+
+    assert cache.get('accounts', 1) is None
@@ -0,0 +1,98 @@
+import os
+import threading
+
+from server import ResponseCache as module
+from server.ResponseCache import ResponseCache
+
+
+def entries(directory):
+    return sorted(name for name in os.listdir(directory) if name.endswith('.entry'))
+
+
+def test_put_and_get(tmp_path):
+    cache = ResponseCache(str(tmp_path))
+    cache.put('k', ['customers'], cache.get_generations(['customers']), b'[1]', {'mimetype': 'application/json'})
+
+    assert cache.get('k', ['customers']) == (b'[1]', {'mimetype': 'application/json'})
+    assert cache.get('other', ['customers']) is None
+    assert cache.get_stats() == (1, 1)
+
+
+def test_invalidate_table(tmp_path):
+    cache = ResponseCache(str(tmp_path))
+    cache.put('k', ['customers', 'accounts'], cache.get_generations(['customers', 'accounts']), b'[]', {})
+
+    cache.invalidate('users')
+    assert cache.get('k', ['customers', 'accounts']) is not None
+
+    cache.invalidate('accounts')
+    assert cache.get('k', ['customers', 'accounts']) is None
+
+
+def test_generation_is_shared_between_instances(tmp_path):
+    """Die Zähler liegen in einer gemeinsamen Datei, wie bei mehreren Worker-Prozessen."""
+    writer = ResponseCache(str(tmp_path))
+    other = ResponseCache(str(tmp_path))
+    writer.put('k', ['customers'], writer.get_generations(['customers']), b'[]', {})
+
+    other.invalidate('customers')
+    assert writer.get('k', ['customers']) is None
+
+
+def test_put_with_stale_generations_is_invalid(tmp_path):
+    cache = ResponseCache(str(tmp_path))
+    generations = cache.get_generations(['customers'])
+    cache.invalidate('customers')
+    cache.put('k', ['customers'], generations, b'[]', {})
+
+    assert cache.get('k', ['customers']) is None
+
+
+def test_ttl(tmp_path, monkeypatch):
+    cache = ResponseCache(str(tmp_path), ttl=10)
+    now = [1000.0]
+    monkeypatch.setattr(module.time, 'time', lambda: now[0])
+    cache.put('k', ['customers'], cache.get_generations(['customers']), b'[]', {})
+
+    now[0] += 9
+    assert cache.get('k', ['customers']) is not None
+    now[0] += 2
+    assert cache.get('k', ['customers']) is None
+
+
+def test_prune_removes_expired_and_limits_entries(tmp_path, monkeypatch):
+    cache = ResponseCache(str(tmp_path), ttl=10, max_entries=2)
+    now = [1000.0]
+    monkeypatch.setattr(module.time, 'time', lambda: now[0])
+
+    cache.put('expired', ['customers'], cache.get_generations(['customers']), b'[]', {})
+    now[0] += 20
+    for key in ('a', 'b', 'c'):
+        cache.put(key, ['customers'], cache.get_generations(['customers']), b'[]', {})
+    assert len(entries(str(tmp_path))) == 4
+
+    cache._prune()
+
+    assert len(entries(str(tmp_path))) == 2
+    assert cache.get('expired', ['customers']) is None
+
+
+def test_prune_runs_in_background_after_successful_puts_only(tmp_path, monkeypatch):
+    cache = ResponseCache(str(tmp_path))
+    pruned = threading.Event()
+    monkeypatch.setattr(cache, '_prune', pruned.set)
+
+    def fail(*args):
+        raise OSError("Kein Platz")
+
+    monkeypatch.setattr(module.os, 'replace', fail)
+    for n in range(100):
+        cache.put(str(n), ['customers'], cache.get_generations(['customers']), b'[]', {})
+    assert not pruned.wait(0.2)
+
+    monkeypatch.undo()
+    monkeypatch.setattr(cache, '_prune', lambda: (threading.current_thread() is not threading.main_thread()
+                                                  and pruned.set()))
+    for n in range(100):
+        cache.put(str(n), ['customers'], cache.get_generations(['customers']), b'[]', {})
+    assert pruned.wait(5)
@@ -0,0 +1,61 @@
+import pytest
+from flask_restx import marshal
+
+import main
+from Serializer import compile_model, serialize
+from server.bo.Account import Account
+from server.bo.Customer import Customer
+from server.bo.User import User
+
+
+def make_customer(first_name='Vorname'):
+    c = Customer()
+    c.set_id(7)
+    c.set_first_name(first_name)
+    c.set_last_name('Nachname')
+    return c
+
+
+def make_account():
+    a = Account()
+    a.set_id(3)
+    a.set_owner(7)
+    return a
+
+
+def make_user():
+    u = User()
+    u.set_id(2)
+    u.set_name('Name')
+    u.set_email('e@example.com')
+    u.set_user_id('u2')
+    return u
+
+
+@pytest.mark.parametrize('model, obj', [
+    (main.customer, make_customer()),
+    (main.customer, make_customer(first_name=None)),
+    (main.account, make_account()),
+    (main.user, make_user()),
+])
+def test_compiled_model_matches_marshal(model, obj):
+    assert compile_model(model)(obj) == dict(marshal(obj, model))
+
+
+def test_lists_are_serialized_element_wise():
+    customers = [make_customer(), make_customer('Andere')]
+
+    assert serialize(customers, main.customer) == [dict(marshal(c, main.customer)) for c in customers]
+
+
+def test_objects_without_attributes_fall_back_to_marshal():
+    data = {'_id': 4, '_owner': 9}
+
+    assert compile_model(main.account)(data) == dict(marshal(data, main.account)) == {'id': 4, 'owner': 9}
+
+
+def test_partial_objects_fall_back_to_marshal():
+    class Partial (object):
+        _id = 5
+
+    assert compile_model(main.account)(Partial()) == {'id': 5, 'owner': None}
@@ -0,0 +1,67 @@
+import json
+
+import google.oauth2.id_token
+import pytest
+
+import main
+import SecurityDecorator
+from server.BankAdministration import BankAdministration
+from server.bo.Account import Account
+from server.bo.Customer import Customer
+
+
+def make_customer(i):
+    c = Customer()
+    c.set_id(i)
+    c.set_first_name('Vorname {}'.format(i))
+    c.set_last_name('Nachname')
+    return c
+
+
+def make_account(i):
+    a = Account()
+    a.set_id(i)
+    a.set_owner(1)
+    return a
+
+
+@pytest.fixture
+def client(monkeypatch):
+    """Testclient mit angemeldetem Benutzer, ohne Firebase und ohne Datenbank."""
+    monkeypatch.setattr(google.oauth2.id_token, 'verify_firebase_token',
+                        lambda token, adapter, **kwargs: {'user_id': 'u1', 'email': 'e@example.com', 'name': 'N'})
+    monkeypatch.setattr(SecurityDecorator.user_synchronizer, 'sync', lambda *args: False)
+    monkeypatch.setattr(BankAdministration, 'get_resource_versions', lambda self, names: {})
+    monkeypatch.setattr(BankAdministration, 'get_customers_page',
+                        lambda self, after_id, limit: [make_customer(i) for i in range(after_id + 1, after_id + 1 + limit)])
+    monkeypatch.setattr(BankAdministration, 'get_accounts_page',
+                        lambda self, after_id, limit: [make_account(i) for i in range(after_id + 1, after_id + 1 + limit)])
+
+    client = main.app.test_client()
+    client.set_cookie('localhost', 'token', 'test')
+    return client
+
+
+@pytest.mark.parametrize('path', ['/bank/customers', '/bank/accounts'])
+def test_stream_json_with_limit(client, path):
+    response = client.get(path + '?stream=json&limit=2')
+
+    assert response.status_code == 200
+    assert [obj['id'] for obj in json.loads(response.get_data())] == [1, 2]
+    assert 'after_id=2' in response.headers['Link']
+
+
+@pytest.mark.parametrize('path', ['/bank/customers', '/bank/accounts'])
+def test_stream_ndjson_with_limit(client, path):
+    response = client.get(path + '?limit=2&after_id=4', headers={'Accept': 'application/x-ndjson'})
+
+    assert response.status_code == 200
+    assert response.mimetype == 'application/x-ndjson'
+    assert [json.loads(line)['id'] for line in response.get_data().splitlines()] == [5, 6]
+    assert 'after_id=6' in response.headers['Link']
+
+
+def test_stream_without_token_is_unauthorized():
+    response = main.app.test_client().get('/bank/customers?stream=json&limit=2')
+
+    assert response.status_code == 401
@@ -0,0 +1,98 @@
+import google.oauth2.id_token
+
+import SecurityDecorator
+from SecurityDecorator import CachingRequest, TokenCache
+
+
+class FakeResponse (object):
+    def __init__(self, status=200, cache_control=None):
+        self.status = status
+        self.headers = {'cache-control': cache_control} if cache_control is not None else {}
+
+
+class FakeAdapter (object):
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.calls = []
+
+    def __call__(self, url, method='GET', body=None, headers=None, timeout=None, **kwargs):
+        self.calls.append((url, method))
+        return self.responses.pop(0)
+
+
+def test_token_is_cached_until_exp(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(SecurityDecorator.time, 'time', lambda: now[0])
+    cache = TokenCache()
+
+    cache.put('token', {'user_id': 'u1', 'exp': 1060})
+
+    assert cache.get('token') == {'user_id': 'u1', 'exp': 1060}
+    now[0] = 1060
+    assert cache.get('token') is None
+    assert cache.get_stats() == (1, 1, 0)
+
+
+def test_claims_without_exp_are_not_cached():
+    cache = TokenCache()
+    cache.put('token', {'user_id': 'u1'})
+
+    assert cache.get('token') is None
+
+
+def test_least_recently_used_token_is_evicted(monkeypatch):
+    monkeypatch.setattr(SecurityDecorator.time, 'time', lambda: 1000.0)
+    cache = TokenCache(max_size=2)
+
+    cache.put('a', {'exp': 2000})
+    cache.put('b', {'exp': 2000})
+    cache.get('a')
+    cache.put('c', {'exp': 2000})
+
+    assert cache.get('a') is not None
+    assert cache.get('b') is None
+    assert cache.get('c') is not None
+
+
+def test_verify_token_asks_firebase_once(monkeypatch):
+    calls = []
+
+    def verify(token, adapter, **kwargs):
+        calls.append(token)
+        return {'user_id': 'u1', 'exp': 4102444800}
+
+    monkeypatch.setattr(SecurityDecorator, 'token_cache', TokenCache())
+    monkeypatch.setattr(google.oauth2.id_token, 'verify_firebase_token', verify)
+
+    assert SecurityDecorator.verify_token('token')['user_id'] == 'u1'
+    assert SecurityDecorator.verify_token('token')['user_id'] == 'u1'
+    assert calls == ['token']
+
+
+def test_certificates_are_cached_for_max_age(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(SecurityDecorator.time, 'time', lambda: now[0])
+    first = FakeResponse(cache_control='public, max-age=300, must-revalidate')
+    second = FakeResponse(cache_control='public, max-age=300')
+    adapter = FakeAdapter(first, second)
+    request = CachingRequest(adapter)
+
+    assert request('https://certs') is first
+    now[0] += 299
+    assert request('https://certs') is first
+    now[0] += 2
+    assert request('https://certs') is second
+    assert len(adapter.calls) == 2
+
+
+def test_uncacheable_responses_are_not_cached():
+    adapter = FakeAdapter(FakeResponse(), FakeResponse(status=500, cache_control='max-age=300'),
+                          FakeResponse(), FakeResponse())
+    request = CachingRequest(adapter)
+
+    request('https://certs')
+    request('https://certs')
+    request('https://certs', method='POST', body=b'x')
+    request('https://certs')
+
+    assert len(adapter.calls) == 4